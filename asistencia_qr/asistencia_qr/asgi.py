@@ -3,6 +3,11 @@ ASGI config for asistencia_qr project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Served through ASGI, the async check-in view (``registrar_asistencia_final_async``)
+awaits the face-encoding process pool without holding a worker thread, and
+WebSocket connections go to the streaming face validation in
+``empleados/tiempo_real.py`` (``/ws/validacion/<empleado_id>/``).
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -13,4 +18,14 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'asistencia_qr.settings')
 
-application = get_asgi_application()
+django_asgi_app = get_asgi_application()
+
+# Se importa después de get_asgi_application(), que inicializa Django.
+from empleados.tiempo_real import aplicacion_websocket  # noqa: E402
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'websocket':
+        await aplicacion_websocket(scope, receive, send)
+    else:
+        await django_asgi_app(scope, receive, send)
@@ -75,12 +75,51 @@ WSGI_APPLICATION = 'asistencia_qr.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# Se elige con la variable de entorno ASISTENCIA_DB:
+#   'sqlite'   (por defecto) un solo servidor. Modo WAL (las lecturas no bloquean la
+#              escritura), transacciones IMMEDIATE (el bloqueo de escritura se toma al
+#              empezar, sin errores de "database is locked" al promocionarlo) y espera
+#              de hasta SQLITE_TIMEOUT segundos cuando otro proceso está escribiendo.
+#   'postgres' producción con varios kioscos escribiendo a la vez (psycopg 3, ver
+#              requirements.txt). Conexiones persistentes (DB_CONN_MAX_AGE) con
+#              comprobación de salud; con DB_POOL=1 se usa el pool nativo de Django
+#              (psycopg_pool, incluido en psycopg[pool]).
+if os.environ.get('ASISTENCIA_DB', 'sqlite') == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('POSTGRES_DB', 'asistencia_qr'),
+            'USER': os.environ.get('POSTGRES_USER', 'asistencia_qr'),
+            'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+            'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+            'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 600)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {},
+        }
     }
-}
+    if os.environ.get('DB_POOL') == '1':
+        # El pool sustituye a las conexiones persistentes (CONN_MAX_AGE debe ser 0).
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.environ.get('DB_POOL_MIN', 2)),
+            'max_size': int(os.environ.get('DB_POOL_MAX', 20)),
+        }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+            'OPTIONS': {
+                'timeout': int(os.environ.get('SQLITE_TIMEOUT', 20)),
+                'transaction_mode': 'IMMEDIATE',
+                'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;',
+            },
+        }
+    }
+    if os.environ.get('SQLITE_WAL', '1') == '0':
+        # Solo para comparar con 'carga_concurrente': el modo por defecto de SQLite.
+        DATABASES['default']['OPTIONS'] = {}
 
 
 # Password validation
@@ -123,3 +162,151 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Reconocimiento facial
+# Máximo de encodings de referencia en la caché LRU de cada proceso (empleados/biometria.py).
+CACHE_ENCODINGS_MAX = 4096
+
+# Segundos tras los cuales el índice 1:N se recarga completo desde la BD (empleados/identificacion.py).
+INDICE_FACIAL_TTL = 300
+
+# Pool de procesos para la codificación facial (empleados/procesamiento.py).
+# Por defecto un proceso por CPU; 0 = sin pool, se codifica en el hilo de la petición.
+POOL_FACIAL_WORKERS = int(os.environ.get('POOL_FACIAL_WORKERS', os.cpu_count() or 1))
+# Trabajos en curso + en cola; al superarse se responde 503 con Retry-After.
+POOL_FACIAL_MAX_PENDIENTES = int(os.environ.get('POOL_FACIAL_MAX_PENDIENTES', POOL_FACIAL_WORKERS * 4 or 4))
+POOL_FACIAL_TIMEOUT = 30
+POOL_FACIAL_RETRY_AFTER = 2
+
+# Preprocesado de la imagen capturada antes del encoding (empleados/procesamiento.py):
+# decodificación reducida (draft JPEG) a MAX_LADO px, detección sobre un fotograma de
+# LADO_DETECCION px, recorte del rostro con MARGEN relativo y encoding solo del recorte.
+PREPROCESADO_CAPTURA = {
+    'ACTIVO': True,
+    'MAX_LADO': 640,
+    'LADO_DETECCION': 320,
+    'UPSAMPLE': 1,
+    'MARGEN': 0.3,
+}
+
+# Control de calidad de la captura antes del encoding (empleados/calidad.py): brillo
+# medio (0-255) del fotograma y del rostro, nitidez mínima del rostro (varianza del
+# laplaciano) y tamaño mínimo del rostro respecto al lado menor del fotograma. Las
+# capturas que no lo cumplen se rechazan con 422 y una indicación para el usuario.
+CALIDAD_CAPTURA = {
+    'ACTIVO': True,
+    'BRILLO_MIN': 40,
+    'BRILLO_MAX': 215,
+    'NITIDEZ_MIN': 40,
+    'ROSTRO_MIN': 0.15,
+}
+
+# Backend de reconocimiento facial (empleados/backends.py), importado en el primer uso:
+#   'empleados.backends.DlibBackend'   face_recognition / dlib (por defecto).
+#   'empleados.backends.OpenCVBackend' YuNet + SFace con opencv-python, más rápido en CPU.
+# Los encodings de un backend no sirven para otro: tras cambiarlo, ejecutar
+# 'manage.py calcular_encodings' (y 'comparar_backends' para medirlos antes).
+BACKEND_FACIAL = os.environ.get('BACKEND_FACIAL', 'empleados.backends.DlibBackend')
+BACKEND_FACIAL_OPCIONES = {
+    # Modelos ONNX de https://github.com/opencv/opencv_zoo (solo OpenCVBackend).
+    'MODELO_DETECCION': os.path.join(BASE_DIR, 'modelos', 'face_detection_yunet_2023mar.onnx'),
+    'MODELO_RECONOCIMIENTO': os.path.join(BASE_DIR, 'modelos', 'face_recognition_sface_2021dec.onnx'),
+    'UMBRAL_DETECCION': 0.8,
+    # 'TOLERANCIA': distancia máxima para considerar dos rostros iguales (por defecto, la del backend).
+}
+
+# Fotos de perfil (empleados/fotos.py): al subirlas se guardan normalizadas (orientación
+# EXIF, como máximo MAX_LADO px) junto con un recorte cuadrado del rostro para el
+# encoding y una miniatura para el Admin. 'manage.py limpiar_fotos' borra las huérfanas.
+FOTOS_PERFIL = {
+    'MAX_LADO': 1024,
+    'LADO_RECORTE': 300,
+    'MARGEN_RECORTE': 0.4,
+    'LADO_MINIATURA': 128,
+    'CALIDAD_JPEG': 90,
+}
+
+# Validación por WebSocket (empleados/tiempo_real.py, solo con asgi.py): fotogramas
+# aceptados por conexión, fotogramas distintos que deben coincidir para registrar,
+# fotogramas codificándose a la vez y segundos máximos por conexión.
+VALIDACION_STREAM = {
+    'MAX_FOTOGRAMAS': 12,
+    'COINCIDENCIAS': 2,
+    'EN_VUELO': 2,
+    'MAX_BYTES': 256 * 1024,
+    'TIMEOUT': 15,
+}
+
+# Caché (límites de peticiones, revocación de QR): en memoria por defecto. Con varios
+# workers o servidores, defina REDIS_URL para que todos compartan la misma caché.
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'asistencia',
+        }
+    }
+
+# Límites de peticiones de los endpoints biométricos (empleados/limites.py): token
+# bucket por IP del cliente y por empleado, con ráfagas de hasta CAPACIDAD peticiones
+# y recarga de POR_MINUTO fichas por minuto. None desactiva un ámbito. Si hay un
+# proxy inverso delante, indique en CABECERA_IP la cabecera con la IP real y en
+# PROXIES_CONFIABLES cuántos proxies propios la completan: se usa esa entrada contando
+# desde la derecha, porque las de la izquierda las puede escribir el cliente.
+LIMITES_CHECKIN = {
+    'CACHE': 'default',
+    'CLIENTE': {'CAPACIDAD': 20, 'POR_MINUTO': 30},
+    'EMPLEADO': {'CAPACIDAD': 5, 'POR_MINUTO': 6},
+    'CABECERA_IP': None,
+    'PROXIES_CONFIABLES': 1,
+}
+
+# Asistencia
+# Segundos durante los que se rechaza una nueva marca del mismo empleado (doble escaneo).
+ASISTENCIA_DEBOUNCE_SEGUNDOS = 10
+
+# Jornada laboral para los resúmenes diarios (empleados/resumenes.py): hora de entrada,
+# minutos de tolerancia antes de contar tardanza y días laborables (0 = lunes) para
+# calcular ausencias. Tras cambiarla, ejecutar 'manage.py reconstruir_resumenes'.
+JORNADA = {
+    'HORA_ENTRADA': '08:00',
+    'TOLERANCIA_MINUTOS': 10,
+    'DIAS_LABORABLES': (0, 1, 2, 3, 4),
+}
+
+# Códigos QR (empleados/qr.py)
+# Variantes (contenido, formato, tamaño) de QR renderizados que se guardan en memoria.
+QR_CACHE_MAX = 1024
+# max-age (segundos) de la cabecera Cache-Control de las imágenes QR versionadas (?v=qr_emitido).
+QR_CACHE_CONTROL_MAX_AGE = 60 * 60 * 24 * 365
+# Clave HMAC de los QR firmados (empleados/payload_qr.py). generar_qr.py lee la misma
+# clave de la variable ASISTENCIA_QR_CLAVE; el kiosco (leer_qr.py) no la necesita: envía
+# el texto del QR y el servidor lo verifica.
+QR_CLAVE_FIRMA = os.environ.get('ASISTENCIA_QR_CLAVE', SECRET_KEY)
+# Aceptar QR antiguos que solo contienen el ID (sin firma). Solo durante la transición
+# mientras se reimprimen las credenciales: cualquiera puede fabricar uno de esos QR.
+QR_ACEPTAR_LEGADO = False
+# Lectura de QR en el servidor (empleados/lector_qr.py, vista leer_qr): lado máximo al
+# que se reduce cada fotograma, fracción central donde se busca primero, fotogramas
+# por petición y tamaño máximo de cada uno.
+LECTOR_QR = {
+    'MAX_LADO': 640,
+    'FRACCION_ROI': 0.8,
+    'MAX_FOTOGRAMAS': 5,
+    'MAX_BYTES': 512 * 1024,
+}
+
+# Métricas (empleados/metricas.py): tiempos por etapa, consultas por petición y
+# respuestas por código, expuestos en /metrics/ en formato Prometheus.
+METRICAS_HABILITADAS = os.environ.get('METRICAS_HABILITADAS', '0') == '1'
+# /metrics/ solo responde al personal (staff) con sesión iniciada o, para Prometheus,
+# a peticiones con la cabecera "Authorization: Bearer <METRICAS_TOKEN>".
+METRICAS_TOKEN = os.environ.get('METRICAS_TOKEN', '')
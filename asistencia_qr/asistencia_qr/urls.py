@@ -7,32 +7,55 @@ from django.urls import path, include
 from rest_framework import routers
 
 from empleados import views 
-from empleados.views import EmpleadoViewSet, AsistenciaViewSet
+from empleados.views import EmpleadoViewSet, AsistenciaViewSet, ResumenDiarioViewSet
 
 router = routers.DefaultRouter()
 router.register(r'empleados', EmpleadoViewSet)
 router.register(r'asistencias', AsistenciaViewSet)
+router.register(r'resumenes', ResumenDiarioViewSet)
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    # Check-in en una sola petición (QR + foto -> veredicto y tipo de marca), JSON.
+    path('api/checkin/', views.checkin, name='checkin'),
     path('api/', include(router.urls)),
     
     # === VISTAS DEL FLUJO DE ASISTENCIA (QR -> FACIAL -> REGISTRO) ===
     
     # 1. Vista que recibe el dato del QR (POST) y redirige a la validación facial.
     path('procesar_qr/', views.procesar_qr, name='procesar_qr'), 
+
+    # 1b. Alternativa: el kiosco envía fotogramas (POST) y el servidor lee el QR y
+    #     devuelve el empleado en la misma respuesta (JSON).
+    path('leer_qr/', views.leer_qr, name='leer_qr'),
     
     # 2. Vista que muestra la interfaz de cámara para la validación facial (GET).
     path('validacion_facial/<int:empleado_id>/', views.validacion_facial_view, name='validacion_facial'),
     
     # 3. Vista que recibe la confirmación AJAX (POST) y registra la asistencia final.
     path('registrar_asistencia_final/<int:empleado_id>/', views.registrar_asistencia_final, name='registrar_asistencia_final'),
+
+    # Variante asíncrona del paso 3 para servir con ASGI (asgi.py): no bloquea el worker
+    # mientras el pool de procesos codifica la imagen.
+    path('async/registrar_asistencia_final/<int:empleado_id>/', views.registrar_asistencia_final_async, name='registrar_asistencia_final_async'),
+
+    # Alternativa sin QR: identificación 1:N del rostro contra todos los empleados (POST).
+    path('identificar_asistencia/', views.identificar_asistencia, name='identificar_asistencia'),
     
     # === VISTAS DE UTILIDAD ===
     
     # URL para generar la imagen del código QR (usada en el Admin)
     path('qr/empleado/<int:empleado_id>/', views.generar_qr_empleado, name='qr_empleado'),
     
+    # Miniatura de la foto de perfil (Admin)
+    path('fotos/miniatura/<int:empleado_id>/', views.miniatura_empleado, name='miniatura_empleado'),
+
+    # Exportación de asistencias para planillas (CSV / XLSX en streaming, solo staff)
+    path('exportar/asistencias/', views.exportar_asistencias, name='exportar_asistencias'),
+
+    # Métricas de rendimiento del check-in (formato Prometheus)
+    path('metrics/', views.metricas_view, name='metricas'),
+
     # URL para la página de inicio del escáner (si aplica)
     path('scanner/', views.scanner_view, name='scanner_page'),
 ]
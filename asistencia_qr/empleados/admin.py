@@ -1,12 +1,14 @@
 # empleados/admin.py
 
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.utils.html import mark_safe
 from django.urls import reverse
-from .models import Empleado, Asistencia 
+from django.utils import timezone
+from . import biometria, marcaciones, qr, resumenes
+from .models import Empleado, Asistencia, ResumenDiario
 
 class EmpleadoAdmin(admin.ModelAdmin):
-    list_display = ('id', 'nombre', 'dni', 'area')
+    list_display = ('id', 'miniatura_display', 'nombre', 'dni', 'area')
     list_display_links = ('nombre',)
     
     # PLANTILLA PERSONALIZADA: Se usa para AÑADIR y MODIFICAR
@@ -14,6 +16,7 @@ class EmpleadoAdmin(admin.ModelAdmin):
     change_form_template = 'admin/empleados/empleado/change_form_photo_capture.html'
     
     readonly_fields = ('qr_code_display',) 
+    actions = ['reemitir_qr']
 
     fieldsets = (
         (None, {
@@ -35,14 +38,102 @@ class EmpleadoAdmin(admin.ModelAdmin):
         return super().change_view(request, object_id, form_url, extra_context=extra_context)
 
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+
+        # Precalculamos el encoding facial solo cuando la foto de perfil cambia.
+        if 'foto_perfil' not in form.changed_data:
+            return
+        try:
+            encoding = biometria.actualizar_encoding(obj)
+        except Exception as e:
+            print(f"Error calculando encoding de {obj}: {e}")
+            self.message_user(request, "No se pudo procesar la foto de perfil para la validación facial.", messages.WARNING)
+            return
+        if obj.foto_perfil and encoding is None:
+            self.message_user(request, "No se detectó ningún rostro en la foto de perfil. La validación facial fallará.", messages.WARNING)
+
+
     def qr_code_display(self, obj):
         # ... (código existente de qr_code_display)
         if obj.id:
-            qr_url = reverse('qr_empleado', args=[obj.id]) 
+            # '?v=' cambia al reemitir la credencial, así la imagen cacheada nunca queda obsoleta.
+            qr_url = f"{reverse('qr_empleado', args=[obj.id])}?v={obj.qr_emitido}"
             return mark_safe(f'<a href="{qr_url}" target="_blank"><img src="{qr_url}" width="150" height="150" /></a>')
         return "El QR se generará después de guardar el empleado por primera vez."
 
     qr_code_display.short_description = "Código QR"
 
+    @admin.display(description="Foto")
+    def miniatura_display(self, obj):
+        # Miniatura generada al subir la foto (ver fotos.py); su nombre es el hash del contenido.
+        if not obj.foto_miniatura:
+            return ""
+        url = f"{reverse('miniatura_empleado', args=[obj.id])}?v={obj.foto_miniatura.name.rsplit('/', 1)[-1]}"
+        return mark_safe(f'<img src="{url}" width="48" height="48" style="object-fit: cover; border-radius: 4px;" />')
+
+    @admin.action(description="Reemitir credencial QR (revoca las anteriores)")
+    def reemitir_qr(self, request, queryset):
+        total = qr.reemitir(queryset)
+        self.message_user(request, f"Se reemitieron {total} credenciales QR. Imprima las nuevas con 'generar_badges'.", messages.SUCCESS)
+
 admin.site.register(Empleado, EmpleadoAdmin)
-admin.site.register(Asistencia)
\ No newline at end of file
+
+
+class AsistenciaAdmin(admin.ModelAdmin):
+    list_display = ('id', 'empleado', 'area', 'tipo', 'fecha_hora')
+    list_display_links = ('id',)
+    # Un JOIN con Empleado en lugar de una consulta por fila al mostrar nombre y área.
+    list_select_related = ('empleado',)
+    list_filter = ('tipo', 'empleado__area')
+    date_hierarchy = 'fecha_hora'
+    search_fields = ('empleado__nombre', 'empleado__dni')
+    ordering = ('-fecha_hora',)
+    # Con millones de filas, el COUNT(*) sin filtros de cada página es muy costoso.
+    show_full_result_count = False
+    # Un buscador por ID en lugar de un <select> con todos los empleados.
+    raw_id_fields = ('empleado',)
+
+    @admin.display(description='Área', ordering='empleado__area')
+    def area(self, obj):
+        return obj.empleado.area
+
+    # Las ediciones desde el Admin también actualizan los resúmenes diarios y el
+    # estado de cada empleado (EstadoEmpleado), del que depende la próxima marca.
+    def save_model(self, request, obj, form, change):
+        if not change:
+            super().save_model(request, obj, form, change)
+            marcaciones.sincronizar_estado(obj)
+            return
+        anterior = Asistencia.objects.get(pk=obj.pk)
+        super().save_model(request, obj, form, change)
+        resumenes.actualizar_resumenes(resumenes.dias_de(anterior, obj))
+        marcaciones.recalcular_estado(anterior.empleado_id, obj.empleado_id)
+
+    def delete_model(self, request, obj):
+        dias = resumenes.dias_de(obj)
+        super().delete_model(request, obj)
+        resumenes.actualizar_resumenes(dias)
+        marcaciones.recalcular_estado(obj.empleado_id)
+
+    def delete_queryset(self, request, queryset):
+        dias = {
+            (empleado_id, timezone.localdate(fecha_hora))
+            for empleado_id, fecha_hora in queryset.values_list('empleado_id', 'fecha_hora')
+        }
+        super().delete_queryset(request, queryset)
+        resumenes.actualizar_resumenes(dias)
+        marcaciones.recalcular_estado(*(empleado_id for empleado_id, _ in dias))
+
+admin.site.register(Asistencia, AsistenciaAdmin)
+
+
+class ResumenDiarioAdmin(admin.ModelAdmin):
+    list_display = ('empleado', 'fecha', 'primera_entrada', 'ultima_salida', 'segundos_trabajados', 'tardanza_segundos', 'anomalias', 'entrada_abierta')
+    list_filter = ('fecha', 'empleado__area', 'entrada_abierta')
+    list_select_related = ('empleado',)
+    date_hierarchy = 'fecha'
+    # Se calculan a partir de las marcas: no se editan a mano.
+    readonly_fields = [campo.name for campo in ResumenDiario._meta.fields]
+
+admin.site.register(ResumenDiario, ResumenDiarioAdmin)
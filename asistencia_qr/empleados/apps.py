@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class EmpleadosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'empleados'
+
+    def ready(self):
+        # Registra las señales que normalizan las fotos de perfil y mantienen actualizado
+        # el índice facial 1:N.
+        from . import signals  # noqa: F401
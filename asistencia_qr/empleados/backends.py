@@ -0,0 +1,249 @@
+# empleados/backends.py
+"""
+Backends de reconocimiento facial intercambiables.
+
+El backend se elige en settings.py (BACKEND_FACIAL) y se instancia en el primer uso;
+sus dependencias pesadas (dlib, modelos ONNX) se importan/cargan en la primera
+detección, no al importar Django. Así 'migrate', 'shell' o los workers que solo
+sirven la API no pagan ese coste.
+
+    DlibBackend    face_recognition (dlib HOG + ResNet), el comportamiento original.
+    OpenCVBackend  YuNet (detección) + SFace (reconocimiento) con el módulo DNN de
+                   opencv-python; bastante más rápido en CPU.
+
+Todos los backends devuelven encodings de 128 floats comparables por distancia
+euclídea, de modo que el índice 1:N (identificacion.py) sirve para cualquiera; cada
+backend define su propia TOLERANCIA. Los encodings de backends distintos NO son
+comparables entre sí: encoding_origen incluye el nombre del backend (ver
+biometria.origen_encoding) para que al cambiarlo se recalculen.
+"""
+import threading
+
+import numpy as np
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+BACKEND_POR_DEFECTO = 'empleados.backends.DlibBackend'
+
+
+class BackendNoDisponible(RuntimeError):
+    """
+    Faltan la librería o los modelos que necesita el backend configurado.
+    """
+
+
+class Rostro:
+    """
+    Rostro detectado: caja (top, right, bottom, left) en píxeles y, si el detector
+    los da, los 5 puntos faciales (ojos, nariz, comisuras) como array (5, 2) en x, y.
+    """
+
+    __slots__ = ('caja', 'puntos', 'confianza')
+
+    def __init__(self, caja, puntos=None, confianza=1.0):
+        self.caja = tuple(int(v) for v in caja)
+        self.puntos = puntos
+        self.confianza = confianza
+
+    @property
+    def area(self):
+        top, right, bottom, left = self.caja
+        return (bottom - top) * (right - left)
+
+    def escalar(self, factor):
+        puntos = self.puntos * factor if self.puntos is not None else None
+        return Rostro([round(v * factor) for v in self.caja], puntos, self.confianza)
+
+    def desplazar(self, dy, dx):
+        top, right, bottom, left = self.caja
+        puntos = self.puntos - (dx, dy) if self.puntos is not None else None
+        return Rostro((top - dy, right - dx, bottom - dy, left - dx), puntos, self.confianza)
+
+
+class BackendFacial:
+    """
+    Interfaz común. Las imágenes son arrays RGB uint8 (alto x ancho x 3).
+    """
+
+    nombre = ''
+    TOLERANCIA = 0.5
+
+    def __init__(self, opciones=None):
+        self.opciones = opciones or {}
+        self.tolerancia = self.opciones.get('TOLERANCIA', self.TOLERANCIA)
+
+    def cargar_imagen(self, fuente):
+        """
+        Decodifica una ruta o un objeto tipo archivo a un array RGB.
+        """
+        from PIL import Image
+
+        return np.asarray(Image.open(fuente).convert('RGB'))
+
+    def detectar(self, imagen, upsample=1):
+        """
+        Devuelve la lista de Rostro encontrados en la imagen.
+        """
+        raise NotImplementedError
+
+    def codificar(self, imagen, rostros=None):
+        """
+        Devuelve un encoding por rostro. Sin 'rostros' se detectan primero.
+        """
+        raise NotImplementedError
+
+    def distancia(self, encoding_a, encoding_b):
+        return float(np.linalg.norm(np.asarray(encoding_a) - np.asarray(encoding_b)))
+
+    def coinciden(self, encoding_a, encoding_b):
+        return self.distancia(encoding_a, encoding_b) <= self.tolerancia
+
+
+class DlibBackend(BackendFacial):
+
+    nombre = 'dlib'
+    # 0.6 es el valor por defecto de face_recognition; 0.5 es más estricto.
+    TOLERANCIA = 0.5
+
+    _modulo = None
+
+    def _face_recognition(self):
+        if self._modulo is None:
+            try:
+                import face_recognition
+            except ImportError as e:
+                raise BackendNoDisponible(f"DlibBackend requiere face_recognition (dlib): {e}")
+            self._modulo = face_recognition
+        return self._modulo
+
+    def cargar_imagen(self, fuente):
+        return self._face_recognition().load_image_file(fuente)
+
+    def detectar(self, imagen, upsample=1):
+        ubicaciones = self._face_recognition().face_locations(imagen, number_of_times_to_upsample=upsample)
+        return [Rostro(ubicacion) for ubicacion in ubicaciones]
+
+    def codificar(self, imagen, rostros=None):
+        ubicaciones = [rostro.caja for rostro in rostros] if rostros is not None else None
+        return self._face_recognition().face_encodings(imagen, known_face_locations=ubicaciones)
+
+
+class OpenCVBackend(BackendFacial):
+    """
+    YuNet + SFace (OpenCV Zoo). Los modelos ONNX se configuran en BACKEND_FACIAL_OPCIONES:
+
+        MODELO_DETECCION       face_detection_yunet_2023mar.onnx
+        MODELO_RECONOCIMIENTO  face_recognition_sface_2021dec.onnx
+        UMBRAL_DETECCION       confianza mínima de YuNet (0.8 por defecto)
+
+    SFace se compara por similitud coseno (umbral recomendado 0.363). Como los
+    encodings se normalizan a norma 1, distancia² = 2 - 2·coseno, así que el umbral
+    equivale a una distancia euclídea de sqrt(2 - 2·0.363) ≈ 1.128.
+    """
+
+    nombre = 'opencv'
+    TOLERANCIA = 1.128
+
+    def __init__(self, opciones=None):
+        super().__init__(opciones)
+        self._detector = None
+        self._reconocedor = None
+        # Los objetos DNN de OpenCV no son seguros entre hilos (setInputSize modifica el detector).
+        self._lock = threading.Lock()
+
+    def _cargar(self):
+        if self._detector is not None:
+            return
+        import os
+
+        import cv2
+
+        deteccion = str(self.opciones.get('MODELO_DETECCION', ''))
+        reconocimiento = str(self.opciones.get('MODELO_RECONOCIMIENTO', ''))
+        for ruta in (deteccion, reconocimiento):
+            if not ruta or not os.path.exists(ruta):
+                raise BackendNoDisponible(
+                    f"OpenCVBackend: no se encuentra el modelo '{ruta}'. Descárguelo de "
+                    "https://github.com/opencv/opencv_zoo y revise BACKEND_FACIAL_OPCIONES."
+                )
+        self._cv2 = cv2
+        self._reconocedor = cv2.FaceRecognizerSF.create(reconocimiento, '')
+        self._detector = cv2.FaceDetectorYN.create(
+            deteccion, '', (320, 320), self.opciones.get('UMBRAL_DETECCION', 0.8), 0.3, 5000
+        )
+
+    def _a_bgr(self, imagen):
+        return self._cv2.cvtColor(np.ascontiguousarray(imagen), self._cv2.COLOR_RGB2BGR)
+
+    def _detectar_bgr(self, bgr):
+        alto, ancho = bgr.shape[:2]
+        self._detector.setInputSize((ancho, alto))
+        _, caras = self._detector.detect(bgr)
+        if caras is None:
+            return []
+        rostros = []
+        for cara in caras:
+            x, y, w, h = cara[:4]
+            rostros.append(Rostro((y, x + w, y + h, x), cara[4:14].reshape(5, 2).copy(), float(cara[14])))
+        return rostros
+
+    def detectar(self, imagen, upsample=1):
+        # YuNet detecta rostros pequeños sin ampliar la imagen: 'upsample' se ignora.
+        self._cargar()
+        with self._lock:
+            return self._detectar_bgr(self._a_bgr(imagen))
+
+    def codificar(self, imagen, rostros=None):
+        self._cargar()
+        bgr = self._a_bgr(imagen)
+        encodings = []
+        with self._lock:
+            if rostros is None or any(rostro.puntos is None for rostro in rostros):
+                # SFace necesita los puntos faciales para alinear el rostro.
+                rostros = self._detectar_bgr(bgr)
+            for rostro in rostros:
+                top, right, bottom, left = rostro.caja
+                fila = np.concatenate((
+                    [left, top, right - left, bottom - top], rostro.puntos.ravel(), [rostro.confianza],
+                )).astype(np.float32)
+                alineado = self._reconocedor.alignCrop(bgr, fila)
+                vector = self._reconocedor.feature(alineado).ravel().astype(np.float64)
+                encodings.append(vector / (np.linalg.norm(vector) or 1.0))
+        return encodings
+
+
+# --- Selección y carga perezosa ---
+
+_instancias = {}
+_lock_instancias = threading.Lock()
+
+
+def configuracion():
+    """
+    (ruta de la clase, opciones) del backend configurado en settings.py. Es lo que se
+    pasa a los procesos del pool, que no leen settings.
+    """
+    return (
+        getattr(settings, 'BACKEND_FACIAL', BACKEND_POR_DEFECTO),
+        dict(getattr(settings, 'BACKEND_FACIAL_OPCIONES', {})),
+    )
+
+
+def cargar_backend(ruta, opciones=None):
+    """
+    Devuelve la instancia (una por proceso) del backend indicado por su ruta.
+    """
+    backend = _instancias.get(ruta)
+    if backend is None:
+        with _lock_instancias:
+            backend = _instancias.get(ruta)
+            if backend is None:
+                backend = _instancias[ruta] = import_string(ruta)(opciones)
+    return backend
+
+
+def obtener_backend():
+    """
+    Backend configurado en settings.py (BACKEND_FACIAL).
+    """
+    return cargar_backend(*configuracion())
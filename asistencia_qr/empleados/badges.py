@@ -0,0 +1,80 @@
+# empleados/badges.py
+"""
+Dibujo de las credenciales QR imprimibles (comando generar_badges).
+
+Este módulo se importa en los procesos del pool de renderizado. Con el método de
+arranque 'spawn' (Windows y macOS) esos procesos no ejecutan django.setup(), así que
+aquí no se importan modelos: solo qr.py y Pillow.
+"""
+import io
+
+from PIL import Image, ImageDraw, ImageFont
+
+from . import qr
+
+# Hoja A4 a 150 ppp con una cuadrícula de 2 x 4 credenciales.
+RESOLUCION = 150
+PAGINA_PX = (1240, 1754)
+COLUMNAS, FILAS = 2, 4
+BADGE_PX = (PAGINA_PX[0] // COLUMNAS, PAGINA_PX[1] // FILAS)
+
+
+def _fuente(tamano):
+    try:
+        return ImageFont.load_default(size=tamano)
+    except TypeError:  # Pillow < 10.1
+        return ImageFont.load_default()
+
+
+def renderizar_badge(empleado_id, nombre, dni, contenido):
+    """
+    Dibuja la credencial (QR + nombre + DNI) y la devuelve como PNG.
+    """
+    ancho, alto = BADGE_PX
+    badge = Image.new('L', BADGE_PX, 255)
+    dibujo = ImageDraw.Draw(badge)
+    dibujo.rectangle([0, 0, ancho - 1, alto - 1], outline=160)
+
+    imagen = qr.imagen_qr(contenido, box_size=8, border=2).convert('L')
+    lado = min(ancho - 40, alto - 110)
+    imagen = imagen.resize((lado, lado), Image.NEAREST)
+    badge.paste(imagen, ((ancho - lado) // 2, 16))
+
+    for texto, y, tamano in ((nombre, lado + 28, 30), (f"DNI {dni}  ·  ID {empleado_id}", lado + 66, 22)):
+        fuente = _fuente(tamano)
+        x = (ancho - dibujo.textlength(texto, font=fuente)) // 2
+        dibujo.text((max(x, 8), y), texto, fill=0, font=fuente)
+
+    buf = io.BytesIO()
+    badge.save(buf, 'PNG', optimize=True)
+    return buf.getvalue()
+
+
+def renderizar_fila(fila):
+    """
+    (empleado_id, nombre, dni, contenido) -> (empleado_id, nombre, png). Es la función
+    que se envía al pool.
+    """
+    return fila[0], fila[1], renderizar_badge(*fila)
+
+
+def paginas(badges):
+    """
+    Reparte los PNG de 'badges' ((empleado_id, nombre, png), en orden) en hojas de
+    COLUMNAS x FILAS. Genera cada hoja en blanco y negro puro (modo '1'): Pillow la
+    guarda en el PDF con CCITT G4, sin pérdida, así que los módulos del QR quedan
+    nítidos al imprimir.
+    """
+    pagina = None
+    por_pagina = COLUMNAS * FILAS
+    for indice, (_, _, png) in enumerate(badges):
+        posicion = indice % por_pagina
+        if posicion == 0:
+            if pagina is not None:
+                yield pagina.convert('1', dither=Image.Dither.NONE)
+            pagina = Image.new('L', PAGINA_PX, 255)
+        x = (posicion % COLUMNAS) * BADGE_PX[0]
+        y = (posicion // COLUMNAS) * BADGE_PX[1]
+        pagina.paste(Image.open(io.BytesIO(png)), (x, y))
+    if pagina is not None:
+        yield pagina.convert('1', dither=Image.Dither.NONE)
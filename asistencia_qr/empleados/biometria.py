@@ -0,0 +1,164 @@
+# empleados/biometria.py
+"""
+Encodings faciales de referencia de los empleados.
+
+El encoding de 'foto_perfil' se calcula una sola vez (al guardar la foto desde el
+Admin o con el comando 'calcular_encodings'), se persiste en el propio Empleado y
+se mantiene en una caché LRU en memoria del proceso. Así cada check-in solo tiene
+que codificar la imagen capturada por la cámara.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+
+from . import backends
+
+
+class CacheLRU:
+    """
+    Caché LRU sencilla y segura entre hilos: {clave: valor} con tamaño máximo.
+    """
+
+    def __init__(self, max_items):
+        self.max_items = max_items
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, clave):
+        with self._lock:
+            try:
+                self._datos.move_to_end(clave)
+            except KeyError:
+                return None
+            return self._datos[clave]
+
+    def set(self, clave, valor):
+        with self._lock:
+            self._datos[clave] = valor
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_items:
+                self._datos.popitem(last=False)
+
+    def delete(self, clave):
+        with self._lock:
+            self._datos.pop(clave, None)
+
+    def clear(self):
+        with self._lock:
+            self._datos.clear()
+
+    def __len__(self):
+        return len(self._datos)
+
+
+# {empleado_id: (encoding_origen, encoding)}
+_cache_encodings = CacheLRU(getattr(settings, 'CACHE_ENCODINGS_MAX', 4096))
+
+
+def serializar_encoding(encoding):
+    return np.asarray(encoding, dtype=np.float64).tobytes()
+
+
+def deserializar_encoding(datos):
+    # BinaryField devuelve bytes (SQLite) o memoryview (PostgreSQL).
+    return np.frombuffer(datos, dtype=np.float64)
+
+
+def origen_encoding(foto):
+    """
+    Valor de Empleado.encoding_origen para la foto indicada con el backend actual.
+    """
+    return f"{backends.obtener_backend().nombre}:{foto}"
+
+
+def encoding_vigente(empleado):
+    """
+    True si el encoding guardado corresponde a la foto de perfil actual y al backend.
+    """
+    return (
+        empleado.encoding_facial is not None
+        and bool(empleado.foto_perfil)
+        and empleado.encoding_origen == origen_encoding(empleado.foto_perfil.name)
+    )
+
+
+def calcular_encoding(ruta_imagen, backend=None):
+    """
+    Calcula el encoding del primer rostro de la imagen con el backend configurado
+    (o con la configuración 'backend', como en procesamiento.codificar_captura).
+    Devuelve None si no se detecta ningún rostro.
+    """
+    backend = backends.cargar_backend(*backend) if backend else backends.obtener_backend()
+    imagen = backend.cargar_imagen(ruta_imagen)
+    encodings = backend.codificar(imagen)
+    if len(encodings) == 0:
+        return None
+    return encodings[0]
+
+
+def actualizar_encoding(empleado, en_pool=False):
+    """
+    Recalcula y persiste el encoding de la foto de perfil del empleado.
+    Devuelve el encoding, o None si la foto no tiene un rostro detectable.
+
+    Con 'en_pool' el cálculo se hace en el pool facial (ver procesamiento.py), con su
+    límite de trabajos pendientes: lanza ColaLlena o TimeoutError si está saturado.
+    """
+    if not empleado.foto_perfil:
+        limpiar_encoding(empleado)
+        return None
+
+    # El recorte del rostro (ver fotos.py) es más pequeño y rápido de codificar que la foto.
+    ruta = (empleado.foto_recorte or empleado.foto_perfil).path
+    if en_pool:
+        from . import procesamiento
+
+        encoding = procesamiento.pool_facial.ejecutar(calcular_encoding, ruta, procesamiento.CONFIG_BACKEND)
+    else:
+        encoding = calcular_encoding(ruta)
+
+    empleado.encoding_facial = serializar_encoding(encoding) if encoding is not None else None
+    empleado.encoding_origen = origen_encoding(empleado.foto_perfil.name)
+    empleado.save(update_fields=['encoding_facial', 'encoding_origen'])
+
+    if encoding is None:
+        _cache_encodings.delete(empleado.id)
+    else:
+        _cache_encodings.set(empleado.id, (empleado.encoding_origen, encoding))
+    return encoding
+
+
+def limpiar_encoding(empleado):
+    """
+    Elimina el encoding guardado (p. ej. cuando se borra la foto de perfil).
+    """
+    empleado.encoding_facial = None
+    empleado.encoding_origen = ''
+    empleado.save(update_fields=['encoding_facial', 'encoding_origen'])
+    _cache_encodings.delete(empleado.id)
+
+
+def obtener_encoding_referencia(empleado):
+    """
+    Devuelve el encoding de referencia del empleado usando, en orden:
+    la caché en memoria, el encoding persistido o (si la foto cambió) un recálculo
+    en el pool facial. Devuelve None si la foto de perfil no tiene un rostro detectable.
+    """
+    origen = origen_encoding(empleado.foto_perfil.name)
+
+    en_cache = _cache_encodings.get(empleado.id)
+    if en_cache is not None and en_cache[0] == origen:
+        return en_cache[1]
+
+    if encoding_vigente(empleado):
+        encoding = deserializar_encoding(empleado.encoding_facial)
+        _cache_encodings.set(empleado.id, (origen, encoding))
+        return encoding
+
+    if empleado.encoding_origen == origen:
+        # Ya se calculó para esta foto y no tenía rostro: no repetimos el trabajo.
+        return None
+
+    return actualizar_encoding(empleado, en_pool=True)
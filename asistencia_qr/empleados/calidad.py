@@ -0,0 +1,102 @@
+# empleados/calidad.py
+"""
+Control de calidad de la imagen capturada, antes de calcular el encoding.
+
+Se ejecuta dentro de codificar_captura() (procesamiento.py) sobre el fotograma
+reducido que ya se usa para la detección, así que cuesta muy poco:
+
+    1. Brillo medio del fotograma: demasiado oscuro o sobreexpuesto.
+    2. Tras la detección: rostros cercanos a la cámara (más de uno -> rechazo) y
+       tamaño del rostro respecto al fotograma (demasiado lejos).
+    3. Brillo y nitidez (varianza del laplaciano) de la región del rostro.
+
+Un fotograma rechazado lanza CalidadInsuficiente con un código de motivo y una pista
+para el usuario, y la vista responde 422 sin haber pagado el encoding. Las páginas
+de validación y del escáner aplican las mismas comprobaciones de brillo y nitidez
+antes de enviar la foto (static/js/calidad_captura.js), con estas mismas PISTAS.
+"""
+import numpy as np
+
+PISTAS = {
+    'oscura': 'Imagen muy oscura. Mejore la iluminación o colóquese frente a una luz.',
+    'sobreexpuesta': 'Imagen sobreexpuesta. Evite la luz directa sobre la cámara o detrás de usted.',
+    'borrosa': 'Imagen borrosa. Quédese quieto un momento mirando a la cámara.',
+    'rostro_pequeno': 'Rostro demasiado lejos. Acérquese a la cámara.',
+    'varios_rostros': 'Hay más de una persona frente a la cámara. Solo debe aparecer una.',
+}
+
+# Lado (px) al que se lleva la región del rostro para medir la nitidez: la varianza
+# del laplaciano depende de la resolución, así los umbrales no dependen de la cámara.
+LADO_NITIDEZ = 112
+
+
+class CalidadInsuficiente(Exception):
+    """
+    El fotograma no tiene calidad suficiente. 'motivo' es una clave de PISTAS.
+    """
+    def __init__(self, motivo, pista=None):
+        # Ambos argumentos van a Exception.args para que la excepción se pueda
+        # devolver desde los procesos del pool (pickle).
+        super().__init__(motivo, pista or PISTAS[motivo])
+        self.motivo = motivo
+        self.pista = pista or PISTAS[motivo]
+
+
+def a_gris(imagen):
+    """
+    Luminancia (0-255, float32) de un array RGB.
+    """
+    return imagen[..., :3].astype(np.float32) @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+
+def nitidez(gris):
+    """
+    Varianza del laplaciano (núcleo de 4 vecinos): baja = imagen borrosa o movida.
+    """
+    laplaciano = (
+        gris[1:-1, :-2] + gris[1:-1, 2:] + gris[:-2, 1:-1] + gris[2:, 1:-1] - 4 * gris[1:-1, 1:-1]
+    )
+    return float(laplaciano.var())
+
+
+def _comprobar_brillo(gris, opciones):
+    brillo = float(gris.mean())
+    if brillo < opciones['BRILLO_MIN']:
+        raise CalidadInsuficiente('oscura')
+    if brillo > opciones['BRILLO_MAX']:
+        raise CalidadInsuficiente('sobreexpuesta')
+
+
+def evaluar_fotograma(gris, opciones):
+    """
+    Comprobación previa a la detección: brillo del fotograma completo.
+    """
+    _comprobar_brillo(gris, opciones)
+
+
+def evaluar_rostros(gris, rostros, opciones):
+    """
+    Comprobaciones tras la detección, con las cajas en coordenadas de 'gris'.
+    """
+    from PIL import Image
+
+    lado_fotograma = min(gris.shape[:2])
+    tamanos = [
+        min(bottom - top, right - left) / lado_fotograma for top, right, bottom, left in (r.caja for r in rostros)
+    ]
+    # Solo cuentan los rostros cercanos: la gente que espera detrás no molesta.
+    cercanos = [t for t in tamanos if t >= opciones['ROSTRO_MIN']]
+    if not cercanos:
+        raise CalidadInsuficiente('rostro_pequeno')
+    if len(cercanos) > 1:
+        raise CalidadInsuficiente('varios_rostros')
+
+    top, right, bottom, left = max(rostros, key=lambda r: r.area).caja
+    region = gris[max(top, 0):bottom, max(left, 0):right]
+    _comprobar_brillo(region, opciones)
+
+    region = np.asarray(
+        Image.fromarray(region.astype(np.uint8)).resize((LADO_NITIDEZ, LADO_NITIDEZ)), dtype=np.float32,
+    )
+    if nitidez(region) < opciones['NITIDEZ_MIN']:
+        raise CalidadInsuficiente('borrosa')
@@ -0,0 +1,168 @@
+# empleados/exportacion.py
+"""
+Exportación de asistencias a CSV / XLSX en streaming (para planillas de meses).
+
+Las filas se leen con values_list() (el JOIN con Empleado lo hace la BD, sin N+1)
+e .iterator(chunk_size=...), y cada formato es un generador de bytes que se puede
+pasar a StreamingHttpResponse o escribir en un archivo. La memoria usada no
+depende del tamaño del rango exportado.
+
+El XLSX se escribe con zipfile sobre una salida no "seekable" (zipfile usa
+entonces descriptores de datos) y la hoja se genera fila a fila con cadenas en
+línea (inlineStr), sin tabla de cadenas compartidas que obligue a tener todo en memoria.
+"""
+import csv
+import zipfile
+from datetime import datetime
+from xml.sax.saxutils import escape
+
+from django.utils import timezone
+
+CABECERA = ['Fecha', 'Hora', 'Tipo', 'ID empleado', 'Nombre', 'DNI', 'Área']
+TAMANO_BLOQUE = 2000
+
+_EPOCA_EXCEL = datetime(1899, 12, 30)
+
+
+def filas(asistencias):
+    """
+    Genera (fecha_hora local, tipo, empleado_id, nombre, dni, area) en orden cronológico.
+    """
+    consulta = (
+        asistencias
+        .order_by('fecha_hora', 'id')
+        .values_list('fecha_hora', 'tipo', 'empleado_id', 'empleado__nombre', 'empleado__dni', 'empleado__area')
+    )
+    for fecha_hora, *resto in consulta.iterator(chunk_size=TAMANO_BLOQUE):
+        yield (timezone.localtime(fecha_hora), *resto)
+
+
+# --- CSV ---
+
+class _Linea:
+    """
+    Objeto tipo archivo para csv.writer: devuelve la línea en lugar de guardarla.
+    """
+    def write(self, valor):
+        return valor
+
+
+def generar_csv(asistencias):
+    # BOM para que Excel abra el CSV como UTF-8 (tildes y ñ).
+    yield '\ufeff'.encode()
+    escritor = csv.writer(_Linea())
+    yield escritor.writerow(CABECERA).encode()
+    for fecha_hora, tipo, empleado_id, nombre, dni, area in filas(asistencias):
+        yield escritor.writerow([
+            fecha_hora.strftime('%Y-%m-%d'), fecha_hora.strftime('%H:%M:%S'), tipo, empleado_id, nombre, dni, area,
+        ]).encode()
+
+
+# --- XLSX ---
+
+class _Salida:
+    """
+    Salida sin seek para zipfile: acumula lo escrito hasta que el generador lo entrega.
+    """
+    def __init__(self):
+        self._partes = []
+
+    def write(self, datos):
+        self._partes.append(bytes(datos))
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    def vaciar(self):
+        datos = b''.join(self._partes)
+        self._partes.clear()
+        return datos
+
+
+_ARCHIVOS_XLSX = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Asistencias" sheetId="1" r:id="rId1"/></sheets></workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+        '</Relationships>'
+    ),
+    # Estilo 1: fecha y hora (formato integrado 22, 'm/d/yyyy h:mm' adaptado a la configuración regional).
+    'xl/styles.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="1"><fill><patternFill patternType="none"/></fill></fills>'
+        '<borders count="1"><border/></borders>'
+        '<cellStyleXfs count="1"><xf/></cellStyleXfs>'
+        '<cellXfs count="2"><xf/><xf numFmtId="22" applyNumberFormat="1"/></cellXfs>'
+        '</styleSheet>'
+    ),
+}
+
+
+def _celda_texto(valor):
+    return f'<c t="inlineStr"><is><t>{escape(str(valor))}</t></is></c>'
+
+
+def _fila_xlsx(fecha_hora, tipo, empleado_id, nombre, dni, area):
+    serial = (fecha_hora.replace(tzinfo=None) - _EPOCA_EXCEL).total_seconds() / 86400
+    return (
+        f'<row><c s="1"><v>{serial:.8f}</v></c>'
+        f'{_celda_texto(fecha_hora.strftime("%H:%M:%S"))}{_celda_texto(tipo)}'
+        f'<c><v>{empleado_id}</v></c>{_celda_texto(nombre)}{_celda_texto(dni)}{_celda_texto(area)}</row>'
+    )
+
+
+def generar_xlsx(asistencias):
+    salida = _Salida()
+    with zipfile.ZipFile(salida, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for nombre, contenido in _ARCHIVOS_XLSX.items():
+            zf.writestr(nombre, contenido)
+        yield salida.vaciar()
+
+        with zf.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as hoja:
+            hoja.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                '<cols><col min="1" max="1" width="18" customWidth="1"/><col min="5" max="5" width="30" customWidth="1"/></cols>'
+                '<sheetData><row>' + ''.join(_celda_texto(titulo) for titulo in CABECERA) + '</row>'
+            ).encode())
+            bloque = []
+            for fila in filas(asistencias):
+                bloque.append(_fila_xlsx(*fila))
+                if len(bloque) == TAMANO_BLOQUE:
+                    hoja.write(''.join(bloque).encode())
+                    bloque.clear()
+                    yield salida.vaciar()
+            hoja.write((''.join(bloque) + '</sheetData></worksheet>').encode())
+    yield salida.vaciar()
+
+
+FORMATOS = {
+    'csv': (generar_csv, 'text/csv; charset=utf-8'),
+    'xlsx': (generar_xlsx, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
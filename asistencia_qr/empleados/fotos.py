@@ -0,0 +1,147 @@
+# empleados/fotos.py
+"""
+Normalización y almacenamiento de las fotos de perfil.
+
+Cada foto subida (captura de la webcam del Admin, archivo o API) se convierte en:
+
+    fotos_empleados/<hh>/<hash>.jpg          original normalizado: orientación EXIF
+                                             aplicada, RGB, como máximo MAX_LADO px.
+    fotos_empleados/recortes/<hash>.jpg      recorte cuadrado del rostro de LADO_RECORTE
+                                             px, el que se usa para calcular el encoding.
+    fotos_empleados/miniaturas/<hash>.jpg    miniatura de LADO_MINIATURA px para el Admin.
+
+<hash> es el SHA-256 del archivo subido: la misma foto subida dos veces se guarda una
+sola vez. Los archivos que ya no usa ningún empleado se eliminan con el comando
+'limpiar_fotos'.
+"""
+import hashlib
+import io
+
+import numpy as np
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+from . import backends
+
+CARPETA = 'fotos_empleados'
+
+
+def configuracion():
+    fotos = {
+        'MAX_LADO': 1024, 'LADO_RECORTE': 300, 'MARGEN_RECORTE': 0.4,
+        'LADO_MINIATURA': 128, 'CALIDAD_JPEG': 90,
+    }
+    fotos.update(getattr(settings, 'FOTOS_PERFIL', {}))
+    return fotos
+
+
+def rutas(huella):
+    """
+    Rutas (original, recorte, miniatura) de la foto con ese hash.
+    """
+    return (
+        f'{CARPETA}/{huella[:2]}/{huella}.jpg',
+        f'{CARPETA}/recortes/{huella}.jpg',
+        f'{CARPETA}/miniaturas/{huella}.jpg',
+    )
+
+
+def normalizar(datos, max_lado):
+    """
+    Imagen PIL en RGB, con la orientación EXIF aplicada y reducida a 'max_lado' px.
+    """
+    from PIL import Image, ImageOps
+
+    imagen = ImageOps.exif_transpose(Image.open(io.BytesIO(datos)))
+    imagen = imagen.convert('RGB')
+    if max(imagen.size) > max_lado:
+        imagen.thumbnail((max_lado, max_lado))
+    return imagen
+
+
+def recortar_rostro(imagen, lado, margen):
+    """
+    Recorte cuadrado de 'lado' px centrado en el rostro más grande, o None si no hay rostro.
+    """
+    from PIL import Image
+
+    rostros = backends.obtener_backend().detectar(np.asarray(imagen))
+    if not rostros:
+        return None
+    top, right, bottom, left = max(rostros, key=lambda rostro: rostro.area).caja
+    mitad = max(bottom - top, right - left) * (1 + 2 * margen) / 2
+    centro_y, centro_x = (top + bottom) / 2, (left + right) / 2
+    caja = (int(centro_x - mitad), int(centro_y - mitad), int(centro_x + mitad), int(centro_y + mitad))
+    # crop() rellena con negro lo que cae fuera de la imagen; así el recorte siempre es cuadrado.
+    return imagen.crop(caja).resize((lado, lado), Image.LANCZOS)
+
+
+def _jpeg(imagen, calidad):
+    buf = io.BytesIO()
+    imagen.save(buf, 'JPEG', quality=calidad, optimize=True)
+    return buf.getvalue()
+
+
+def _guardar(ruta, imagen, calidad):
+    # Mismo hash, mismo contenido: si ya existe no se vuelve a escribir.
+    if not default_storage.exists(ruta):
+        default_storage.save(ruta, ContentFile(_jpeg(imagen, calidad)))
+    return ruta
+
+
+def procesar(empleado, datos=None):
+    """
+    Normaliza la foto de 'empleado.foto_perfil' (recién subida y aún sin guardar, o los
+    bytes 'datos' de una foto anterior) y asigna las rutas de la foto, el recorte y la
+    miniatura. No guarda el empleado.
+    """
+    if datos is None:
+        archivo = empleado.foto_perfil
+        archivo.open('rb')
+        datos = archivo.read()
+    huella = hashlib.sha256(datos).hexdigest()
+    ruta_original, ruta_recorte, ruta_miniatura = rutas(huella)
+    opciones = configuracion()
+
+    imagen = normalizar(datos, opciones['MAX_LADO'])
+    _guardar(ruta_original, imagen, opciones['CALIDAD_JPEG'])
+
+    miniatura = imagen.copy()
+    miniatura.thumbnail((opciones['LADO_MINIATURA'], opciones['LADO_MINIATURA']))
+    empleado.foto_miniatura = _guardar(ruta_miniatura, miniatura, opciones['CALIDAD_JPEG'])
+
+    try:
+        recorte = recortar_rostro(imagen, opciones['LADO_RECORTE'], opciones['MARGEN_RECORTE'])
+    except Exception as e:
+        # Sin recorte el encoding se calcula sobre la foto completa, como antes.
+        print(f"No se pudo recortar el rostro de {empleado}: {e}")
+        recorte = None
+    empleado.foto_recorte = _guardar(ruta_recorte, recorte, opciones['CALIDAD_JPEG']) if recorte is not None else ''
+
+    empleado.foto_perfil = ruta_original
+
+
+def referenciados():
+    """
+    Conjunto de rutas de fotos que usa algún empleado.
+    """
+    from .models import Empleado
+
+    usados = set()
+    for fila in Empleado.objects.values_list('foto_perfil', 'foto_recorte', 'foto_miniatura').iterator():
+        usados.update(ruta for ruta in fila if ruta)
+    return usados
+
+
+def archivos(carpeta=CARPETA):
+    """
+    Recorre recursivamente los archivos de la carpeta en el almacenamiento.
+    """
+    if not default_storage.exists(carpeta):
+        return
+    subcarpetas, nombres = default_storage.listdir(carpeta)
+    for nombre in nombres:
+        yield f'{carpeta}/{nombre}'
+    for subcarpeta in subcarpetas:
+        yield from archivos(f'{carpeta}/{subcarpeta}')
@@ -0,0 +1,205 @@
+# empleados/identificacion.py
+"""
+Índice en memoria para la identificación facial 1:N.
+
+Todos los encodings vigentes se guardan en una única matriz NumPy (N x 128) y una
+búsqueda calcula la distancia euclídea contra todas las filas en una sola operación
+vectorizada:  |a - b|² = |a|² - 2·a·b + |b|²  (las normas |a|² se precalculan).
+
+El índice se carga de forma perezosa en la primera búsqueda, se actualiza fila a
+fila con las señales de Empleado (ver signals.py) y se recarga por completo cada
+INDICE_FACIAL_TTL segundos para recoger cambios hechos desde otros procesos. La
+recarga corre en un hilo aparte y construye la matriz nueva sin bloquear: las
+búsquedas siguen usando la anterior hasta que se sustituye de una vez.
+"""
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+
+from .biometria import deserializar_encoding, origen_encoding
+
+DIMENSION = 128
+
+
+class IndiceFacial:
+
+    def __init__(self, ttl=None):
+        self.ttl = ttl
+        self._lock = threading.RLock()
+        # Serializa las recargas completas (la primera carga y las del TTL).
+        self._lock_carga = threading.Lock()
+        self._recargando = False
+        self._cambios = None  # altas/bajas recibidas durante una recarga
+        self._vaciar()
+
+    def _vaciar(self):
+        self._matriz = np.empty((0, DIMENSION), dtype=np.float32)
+        self._normas = np.empty(0, dtype=np.float32)
+        self._ids = np.empty(0, dtype=np.int64)
+        self._filas = {}  # empleado_id -> fila
+        self._total = 0
+        self._cargado_en = None
+
+    def __len__(self):
+        return self._total
+
+    @property
+    def cargado(self):
+        return self._cargado_en is not None
+
+    # --- Carga ---
+
+    def cargar(self):
+        """
+        Reconstruye el índice con todos los encodings vigentes de la BD. La consulta y
+        la matriz nueva se preparan fuera del lock; las búsquedas solo esperan el cambio
+        de referencias.
+        """
+        with self._lock_carga:
+            self._cargar()
+
+    def _cargar(self):
+        from .models import Empleado
+
+        with self._lock:
+            self._cambios = []
+
+        filas = (
+            Empleado.objects
+            .filter(encoding_facial__isnull=False)
+            .values_list('id', 'encoding_facial', 'encoding_origen', 'foto_perfil')
+        )
+        ids, vectores = [], []
+        try:
+            for empleado_id, encoding, origen, foto in filas.iterator(chunk_size=2000):
+                if foto and origen == origen_encoding(foto):
+                    ids.append(empleado_id)
+                    vectores.append(deserializar_encoding(encoding))
+        except Exception:
+            with self._lock:
+                self._cambios = None
+            raise
+
+        matriz = np.vstack(vectores).astype(np.float32) if ids else np.empty((0, DIMENSION), dtype=np.float32)
+        normas = np.einsum('ij,ij->i', matriz, matriz)
+        ids_matriz = np.asarray(ids, dtype=np.int64)
+        filas_por_id = {empleado_id: i for i, empleado_id in enumerate(ids)}
+
+        with self._lock:
+            self._matriz, self._normas, self._ids = matriz, normas, ids_matriz
+            self._filas, self._total = filas_por_id, len(ids)
+            self._cargado_en = time.monotonic()
+            # Lo que cambió mientras se leía la BD se aplica sobre la matriz nueva.
+            cambios, self._cambios = self._cambios, None
+            for empleado_id, encoding in cambios:
+                self._aplicar(empleado_id, encoding)
+
+    def _recargar_en_segundo_plano(self):
+        from django.db import connection
+
+        try:
+            self.cargar()
+        except Exception as e:
+            print(f"No se pudo recargar el índice facial: {e}")
+            with self._lock:
+                # Se reintenta al vencer de nuevo el TTL, no en cada búsqueda.
+                self._cargado_en = time.monotonic()
+        finally:
+            self._recargando = False
+            connection.close()
+
+    def _asegurar_cargado(self):
+        if self._cargado_en is None:
+            # Sin índice no se puede responder: la primera carga sí se espera.
+            with self._lock_carga:
+                if self._cargado_en is None:
+                    self._cargar()
+        elif (
+            self.ttl is not None and time.monotonic() - self._cargado_en > self.ttl
+            and not self._recargando
+        ):
+            self._recargando = True
+            threading.Thread(target=self._recargar_en_segundo_plano, daemon=True).start()
+
+    def _reservar(self, capacidad):
+        # Crecimiento geométrico para que las altas incrementales sean O(1) amortizado.
+        if capacidad <= len(self._ids):
+            return
+        nueva = max(capacidad, 2 * len(self._ids), 64)
+        matriz = np.empty((nueva, DIMENSION), dtype=np.float32)
+        normas = np.empty(nueva, dtype=np.float32)
+        ids = np.empty(nueva, dtype=np.int64)
+        matriz[:self._total] = self._matriz[:self._total]
+        normas[:self._total] = self._normas[:self._total]
+        ids[:self._total] = self._ids[:self._total]
+        self._matriz, self._normas, self._ids = matriz, normas, ids
+
+    # --- Actualización incremental ---
+
+    def actualizar(self, empleado_id, encoding):
+        """
+        Inserta o reemplaza el encoding de un empleado (None lo elimina).
+        Si el índice aún no se ha cargado no hace nada: se cargará completo al usarse.
+        """
+        with self._lock:
+            if self._cambios is not None:
+                self._cambios.append((empleado_id, encoding))
+            if self.cargado:
+                self._aplicar(empleado_id, encoding)
+
+    def eliminar(self, empleado_id):
+        self.actualizar(empleado_id, None)
+
+    def _aplicar(self, empleado_id, encoding):
+        if encoding is None:
+            self._quitar(empleado_id)
+            return
+        fila = self._filas.get(empleado_id)
+        if fila is None:
+            self._reservar(self._total + 1)
+            fila = self._total
+            self._filas[empleado_id] = fila
+            self._ids[fila] = empleado_id
+            self._total += 1
+        vector = np.asarray(encoding, dtype=np.float32)
+        self._matriz[fila] = vector
+        self._normas[fila] = vector @ vector
+
+    def _quitar(self, empleado_id):
+        fila = self._filas.pop(empleado_id, None)
+        if fila is None:
+            return
+        # Movemos la última fila al hueco para mantener la matriz compacta.
+        ultima = self._total - 1
+        if fila != ultima:
+            self._matriz[fila] = self._matriz[ultima]
+            self._normas[fila] = self._normas[ultima]
+            self._ids[fila] = self._ids[ultima]
+            self._filas[int(self._ids[fila])] = fila
+        self._total = ultima
+
+    # --- Búsqueda ---
+
+    def buscar(self, encoding, tolerancia=0.5):
+        """
+        Devuelve (empleado_id, distancia) del empleado más cercano, o None si
+        ninguno está dentro de la tolerancia.
+        """
+        self._asegurar_cargado()
+        with self._lock:
+            if self._total == 0:
+                return None
+            vector = np.asarray(encoding, dtype=np.float32)
+            distancias2 = self._normas[:self._total] - 2 * (self._matriz[:self._total] @ vector) + vector @ vector
+            fila = int(np.argmin(distancias2))
+            distancia = float(np.sqrt(max(distancias2[fila], 0.0)))
+            empleado_id = int(self._ids[fila])
+
+        if distancia > tolerancia:
+            return None
+        return empleado_id, distancia
+
+
+indice_facial = IndiceFacial(ttl=getattr(settings, 'INDICE_FACIAL_TTL', 300))
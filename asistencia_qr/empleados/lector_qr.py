@@ -0,0 +1,136 @@
+# empleados/lector_qr.py
+"""
+Lectura de códigos QR en el servidor, para kioscos cuyo navegador decodifica lento.
+
+El kiosco envía uno o varios fotogramas pequeños en escala de grises (JPEG/PNG) y
+se devuelve el texto del primer QR encontrado. Por cada fotograma:
+
+    1. Decodificación directa en escala de grises y reducida a MAX_LADO px.
+    2. Región central (FRACCION_ROI), donde el empleado coloca la credencial, y
+       solo si ahí no hay QR, el fotograma completo.
+    3. pyzbar (zbar) primero, que es más rápido; cv2.QRCodeDetector si pyzbar no
+       está disponible o no encuentra nada.
+
+En cuanto un fotograma da un resultado, los demás no se procesan.
+
+pyzbar es opcional: se importa en el primer uso y, si falta el paquete o la
+biblioteca zbar (libzbar.dll en Windows), se usa solo OpenCV.
+"""
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+
+_pyzbar = None
+# Un QRCodeDetector por hilo: los objetos de OpenCV no son seguros entre hilos.
+_local = threading.local()
+
+
+class FotogramaInvalido(Exception):
+    """
+    Los bytes recibidos no son una imagen que se pueda decodificar.
+    """
+
+
+def configuracion():
+    lector = {'MAX_LADO': 640, 'FRACCION_ROI': 0.8, 'MAX_FOTOGRAMAS': 5, 'MAX_BYTES': 512 * 1024}
+    lector.update(getattr(settings, 'LECTOR_QR', {}))
+    return lector
+
+
+def _decodificador_pyzbar():
+    """
+    Módulo pyzbar.pyzbar, o False si no está disponible (se intenta una sola vez).
+    """
+    global _pyzbar
+    if _pyzbar is None:
+        try:
+            from pyzbar import pyzbar
+        except (ImportError, OSError) as e:
+            print(f"pyzbar no disponible, se usará solo OpenCV: {e}")
+            _pyzbar = False
+        else:
+            _pyzbar = pyzbar
+    return _pyzbar
+
+
+def cargar_gris(datos, max_lado):
+    """
+    Decodifica la imagen directamente en escala de grises y la reduce a 'max_lado' px.
+    """
+    import cv2
+
+    gris = cv2.imdecode(np.frombuffer(datos, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+    if gris is None:
+        raise FotogramaInvalido("El fotograma no es una imagen válida.")
+    escala = max_lado / max(gris.shape)
+    if escala < 1.0:
+        gris = cv2.resize(gris, None, fx=escala, fy=escala, interpolation=cv2.INTER_AREA)
+    return gris
+
+
+def regiones(gris, fraccion):
+    """
+    Región central del fotograma y, después, el fotograma completo.
+    """
+    if fraccion < 1.0:
+        alto, ancho = gris.shape
+        dy, dx = int(alto * (1 - fraccion) / 2), int(ancho * (1 - fraccion) / 2)
+        yield gris[dy:alto - dy, dx:ancho - dx]
+    yield gris
+
+
+def _leer_pyzbar(pyzbar, region):
+    for simbolo in pyzbar.decode(region, symbols=[pyzbar.ZBarSymbol.QRCODE]):
+        texto = simbolo.data.decode('utf-8', errors='replace')
+        if texto:
+            return texto
+    return None
+
+
+def _leer_opencv(region):
+    import cv2
+
+    detector = getattr(_local, 'detector', None)
+    if detector is None:
+        detector = _local.detector = cv2.QRCodeDetector()
+    texto, _, _ = detector.detectAndDecode(region)
+    return texto or None
+
+
+def leer_fotograma(gris, fraccion=0.8):
+    """
+    Devuelve (texto, lector) del primer QR encontrado en el fotograma, o None.
+    """
+    pyzbar = _decodificador_pyzbar()
+    for region in regiones(gris, fraccion):
+        region = np.ascontiguousarray(region)
+        if pyzbar:
+            texto = _leer_pyzbar(pyzbar, region)
+            if texto:
+                return texto, 'pyzbar'
+        texto = _leer_opencv(region)
+        if texto:
+            return texto, 'opencv'
+    return None
+
+
+def leer_lote(fotogramas, opciones=None):
+    """
+    Busca un QR en los fotogramas (bytes de imagen) en orden y se detiene en el primero
+    que lo contenga. Devuelve un dict con 'texto' (None si no hubo QR), 'fotograma'
+    (índice), 'lector', 'procesados' y 'tiempo_ms'.
+    """
+    opciones = opciones or configuracion()
+    inicio = time.perf_counter()
+    resultado = {'texto': None, 'fotograma': None, 'lector': None, 'procesados': 0}
+    for indice, datos in enumerate(fotogramas):
+        gris = cargar_gris(datos, opciones['MAX_LADO'])
+        resultado['procesados'] += 1
+        leido = leer_fotograma(gris, opciones['FRACCION_ROI'])
+        if leido:
+            resultado.update(texto=leido[0], lector=leido[1], fotograma=indice)
+            break
+    resultado['tiempo_ms'] = round((time.perf_counter() - inicio) * 1000, 1)
+    return resultado
@@ -0,0 +1,178 @@
+# empleados/limites.py
+"""
+Limitación de peticiones (token bucket) para los endpoints biométricos.
+
+Cada ámbito tiene un cubo por identificador: 'cliente' (IP del kiosco) y 'empleado'
+(ID al que se intenta marcar). Un cubo admite ráfagas de hasta CAPACIDAD peticiones
+y se rellena a POR_MINUTO fichas por minuto. Si no quedan fichas, la petición se
+rechaza con 429 y Retry-After antes de leer la imagen o consultar la BD, así que un
+kiosco en bucle (o un atacante) no consume el CPU del pool facial.
+
+El estado de los cubos se guarda en la caché de Django (CACHES en settings.py). Con
+la caché en memoria por defecto cada proceso lleva sus propios cubos; con varios
+workers, configure una caché compartida (REDIS_URL) para que el límite sea global.
+La lectura y escritura del cubo no es atómica entre procesos: bajo carga concurrente
+puede dejar pasar alguna petición de más, lo que es aceptable para este propósito.
+"""
+import asyncio
+import functools
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import JsonResponse
+
+_lock = threading.Lock()
+
+
+class LimiteExcedido(Exception):
+    """
+    No quedan fichas en el cubo; el cliente debe esperar 'retry_after' segundos.
+    """
+    def __init__(self, ambito, retry_after):
+        super().__init__(f"Límite de peticiones excedido ({ambito}); reintente en {retry_after} s.")
+        self.ambito = ambito
+        self.retry_after = retry_after
+
+
+def configuracion():
+    limites = {
+        'CACHE': 'default',
+        'CLIENTE': {'CAPACIDAD': 20, 'POR_MINUTO': 30},
+        'EMPLEADO': {'CAPACIDAD': 5, 'POR_MINUTO': 6},
+        # Cabecera con la IP real del cliente si hay un proxy inverso delante
+        # (p. ej. 'HTTP_X_FORWARDED_FOR'); None = REMOTE_ADDR.
+        'CABECERA_IP': None,
+        # Proxies de confianza que añaden su entrada a CABECERA_IP (ver _ip()).
+        'PROXIES_CONFIABLES': 1,
+    }
+    limites.update(getattr(settings, 'LIMITES_CHECKIN', {}))
+    return limites
+
+
+def _ip(meta, cabecera, proxies=1):
+    if cabecera and meta.get(cabecera):
+        # X-Forwarded-For: "cliente, proxy1, proxy2". Cada proxy añade a la derecha la IP
+        # de la que recibió la petición; lo que hay más a la izquierda lo escribe el
+        # cliente y no es fiable (cambiándolo tendría un cubo nuevo en cada petición).
+        # Con N proxies de confianza, la IP real es la N-ésima empezando por la derecha.
+        direcciones = [d.strip() for d in meta[cabecera].split(',') if d.strip()]
+        if direcciones:
+            return direcciones[-min(proxies, len(direcciones))]
+    return meta.get('REMOTE_ADDR', '')
+
+
+def ip_cliente(request, cabecera=None, proxies=1):
+    return _ip(request.META, cabecera, proxies)
+
+
+def ip_cliente_asgi(scope, cabecera=None, proxies=1):
+    """
+    Igual que ip_cliente() para un scope ASGI (WebSocket): las cabeceras se leen con
+    los mismos nombres que request.META ('HTTP_X_FORWARDED_FOR'). Si la cabecera se
+    repite, sus valores se unen en orden, como hace el servidor WSGI.
+    """
+    meta = {'REMOTE_ADDR': (scope.get('client') or ('',))[0]}
+    for nombre, valor in scope.get('headers', []):
+        clave = 'HTTP_' + nombre.decode('latin-1').upper().replace('-', '_')
+        valor = valor.decode('latin-1')
+        meta[clave] = f"{meta[clave]},{valor}" if clave in meta else valor
+    return _ip(meta, cabecera, proxies)
+
+
+def _consumir(estado, capacidad, por_segundo, ahora):
+    """
+    Aplica una petición al cubo 'estado' (fichas, instante) y devuelve
+    (nuevo estado, segundos de espera); 0 segundos = petición admitida.
+    """
+    fichas, instante = estado if estado else (capacidad, ahora)
+    fichas = min(capacidad, fichas + (ahora - instante) * por_segundo)
+    if fichas >= 1:
+        return (fichas - 1, ahora), 0
+    return (fichas, ahora), max(1, math.ceil((1 - fichas) / por_segundo))
+
+
+def _parametros(ambito, opciones):
+    cubo = opciones.get(ambito.upper())
+    if not cubo:
+        return None
+    por_segundo = cubo['POR_MINUTO'] / 60
+    # El cubo se olvida cuando estaría lleno de nuevo: no ocupa la caché para siempre.
+    ttl = math.ceil(cubo['CAPACIDAD'] / por_segundo) + 1
+    return cubo['CAPACIDAD'], por_segundo, ttl
+
+
+def comprobar(ambito, identificador, opciones=None):
+    """
+    Consume una ficha del cubo (ambito, identificador). Lanza LimiteExcedido si está vacío.
+    """
+    opciones = opciones or configuracion()
+    parametros = _parametros(ambito, opciones)
+    if parametros is None:
+        return
+    capacidad, por_segundo, ttl = parametros
+    cache = caches[opciones['CACHE']]
+    clave = f"limite:{ambito}:{identificador}"
+    with _lock:
+        estado, espera = _consumir(cache.get(clave), capacidad, por_segundo, time.time())
+        cache.set(clave, estado, ttl)
+    if espera:
+        raise LimiteExcedido(ambito, espera)
+
+
+async def acomprobar(ambito, identificador, opciones=None):
+    """
+    Igual que comprobar(), para vistas asíncronas.
+    """
+    opciones = opciones or configuracion()
+    parametros = _parametros(ambito, opciones)
+    if parametros is None:
+        return
+    capacidad, por_segundo, ttl = parametros
+    cache = caches[opciones['CACHE']]
+    clave = f"limite:{ambito}:{identificador}"
+    estado, espera = _consumir(await cache.aget(clave), capacidad, por_segundo, time.time())
+    await cache.aset(clave, estado, ttl)
+    if espera:
+        raise LimiteExcedido(ambito, espera)
+
+
+def respuesta_429(error):
+    return JsonResponse(
+        {'success': False, 'message': 'Demasiadas solicitudes. Espere unos segundos e intente de nuevo.'},
+        status=429,
+        headers={'Retry-After': str(error.retry_after)},
+    )
+
+
+def limitar(funcion):
+    """
+    Decorador de vistas: cubo por IP del cliente y, si la URL lleva 'empleado_id', por
+    empleado. Rechaza con 429 antes de ejecutar la vista.
+    """
+    if asyncio.iscoroutinefunction(funcion):
+        @functools.wraps(funcion)
+        async def envoltura_async(request, *args, **kwargs):
+            opciones = configuracion()
+            try:
+                await acomprobar('cliente', ip_cliente(request, opciones['CABECERA_IP'], opciones['PROXIES_CONFIABLES']), opciones)
+                if 'empleado_id' in kwargs:
+                    await acomprobar('empleado', kwargs['empleado_id'], opciones)
+            except LimiteExcedido as e:
+                return respuesta_429(e)
+            return await funcion(request, *args, **kwargs)
+        return envoltura_async
+
+    @functools.wraps(funcion)
+    def envoltura(request, *args, **kwargs):
+        opciones = configuracion()
+        try:
+            comprobar('cliente', ip_cliente(request, opciones['CABECERA_IP'], opciones['PROXIES_CONFIABLES']), opciones)
+            if 'empleado_id' in kwargs:
+                comprobar('empleado', kwargs['empleado_id'], opciones)
+        except LimiteExcedido as e:
+            return respuesta_429(e)
+        return funcion(request, *args, **kwargs)
+    return envoltura
@@ -0,0 +1,233 @@
+import json
+import random
+import sys
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from empleados import biometria, identificacion, procesamiento, qr
+from empleados.models import Asistencia, Empleado, EstadoEmpleado
+
+try:
+    import resource
+except ImportError:
+    # Windows: no hay getrusage(); el informe omite el RSS pico.
+    resource = None
+
+FOTO_FALSA = 'benchmark/falsa.jpg'
+
+
+# =========================================================
+# === Backend facial falso (sin dlib) ===
+# =========================================================
+# La "imagen" capturada es b'FALSO:<id>' y su encoding es un vector determinista
+# derivado del ID, el mismo que se guarda como referencia del empleado. Así se mide
+# todo el camino del check-in excepto el coste de dlib.
+
+def encoding_falso(empleado_id):
+    return np.random.default_rng(empleado_id).normal(0, 0.1, 128)
+
+
+def codificar_captura_falsa(foto_bytes, opciones=None, backend=None, calidad=None):
+    empleado_id = int(bytes(foto_bytes).split(b':', 1)[1])
+    return [encoding_falso(empleado_id)], {}
+
+
+def _percentiles(latencias):
+    ms = np.asarray(latencias) * 1000
+    return {
+        'p50_ms': round(float(np.percentile(ms, 50)), 3),
+        'p95_ms': round(float(np.percentile(ms, 95)), 3),
+        'p99_ms': round(float(np.percentile(ms, 99)), 3),
+        'media_ms': round(float(ms.mean()), 3),
+    }
+
+
+def _rss_pico_mb():
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta KB; macOS, bytes.
+    return round(pico / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark reproducible del camino de check-in (procesar_qr, registrar_asistencia_final, "
+        "identificar_asistencia, generar_qr_empleado y /api/asistencias/) sobre datos sintéticos "
+        "en una BD de pruebas temporal. Imprime p50/p95/p99, throughput y RSS pico en JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--empleados', default='100,10000,100000',
+                            help="Tamaños de dataset separados por comas (por defecto 100,10000,100000).")
+        parser.add_argument('--asistencias', type=int, default=1_000_000,
+                            help="Filas de asistencia sintéticas por dataset.")
+        parser.add_argument('--iteraciones', type=int, default=500, help="Peticiones medidas por escenario.")
+        parser.add_argument('--calentamiento', type=int, default=20, help="Peticiones previas no medidas.")
+        parser.add_argument('--backend', choices=['falso', 'real'], default='falso',
+                            help="'falso' omite el reconocimiento facial; 'real' usa BACKEND_FACIAL con --imagen.")
+        parser.add_argument('--imagen', help="JPEG con un rostro (obligatorio con --backend real).")
+        parser.add_argument('--semilla', type=int, default=42)
+        parser.add_argument('--salida', help="Archivo JSON de salida (por defecto, stdout).")
+
+    def handle(self, *args, **options):
+        if options['backend'] == 'real' and not options['imagen']:
+            raise CommandError("--backend real requiere --imagen con una foto que tenga un rostro.")
+        tamanos = [int(n) for n in options['empleados'].split(',') if n.strip()]
+        random.seed(options['semilla'])
+
+        informe = {
+            'backend': options['backend'],
+            'iteraciones': options['iteraciones'],
+            'motor_bd': connection.vendor,
+            'datasets': [],
+        }
+
+        setup_test_environment()
+        nombre_original = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            # Sin límite de peticiones: se mide el check-in, no las respuestas 429.
+            limites_desactivados = {'CLIENTE': None, 'EMPLEADO': None}
+            with override_settings(
+                ALLOWED_HOSTS=['*'], ASISTENCIA_DEBOUNCE_SEGUNDOS=0, LIMITES_CHECKIN=limites_desactivados,
+            ):
+                for tamano in tamanos:
+                    self.stderr.write(f"Generando dataset: {tamano} empleados, {options['asistencias']} asistencias...")
+                    self._generar_dataset(tamano, options['asistencias'], options)
+                    informe['datasets'].append({
+                        'empleados': tamano,
+                        'asistencias': options['asistencias'],
+                        'escenarios': self._medir_escenarios(tamano, options),
+                    })
+        finally:
+            connection.creation.destroy_test_db(nombre_original, verbosity=0)
+            teardown_test_environment()
+
+        salida = json.dumps(informe, indent=2, ensure_ascii=False)
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as archivo:
+                archivo.write(salida)
+            self.stderr.write(self.style.SUCCESS(f"Informe guardado en {options['salida']}"))
+        else:
+            self.stdout.write(salida)
+
+    # --- Datos sintéticos ---
+
+    def _generar_dataset(self, tamano, total_asistencias, options):
+        Asistencia.objects.all().delete()
+        EstadoEmpleado.objects.all().delete()
+        Empleado.objects.all().delete()
+        biometria._cache_encodings.clear()
+        qr.render_qr.cache_clear()
+
+        if options['backend'] == 'real':
+            referencia = biometria.calcular_encoding(options['imagen'])
+            if referencia is None:
+                raise CommandError("No se detectó ningún rostro en --imagen.")
+            foto = options['imagen']
+
+        lote = []
+        for i in range(1, tamano + 1):
+            if options['backend'] == 'real':
+                encoding, foto_nombre = referencia, foto
+            else:
+                encoding, foto_nombre = encoding_falso(i), FOTO_FALSA
+            lote.append(Empleado(
+                id=i, nombre=f"Empleado {i}", dni=f"BM{i:08d}", area=f"Área {i % 20}",
+                foto_perfil=foto_nombre, encoding_facial=biometria.serializar_encoding(encoding),
+                encoding_origen=biometria.origen_encoding(foto_nombre),
+            ))
+            if len(lote) == 5000:
+                Empleado.objects.bulk_create(lote)
+                lote = []
+        Empleado.objects.bulk_create(lote)
+
+        inicio = timezone.now() - timedelta(days=365)
+        paso = timedelta(days=365) / max(total_asistencias, 1)
+        lote = []
+        for i in range(total_asistencias):
+            lote.append(Asistencia(
+                empleado_id=random.randint(1, tamano),
+                fecha_hora=inicio + paso * i,
+                tipo='entrada' if i % 2 == 0 else 'salida',
+            ))
+            if len(lote) == 10000:
+                Asistencia.objects.bulk_create(lote)
+                lote = []
+        Asistencia.objects.bulk_create(lote)
+
+        identificacion.indice_facial.cargar()
+
+    # --- Escenarios ---
+
+    def _medir_escenarios(self, tamano, options):
+        cliente = Client()
+        # generar_qr_empleado devuelve credenciales: solo para staff.
+        cliente.force_login(User.objects.get_or_create(
+            username='benchmark', defaults={'is_staff': True})[0])
+        real = options['backend'] == 'real'
+        foto_real = open(options['imagen'], 'rb').read() if real else None
+
+        def captura(empleado_id):
+            return foto_real if real else f"FALSO:{empleado_id}".encode()
+
+        escenarios = {
+            'procesar_qr': lambda i: cliente.post(
+                '/procesar_qr/', {'qr_data': qr.contenido_qr(i, 0)}),
+            'registrar_asistencia_final': lambda i: cliente.post(
+                f'/registrar_asistencia_final/{i}/', data=captura(i), content_type='image/jpeg'),
+            'identificar_asistencia': lambda i: cliente.post(
+                '/identificar_asistencia/', data=captura(i), content_type='image/jpeg'),
+            'generar_qr_empleado': lambda i: cliente.get(f'/qr/empleado/{i}/?v=0'),
+            'listado_asistencias': lambda i: cliente.get('/api/asistencias/', HTTP_ACCEPT='application/json'),
+            'listado_asistencias_empleado': lambda i: cliente.get(
+                f'/api/asistencias/?empleado={i}', HTTP_ACCEPT='application/json'),
+            'ultimo_registro': lambda i: cliente.get(
+                f'/api/asistencias/ultimo/?empleado={i}', HTTP_ACCEPT='application/json'),
+        }
+
+        codificar_original, pool_original = procesamiento.codificar_captura, procesamiento.pool_facial
+        if not real:
+            procesamiento.codificar_captura = codificar_captura_falsa
+            procesamiento.pool_facial = procesamiento.PoolFacial(workers=0, max_pendientes=1)
+
+        resultados = {}
+        try:
+            for nombre, peticion in escenarios.items():
+                resultados[nombre] = self._medir(nombre, peticion, tamano, options)
+        finally:
+            procesamiento.codificar_captura, procesamiento.pool_facial = codificar_original, pool_original
+        return resultados
+
+    def _medir(self, nombre, peticion, tamano, options):
+        for _ in range(options['calentamiento']):
+            peticion(random.randint(1, tamano))
+
+        latencias, errores = [], 0
+        inicio = time.perf_counter()
+        for _ in range(options['iteraciones']):
+            empleado_id = random.randint(1, tamano)
+            t0 = time.perf_counter()
+            respuesta = peticion(empleado_id)
+            latencias.append(time.perf_counter() - t0)
+            if respuesta.status_code >= 400:
+                errores += 1
+        total = time.perf_counter() - inicio
+
+        resultado = {
+            **_percentiles(latencias),
+            'throughput_rps': round(len(latencias) / total, 1),
+            'errores': errores,
+            'rss_pico_mb': _rss_pico_mb(),
+        }
+        self.stderr.write(f"  {nombre}: p50 {resultado['p50_ms']} ms, p99 {resultado['p99_ms']} ms, "
+                          f"{resultado['throughput_rps']} req/s, errores {errores}")
+        return resultado
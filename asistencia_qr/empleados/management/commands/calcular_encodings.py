@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+
+from empleados import biometria
+from empleados.models import Empleado
+
+
+class Command(BaseCommand):
+    help = "Calcula y guarda el encoding facial de los empleados con foto de perfil (backfill)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--forzar', action='store_true',
+            help="Recalcula también los encodings que ya están vigentes.",
+        )
+        parser.add_argument(
+            '--ids', nargs='+', type=int,
+            help="Limita el cálculo a los IDs de empleado indicados.",
+        )
+
+    def handle(self, *args, **options):
+        empleados = Empleado.objects.exclude(foto_perfil='').exclude(foto_perfil__isnull=True)
+        if options['ids']:
+            empleados = empleados.filter(id__in=options['ids'])
+
+        calculados = omitidos = sin_rostro = errores = 0
+        for empleado in empleados.iterator():
+            if biometria.encoding_vigente(empleado) and not options['forzar']:
+                omitidos += 1
+                continue
+            try:
+                encoding = biometria.actualizar_encoding(empleado)
+            except Exception as e:
+                errores += 1
+                self.stderr.write(f"Error con {empleado} (ID {empleado.id}): {e}")
+                continue
+            if encoding is None:
+                sin_rostro += 1
+                self.stderr.write(f"Sin rostro detectable: {empleado} (ID {empleado.id})")
+            else:
+                calculados += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Encodings calculados: {calculados} | vigentes omitidos: {omitidos} | "
+            f"sin rostro: {sin_rostro} | errores: {errores}"
+        ))
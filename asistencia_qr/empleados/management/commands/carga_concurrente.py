@@ -0,0 +1,127 @@
+import json
+import threading
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection, connections
+from django.test.utils import override_settings
+
+from empleados import marcaciones
+from empleados.models import Empleado
+
+
+def _percentiles(latencias):
+    if not latencias:
+        return {}
+    ms = np.asarray(latencias) * 1000
+    return {
+        'p50_ms': round(float(np.percentile(ms, 50)), 2),
+        'p95_ms': round(float(np.percentile(ms, 95)), 2),
+        'p99_ms': round(float(np.percentile(ms, 99)), 2),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Prueba de carga de escritores concurrentes: varios hilos (kioscos) registran marcas "
+        "a la vez con registrar_marca() sobre una BD de pruebas temporal del motor configurado "
+        "(ASISTENCIA_DB). Compare, p. ej., SQLITE_WAL=0, el valor por defecto y ASISTENCIA_DB=postgres."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hilos', type=int, default=8, help="Escritores concurrentes.")
+        parser.add_argument('--segundos', type=float, default=10, help="Duración de la prueba.")
+        parser.add_argument('--empleados', type=int, default=200, help="Empleados sintéticos.")
+        parser.add_argument('--salida', help="Archivo JSON de salida (por defecto, stdout).")
+
+    def handle(self, *args, **options):
+        alias = connection.alias
+        if connection.vendor == 'sqlite':
+            # La BD de pruebas de SQLite es en memoria por defecto: usamos un archivo para
+            # medir el bloqueo real entre conexiones.
+            connection.settings_dict.setdefault('TEST', {})['NAME'] = str(
+                connection.settings_dict['NAME']) + '.carga'
+        nombre_original = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            Empleado.objects.bulk_create([
+                Empleado(id=i, nombre=f"Empleado {i}", dni=f"CC{i:08d}", area=f"Área {i % 5}")
+                for i in range(1, options['empleados'] + 1)
+            ])
+            with override_settings(ASISTENCIA_DEBOUNCE_SEGUNDOS=0):
+                informe = self._medir(options)
+            informe.update({
+                'motor_bd': connection.vendor,
+                'opciones_bd': {k: v for k, v in connection.settings_dict.get('OPTIONS', {}).items() if k != 'pool'},
+                'conn_max_age': connection.settings_dict.get('CONN_MAX_AGE'),
+            })
+        finally:
+            connections[alias].close()
+            connection.creation.destroy_test_db(nombre_original, verbosity=0)
+
+        salida = json.dumps(informe, indent=2, ensure_ascii=False)
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as archivo:
+                archivo.write(salida)
+            self.stderr.write(self.style.SUCCESS(f"Informe guardado en {options['salida']}"))
+        else:
+            self.stdout.write(salida)
+
+    def _medir(self, options):
+        hilos, total_empleados = options['hilos'], options['empleados']
+        limite = time.monotonic() + options['segundos']
+        resultados = []
+        lock = threading.Lock()
+        inicio_comun = threading.Barrier(hilos)
+
+        def escritor(numero):
+            # Cada hilo reparte marcas entre todos los empleados, de modo que varios
+            # hilos compiten también por el mismo empleado.
+            latencias, errores, duplicadas, bloqueos = [], 0, 0, 0
+            empleados = {e.id: e for e in Empleado.objects.all()}
+            paso = 0
+            inicio_comun.wait()
+            try:
+                while time.monotonic() < limite:
+                    empleado = empleados[(numero + paso * hilos) % total_empleados + 1]
+                    paso += 1
+                    t0 = time.perf_counter()
+                    try:
+                        marcaciones.registrar_marca(empleado)
+                        latencias.append(time.perf_counter() - t0)
+                    except marcaciones.MarcaDuplicada:
+                        duplicadas += 1
+                    except OperationalError as e:
+                        if 'locked' in str(e):
+                            bloqueos += 1
+                        else:
+                            errores += 1
+            finally:
+                connection.close()
+            with lock:
+                resultados.append((latencias, errores, duplicadas, bloqueos))
+
+        inicio = time.perf_counter()
+        trabajadores = [threading.Thread(target=escritor, args=(n,)) for n in range(hilos)]
+        for trabajador in trabajadores:
+            trabajador.start()
+        for trabajador in trabajadores:
+            trabajador.join()
+        duracion = time.perf_counter() - inicio
+
+        latencias = [l for r in resultados for l in r[0]]
+        informe = {
+            'hilos': hilos,
+            'segundos': round(duracion, 2),
+            'marcas_registradas': len(latencias),
+            'marcas_por_segundo': round(len(latencias) / duracion, 1),
+            'errores_bloqueo': sum(r[3] for r in resultados),
+            'conflictos_rebote': sum(r[2] for r in resultados),
+            'otros_errores': sum(r[1] for r in resultados),
+            **_percentiles(latencias),
+        }
+        self.stderr.write(
+            f"{informe['marcas_por_segundo']} marcas/s, {informe['errores_bloqueo']} errores de bloqueo, "
+            f"p95 {informe.get('p95_ms')} ms"
+        )
+        return informe
@@ -0,0 +1,113 @@
+import json
+import time
+from itertools import combinations
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from empleados import backends, procesamiento
+
+EXTENSIONES = {'.jpg', '.jpeg', '.png', '.webp', '.bmp'}
+BACKENDS = ['empleados.backends.DlibBackend', 'empleados.backends.OpenCVBackend']
+
+
+def _percentiles(valores_ms):
+    ms = np.asarray(valores_ms)
+    return {
+        'p50_ms': round(float(np.percentile(ms, 50)), 2),
+        'p95_ms': round(float(np.percentile(ms, 95)), 2),
+        'media_ms': round(float(ms.mean()), 2),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara los backends faciales (velocidad y precisión) sobre las mismas imágenes. "
+        "Estructura esperada: una subcarpeta por persona con una o más fotos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('carpeta', help="Carpeta con una subcarpeta de imágenes por persona.")
+        parser.add_argument('--backends', nargs='+', default=BACKENDS,
+                            help="Rutas de las clases de backend a comparar.")
+        parser.add_argument('--repeticiones', type=int, default=3,
+                            help="Veces que se codifica cada imagen para medir la latencia.")
+        parser.add_argument('--sin-preprocesado', action='store_true',
+                            help="Codifica la imagen completa en lugar del pipeline reducido.")
+        parser.add_argument('--salida', help="Archivo JSON de salida (por defecto, stdout).")
+
+    def handle(self, *args, **options):
+        imagenes = []
+        for archivo in sorted(Path(options['carpeta']).rglob('*')):
+            if archivo.suffix.lower() in EXTENSIONES:
+                imagenes.append((archivo.parent.name, archivo.name, archivo.read_bytes()))
+        if not imagenes:
+            raise CommandError(f"No hay imágenes en {options['carpeta']}.")
+
+        preprocesado = None if options['sin_preprocesado'] else procesamiento.OPCIONES_PREPROCESADO
+        opciones = dict(getattr(settings, 'BACKEND_FACIAL_OPCIONES', {}))
+
+        informe = {'imagenes': len(imagenes), 'personas': len({p for p, _, _ in imagenes}), 'backends': {}}
+        for ruta in options['backends']:
+            self.stderr.write(f"Midiendo {ruta}...")
+            try:
+                informe['backends'][ruta] = self._medir(ruta, opciones, imagenes, preprocesado, options['repeticiones'])
+            except backends.BackendNoDisponible as e:
+                self.stderr.write(self.style.WARNING(str(e)))
+                informe['backends'][ruta] = {'error': str(e)}
+
+        salida = json.dumps(informe, indent=2, ensure_ascii=False)
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as archivo:
+                archivo.write(salida)
+            self.stderr.write(self.style.SUCCESS(f"Informe guardado en {options['salida']}"))
+        else:
+            self.stdout.write(salida)
+
+    def _medir(self, ruta, opciones, imagenes, preprocesado, repeticiones):
+        configuracion = (ruta, opciones)
+
+        # La primera llamada importa la librería y carga los modelos: se mide aparte.
+        inicio = time.perf_counter()
+        procesamiento.codificar_captura(imagenes[0][2], preprocesado, configuracion)
+        carga_ms = (time.perf_counter() - inicio) * 1000
+        backend = backends.cargar_backend(ruta, opciones)
+
+        totales, etapas, encodings = [], {}, []
+        for persona, nombre, datos in imagenes:
+            for _ in range(repeticiones):
+                inicio = time.perf_counter()
+                resultado, tiempos = procesamiento.codificar_captura(datos, preprocesado, configuracion)
+                totales.append((time.perf_counter() - inicio) * 1000)
+                for etapa, ms in tiempos.items():
+                    etapas.setdefault(etapa, []).append(ms)
+            if resultado:
+                encodings.append((persona, resultado[0]))
+            else:
+                self.stderr.write(f"  {backend.nombre}: sin rostro en {persona}/{nombre}")
+
+        # Precisión con la tolerancia del backend: pares de la misma persona (genuinos)
+        # rechazados y pares de personas distintas (impostores) aceptados.
+        genuinos, impostores = [], []
+        for (persona_a, enc_a), (persona_b, enc_b) in combinations(encodings, 2):
+            (genuinos if persona_a == persona_b else impostores).append(backend.distancia(enc_a, enc_b))
+
+        def tasa(valores, condicion):
+            return round(sum(map(condicion, valores)) / len(valores), 4) if valores else None
+
+        return {
+            'nombre': backend.nombre,
+            'tolerancia': backend.tolerancia,
+            'carga_inicial_ms': round(carga_ms, 1),
+            'latencia': _percentiles(totales),
+            'etapas': {etapa: _percentiles(valores) for etapa, valores in etapas.items()},
+            'imagenes_con_rostro': len(encodings),
+            'pares_genuinos': len(genuinos),
+            'pares_impostores': len(impostores),
+            'falsos_rechazos': tasa(genuinos, lambda d: d > backend.tolerancia),
+            'falsas_aceptaciones': tasa(impostores, lambda d: d <= backend.tolerancia),
+            'distancia_media_genuinos': round(float(np.mean(genuinos)), 4) if genuinos else None,
+            'distancia_media_impostores': round(float(np.mean(impostores)), 4) if impostores else None,
+        }
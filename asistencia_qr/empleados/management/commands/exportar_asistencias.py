@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from empleados import exportacion
+from empleados.models import Asistencia
+from empleados.resumenes import limites_dia
+
+
+class Command(BaseCommand):
+    help = "Exporta las asistencias a CSV o XLSX en streaming (memoria constante para cualquier rango)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--formato', choices=sorted(exportacion.FORMATOS), default='csv')
+        parser.add_argument('--salida', help="Archivo de salida (por defecto asistencias.<formato>).")
+        parser.add_argument('--desde', help="Fecha inicial AAAA-MM-DD (inclusive).")
+        parser.add_argument('--hasta', help="Fecha final AAAA-MM-DD (inclusive).")
+        parser.add_argument('--area', help="Solo empleados de esta área.")
+        parser.add_argument('--ids', nargs='+', type=int, help="Solo estos IDs de empleado.")
+
+    def handle(self, *args, **options):
+        asistencias = Asistencia.objects.all()
+        for nombre in ('desde', 'hasta'):
+            if not options[nombre]:
+                continue
+            fecha = parse_date(options[nombre])
+            if fecha is None:
+                raise CommandError(f"--{nombre}: fecha inválida '{options[nombre]}'. Use AAAA-MM-DD.")
+            inicio, fin = limites_dia(fecha)
+            if nombre == 'desde':
+                asistencias = asistencias.filter(fecha_hora__gte=inicio)
+            else:
+                asistencias = asistencias.filter(fecha_hora__lt=fin)
+        if options['area']:
+            asistencias = asistencias.filter(empleado__area=options['area'])
+        if options['ids']:
+            asistencias = asistencias.filter(empleado_id__in=options['ids'])
+
+        formato = options['formato']
+        salida = options['salida'] or f"asistencias.{formato}"
+        generar, _ = exportacion.FORMATOS[formato]
+        with open(salida, 'wb') as archivo:
+            for bloque in generar(asistencias):
+                archivo.write(bloque)
+
+        self.stdout.write(self.style.SUCCESS(f"Asistencias exportadas en {salida}"))
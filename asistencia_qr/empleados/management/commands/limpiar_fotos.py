@@ -0,0 +1,73 @@
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from empleados import biometria, fotos
+from empleados.models import Empleado
+
+
+class Command(BaseCommand):
+    help = (
+        "Elimina de fotos_empleados/ los archivos que no usa ningún empleado (fotos reemplazadas, "
+        "recortes y miniaturas huérfanas). Con --normalizar, antes convierte las fotos antiguas "
+        "al formato de fotos.py (normalizada, recorte del rostro y miniatura)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Solo lista lo que se haría, sin modificar nada.")
+        parser.add_argument('--normalizar', action='store_true', help="Procesa las fotos de perfil sin miniatura.")
+        parser.add_argument(
+            '--min-horas', type=float, default=1,
+            help="No borra archivos más recientes (pueden ser de una subida en curso). Por defecto 1.",
+        )
+
+    def handle(self, *args, **options):
+        if options['normalizar']:
+            self._normalizar(options['dry_run'])
+
+        usados = fotos.referenciados()
+        limite = timezone.now() - timedelta(hours=options['min_horas'])
+        borrados = recientes = 0
+        liberados = 0
+        for ruta in fotos.archivos():
+            if ruta in usados:
+                continue
+            if default_storage.get_modified_time(ruta) > limite:
+                recientes += 1
+                continue
+            liberados += default_storage.size(ruta)
+            borrados += 1
+            if options['dry_run']:
+                self.stdout.write(f"Se borraría: {ruta}")
+            else:
+                default_storage.delete(ruta)
+
+        accion = "Se borrarían" if options['dry_run'] else "Borrados"
+        self.stdout.write(self.style.SUCCESS(
+            f"{accion} {borrados} archivos huérfanos ({liberados / 1024:.0f} KB) | "
+            f"en uso: {len(usados)} | recientes omitidos: {recientes}"
+        ))
+
+    def _normalizar(self, simulacion):
+        pendientes = (
+            Empleado.objects.exclude(foto_perfil='').exclude(foto_perfil__isnull=True).filter(foto_miniatura='')
+        )
+        procesados = errores = 0
+        for empleado in pendientes.iterator():
+            if simulacion:
+                self.stdout.write(f"Se normalizaría: {empleado.foto_perfil.name} ({empleado}, ID {empleado.id})")
+                continue
+            try:
+                with default_storage.open(empleado.foto_perfil.name, 'rb') as archivo:
+                    fotos.procesar(empleado, archivo.read())
+                empleado.save(update_fields=['foto_perfil', 'foto_recorte', 'foto_miniatura'])
+                biometria.actualizar_encoding(empleado)
+            except Exception as e:
+                errores += 1
+                self.stderr.write(f"Error con {empleado} (ID {empleado.id}): {e}")
+                continue
+            procesados += 1
+        if not simulacion:
+            self.stdout.write(f"Fotos normalizadas: {procesados} | errores: {errores}")
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from empleados import resumenes
+
+
+class Command(BaseCommand):
+    help = "Recalcula los resúmenes diarios de asistencia a partir de las marcas (backfill o corrección)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', help="Fecha inicial AAAA-MM-DD (inclusive).")
+        parser.add_argument('--hasta', help="Fecha final AAAA-MM-DD (inclusive).")
+        parser.add_argument('--ids', nargs='+', type=int, help="Limita el cálculo a los IDs de empleado indicados.")
+
+    def handle(self, *args, **options):
+        fechas = {}
+        for nombre in ('desde', 'hasta'):
+            valor = options[nombre]
+            fechas[nombre] = parse_date(valor) if valor else None
+            if valor and fechas[nombre] is None:
+                raise CommandError(f"--{nombre}: fecha inválida '{valor}'. Use AAAA-MM-DD.")
+
+        total = resumenes.reconstruir(fechas['desde'], fechas['hasta'], options['ids'])
+        self.stdout.write(self.style.SUCCESS(f"Resúmenes diarios recalculados: {total}"))
@@ -0,0 +1,276 @@
+# empleados/marcaciones.py
+"""
+Registro atómico de marcas de asistencia (Entrada/Salida).
+
+El tipo de cada marca se decide a partir de EstadoEmpleado (una fila por empleado)
+dentro de la misma transacción que inserta la Asistencia. La fila de estado se
+bloquea con select_for_update y además se actualiza de forma condicional sobre el
+valor leído, de modo que dos escaneos simultáneos nunca generan dos 'entrada'
+(también en SQLite, donde select_for_update no bloquea).
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import qr, resumenes
+from .models import Asistencia, Empleado, EstadoEmpleado
+
+
+class MarcaDuplicada(Exception):
+    """
+    Ya hay una marca del empleado dentro de la ventana de rebote (debounce).
+    """
+    def __init__(self, segundos_restantes):
+        super().__init__(f"Marca duplicada; reintente en {segundos_restantes} s.")
+        self.segundos_restantes = segundos_restantes
+
+
+def _ventana_rebote():
+    return timedelta(seconds=getattr(settings, 'ASISTENCIA_DEBOUNCE_SEGUNDOS', 10))
+
+
+def siguiente_tipo(estado, ahora):
+    """
+    'salida' si la última marca es una entrada del mismo día (hora local); si no, 'entrada'.
+    """
+    if (
+        estado.ultima_marca is not None
+        and estado.ultimo_tipo == 'entrada'
+        and timezone.localdate(estado.ultima_marca) == timezone.localdate(ahora)
+    ):
+        return 'salida'
+    return 'entrada'
+
+
+def registrar_marca(empleado, ahora=None):
+    """
+    Registra la siguiente marca del empleado y devuelve la Asistencia creada.
+    Lanza MarcaDuplicada si la marca anterior está dentro de la ventana de rebote
+    o si otra petición registró una marca del mismo empleado al mismo tiempo.
+    """
+    ahora = ahora or timezone.now()
+
+    with transaction.atomic():
+        EstadoEmpleado.objects.get_or_create(empleado_id=empleado.id)
+        estado = EstadoEmpleado.objects.select_for_update().get(empleado_id=empleado.id)
+
+        if estado.ultima_marca is not None:
+            transcurrido = ahora - estado.ultima_marca
+            if transcurrido < _ventana_rebote():
+                restantes = (_ventana_rebote() - transcurrido).total_seconds()
+                raise MarcaDuplicada(max(1, int(restantes + 0.999)))
+
+        tipo = siguiente_tipo(estado, ahora)
+
+        # Actualización condicional: solo gana quien vea el mismo estado que leyó.
+        if estado.ultima_marca is None:
+            mismo_estado = Q(ultima_marca__isnull=True)
+        else:
+            mismo_estado = Q(ultima_marca=estado.ultima_marca)
+        actualizados = EstadoEmpleado.objects.filter(mismo_estado, empleado_id=empleado.id).update(
+            ultimo_tipo=tipo, ultima_marca=ahora,
+        )
+        if actualizados == 0:
+            raise MarcaDuplicada(int(_ventana_rebote().total_seconds()))
+
+        asistencia = Asistencia.objects.create(empleado=empleado, tipo=tipo, fecha_hora=ahora)
+        resumenes.actualizar_resumenes(resumenes.dias_de(asistencia))
+        return asistencia
+
+
+def sincronizar_estado(asistencia):
+    """
+    Refleja en EstadoEmpleado una Asistencia creada por otra vía (p. ej. la API REST),
+    solo si es más reciente que la última marca conocida, y actualiza su resumen diario.
+    """
+    resumenes.actualizar_resumenes(resumenes.dias_de(asistencia))
+    actualizados = EstadoEmpleado.objects.filter(
+        Q(ultima_marca__isnull=True) | Q(ultima_marca__lt=asistencia.fecha_hora),
+        empleado_id=asistencia.empleado_id,
+    ).update(ultimo_tipo=asistencia.tipo, ultima_marca=asistencia.fecha_hora)
+    if actualizados == 0:
+        EstadoEmpleado.objects.get_or_create(
+            empleado_id=asistencia.empleado_id,
+            defaults={'ultimo_tipo': asistencia.tipo, 'ultima_marca': asistencia.fecha_hora},
+        )
+
+
+def recalcular_estado(*empleado_ids):
+    """
+    Vuelve a calcular EstadoEmpleado a partir de la última Asistencia de cada empleado.
+    Se usa tras editar o borrar marcas (Admin, API REST), cuando la última marca
+    conocida puede haber cambiado o desaparecido.
+    """
+    for empleado_id in set(empleado_ids):
+        with transaction.atomic():
+            EstadoEmpleado.objects.get_or_create(empleado_id=empleado_id)
+            EstadoEmpleado.objects.select_for_update().filter(empleado_id=empleado_id).first()
+            ultima = (
+                Asistencia.objects
+                .filter(empleado_id=empleado_id)
+                .order_by('-fecha_hora')
+                .only('tipo', 'fecha_hora')
+                .first()
+            )
+            EstadoEmpleado.objects.filter(empleado_id=empleado_id).update(
+                ultimo_tipo=ultima.tipo if ultima else '',
+                ultima_marca=ultima.fecha_hora if ultima else None,
+            )
+
+
+def _tipo_en(empleado_id, fecha_hora):
+    """
+    Tipo que le corresponde a una marca atrasada (anterior a la última conocida),
+    según el registro inmediatamente anterior en el historial.
+    """
+    anterior = (
+        Asistencia.objects
+        .filter(empleado_id=empleado_id, fecha_hora__lt=fecha_hora)
+        .order_by('-fecha_hora')
+        .only('tipo', 'fecha_hora')
+        .first()
+    )
+    estado = EstadoEmpleado(
+        ultimo_tipo=anterior.tipo if anterior else '',
+        ultima_marca=anterior.fecha_hora if anterior else None,
+    )
+    return siguiente_tipo(estado, fecha_hora)
+
+
+def registrar_lote(marcas):
+    """
+    Registra en una sola transacción un lote de marcas [{clave, qr | empleado, fecha_hora, tipo?}]
+    (típicamente acumuladas por un kiosco sin conexión) con bulk_create. El texto del QR
+    se verifica aquí (firma y revocación), no en el kiosco.
+
+    Devuelve {'creadas': [...], 'duplicadas': [claves], 'rechazadas': [{clave, motivo}]}.
+    Las claves ya registradas se reportan como duplicadas, así que reenviar un lote
+    completo es seguro (idempotente).
+    """
+    for intento in (1, 2):
+        try:
+            with transaction.atomic():
+                return _registrar_lote(marcas)
+        except IntegrityError:
+            # Otra petición insertó a la vez alguna clave del lote. Se repite la
+            # transacción completa; esta vez esas marcas salen como duplicadas.
+            if intento == 2:
+                raise
+
+
+def _registrar_lote(marcas):
+    resultado = {'creadas': [], 'duplicadas': [], 'rechazadas': []}
+
+    vistas = set()
+    unicas = []
+    for marca in marcas:
+        if marca['clave'] in vistas:
+            resultado['duplicadas'].append(marca['clave'])
+        else:
+            vistas.add(marca['clave'])
+            unicas.append(marca)
+
+    existentes = set(
+        Asistencia.objects.filter(clave_idempotencia__in=vistas).values_list('clave_idempotencia', flat=True)
+    )
+
+    verificadas = []
+    for marca in unicas:
+        if marca['clave'] in existentes:
+            resultado['duplicadas'].append(marca['clave'])
+            continue
+        if 'qr' in marca:
+            try:
+                empleado_id, emitido = qr.verificar_contenido_qr(marca['qr'])
+            except qr.QRInvalido:
+                resultado['rechazadas'].append({'clave': marca['clave'], 'motivo': 'QR inválido o revocado.'})
+                continue
+            marca = {**marca, 'empleado': empleado_id, 'emitido': emitido}
+        verificadas.append(marca)
+
+    ids = {marca['empleado'] for marca in verificadas}
+    empleados = Empleado.objects.only('id', 'qr_emitido').in_bulk(ids)
+
+    pendientes = []
+    for marca in verificadas:
+        empleado = empleados.get(marca['empleado'])
+        if empleado is None:
+            resultado['rechazadas'].append({'clave': marca['clave'], 'motivo': 'Empleado no encontrado.'})
+        elif 'emitido' in marca and not qr.qr_vigente(empleado, marca['emitido']):
+            resultado['rechazadas'].append({'clave': marca['clave'], 'motivo': 'QR inválido o revocado.'})
+        else:
+            pendientes.append(marca)
+    if not pendientes:
+        return resultado
+
+    pendientes.sort(key=lambda m: (m['empleado'], m['fecha_hora']))
+    rebote = _ventana_rebote()
+
+    ids_pendientes = {marca['empleado'] for marca in pendientes}
+    EstadoEmpleado.objects.bulk_create(
+        [EstadoEmpleado(empleado_id=empleado_id) for empleado_id in ids_pendientes],
+        ignore_conflicts=True,
+    )
+    estados = {
+        estado.empleado_id: estado
+        for estado in EstadoEmpleado.objects.select_for_update().filter(empleado_id__in=ids_pendientes)
+    }
+
+    nuevas = []
+    ultima_por_empleado = {}
+    for marca in pendientes:
+        empleado_id, fecha_hora = marca['empleado'], marca['fecha_hora']
+        estado = estados[empleado_id]
+        anterior = ultima_por_empleado.get(empleado_id)
+
+        # Rebote contra la marca anterior del lote o, para la primera, contra la última
+        # registrada (en cualquier sentido: la marca del kiosco puede llegar atrasada).
+        if anterior is not None:
+            repetida = fecha_hora - anterior.fecha_hora < rebote
+        else:
+            repetida = estado.ultima_marca is not None and abs(fecha_hora - estado.ultima_marca) < rebote
+        if repetida:
+            resultado['rechazadas'].append({'clave': marca['clave'], 'motivo': 'Marca duplicada (rebote).'})
+            continue
+
+        tipo = marca.get('tipo')
+        if tipo is None:
+            if anterior is not None:
+                tipo = siguiente_tipo(EstadoEmpleado(ultimo_tipo=anterior.tipo, ultima_marca=anterior.fecha_hora), fecha_hora)
+            elif estado.ultima_marca is None or estado.ultima_marca < fecha_hora:
+                tipo = siguiente_tipo(estado, fecha_hora)
+            else:
+                tipo = _tipo_en(empleado_id, fecha_hora)
+
+        asistencia = Asistencia(
+            empleado_id=empleado_id, tipo=tipo, fecha_hora=fecha_hora,
+            clave_idempotencia=marca['clave'],
+        )
+        nuevas.append(asistencia)
+        ultima_por_empleado[empleado_id] = asistencia
+
+    # Sin ignore_conflicts: una clave insertada por otra petición hace fallar la
+    # transacción (IntegrityError) en lugar de contarse como creada.
+    Asistencia.objects.bulk_create(nuevas, batch_size=500)
+    resumenes.actualizar_resumenes(resumenes.dias_de(*nuevas))
+
+    for empleado_id, ultima in ultima_por_empleado.items():
+        estado = estados[empleado_id]
+        if estado.ultima_marca is None or estado.ultima_marca < ultima.fecha_hora:
+            EstadoEmpleado.objects.filter(empleado_id=empleado_id).update(
+                ultimo_tipo=ultima.tipo, ultima_marca=ultima.fecha_hora,
+            )
+
+    resultado['creadas'] = [
+        {
+            'clave': asistencia.clave_idempotencia,
+            'empleado': asistencia.empleado_id,
+            'tipo': asistencia.tipo,
+            'fecha_hora': asistencia.fecha_hora,
+        }
+        for asistencia in nuevas
+    ]
+    return resultado
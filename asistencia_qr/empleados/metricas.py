@@ -0,0 +1,211 @@
+# empleados/metricas.py
+"""
+Métricas en proceso del flujo de check-in, exportadas en formato de texto de Prometheus.
+
+- instrumentar(vista): decorador que mide la duración total de la vista, cuenta las
+  consultas a la BD de cada petición y cuenta las respuestas por código HTTP.
+- etapa(vista, nombre): context manager que mide una etapa concreta de la vista
+  (decodificar la imagen, codificar, comparar, escribir en la BD...).
+
+Todo se agrega en histogramas en memoria de cada proceso y se publica en /metrics/
+(solo para el personal o con el token METRICAS_TOKEN, ver autorizado()).
+Con METRICAS_HABILITADAS = False el decorador devuelve la vista sin envolver y
+etapa() devuelve un context manager vacío compartido: el coste es prácticamente nulo.
+"""
+import asyncio
+import functools
+import hmac
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.db import connection
+
+HABILITADAS = getattr(settings, 'METRICAS_HABILITADAS', False)
+TOKEN = getattr(settings, 'METRICAS_TOKEN', '')
+
+BUCKETS_SEGUNDOS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_CONSULTAS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+_NULO = nullcontext()
+
+
+def autorizado(request):
+    """
+    True si la petición puede leer /metrics/: usuario staff o "Authorization: Bearer <TOKEN>".
+    """
+    if request.user.is_authenticated and request.user.is_staff:
+        return True
+    cabecera = request.headers.get('Authorization', '')
+    if TOKEN and cabecera.startswith('Bearer '):
+        return hmac.compare_digest(cabecera[len('Bearer '):].strip().encode(), TOKEN.encode())
+    return False
+
+
+class Histograma:
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.conteos = [0] * (len(buckets) + 1)  # el último es +Inf
+        self.suma = 0.0
+        self.total = 0
+
+    def observar(self, valor):
+        self.conteos[bisect_left(self.buckets, valor)] += 1
+        self.suma += valor
+        self.total += 1
+
+
+class Registro:
+    """
+    Histogramas y contadores indexados por (nombre, etiquetas).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histogramas = {}
+        self._contadores = {}
+        self._ayuda = {}
+
+    def observar(self, nombre, valor, buckets=BUCKETS_SEGUNDOS, ayuda='', **etiquetas):
+        clave = (nombre, tuple(sorted(etiquetas.items())))
+        with self._lock:
+            histograma = self._histogramas.get(clave)
+            if histograma is None:
+                histograma = self._histogramas[clave] = Histograma(buckets)
+                self._ayuda.setdefault(nombre, ('histogram', ayuda))
+            histograma.observar(valor)
+
+    def incrementar(self, nombre, ayuda='', **etiquetas):
+        clave = (nombre, tuple(sorted(etiquetas.items())))
+        with self._lock:
+            self._contadores[clave] = self._contadores.get(clave, 0) + 1
+            self._ayuda.setdefault(nombre, ('counter', ayuda))
+
+    def limpiar(self):
+        with self._lock:
+            self._histogramas.clear()
+            self._contadores.clear()
+
+    def exportar(self):
+        """
+        Devuelve todas las métricas en formato de exposición de texto de Prometheus.
+        """
+        def formatear(etiquetas):
+            if not etiquetas:
+                return ''
+            return '{' + ','.join(f'{k}="{v}"' for k, v in etiquetas) + '}'
+
+        lineas = []
+        with self._lock:
+            nombres = sorted({n for n, _ in self._histogramas} | {n for n, _ in self._contadores})
+            for nombre in nombres:
+                tipo, ayuda = self._ayuda[nombre]
+                lineas.append(f"# HELP {nombre} {ayuda}")
+                lineas.append(f"# TYPE {nombre} {tipo}")
+                if tipo == 'counter':
+                    for (n, etiquetas), valor in sorted(self._contadores.items()):
+                        if n == nombre:
+                            lineas.append(f"{nombre}{formatear(etiquetas)} {valor}")
+                    continue
+                for (n, etiquetas), histograma in sorted(self._histogramas.items(), key=lambda x: x[0]):
+                    if n != nombre:
+                        continue
+                    acumulado = 0
+                    for limite, conteo in zip(histograma.buckets + ('+Inf',), histograma.conteos):
+                        acumulado += conteo
+                        lineas.append(f"{nombre}_bucket{formatear(etiquetas + (('le', limite),))} {acumulado}")
+                    lineas.append(f"{nombre}_sum{formatear(etiquetas)} {histograma.suma}")
+                    lineas.append(f"{nombre}_count{formatear(etiquetas)} {histograma.total}")
+        return '\n'.join(lineas) + '\n'
+
+
+registro = Registro()
+
+
+class _Cronometro:
+
+    __slots__ = ('vista', 'nombre', 'inicio')
+
+    def __init__(self, vista, nombre):
+        self.vista = vista
+        self.nombre = nombre
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        registro.observar(
+            'asistencia_etapa_segundos', time.perf_counter() - self.inicio,
+            ayuda='Duración de cada etapa del check-in.', vista=self.vista, etapa=self.nombre,
+        )
+        return False
+
+
+def etapa(vista, nombre):
+    if not HABILITADAS:
+        return _NULO
+    return _Cronometro(vista, nombre)
+
+
+def observar_tiempos(vista, tiempos_ms):
+    """
+    Registra los tiempos (ms) que reportan los procesos del pool facial.
+    """
+    if not HABILITADAS:
+        return
+    for nombre, ms in tiempos_ms.items():
+        registro.observar(
+            'asistencia_etapa_segundos', ms / 1000,
+            ayuda='Duración de cada etapa del check-in.', vista=vista, etapa=nombre,
+        )
+
+
+def _registrar_peticion(vista, duracion, status, consultas=None):
+    registro.observar('asistencia_peticion_segundos', duracion,
+                      ayuda='Duración total de la vista.', vista=vista)
+    registro.incrementar('asistencia_peticiones_total',
+                         ayuda='Respuestas por vista y código HTTP.', vista=vista, status=status)
+    if consultas is not None:
+        registro.observar('asistencia_consultas_bd', consultas, buckets=BUCKETS_CONSULTAS,
+                          ayuda='Consultas a la BD por petición.', vista=vista)
+
+
+def instrumentar(vista):
+    """
+    Decorador de vistas: duración total, consultas a la BD (solo vistas síncronas;
+    en las asíncronas la BD se usa desde otros hilos) y respuestas por código.
+    """
+    def decorador(funcion):
+        if not HABILITADAS:
+            return funcion
+
+        if asyncio.iscoroutinefunction(funcion):
+            @functools.wraps(funcion)
+            async def envoltura_async(request, *args, **kwargs):
+                inicio = time.perf_counter()
+                respuesta = await funcion(request, *args, **kwargs)
+                _registrar_peticion(vista, time.perf_counter() - inicio, respuesta.status_code)
+                return respuesta
+            return envoltura_async
+
+        @functools.wraps(funcion)
+        def envoltura(request, *args, **kwargs):
+            consultas = 0
+
+            def contar(execute, sql, params, many, context):
+                nonlocal consultas
+                consultas += 1
+                return execute(sql, params, many, context)
+
+            inicio = time.perf_counter()
+            with connection.execute_wrapper(contar):
+                respuesta = funcion(request, *args, **kwargs)
+            _registrar_peticion(vista, time.perf_counter() - inicio, respuesta.status_code, consultas)
+            return respuesta
+        return envoltura
+
+    return decorador
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('empleados', '0004_empleado_foto_perfil'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='empleado',
+            name='encoding_facial',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='empleado',
+            name='encoding_origen',
+            field=models.CharField(
+                blank=True, editable=False, max_length=255,
+                help_text="Backend y foto con que se calculó el encoding ('<backend>:<ruta>').",
+            ),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('empleados', '0005_empleado_encoding_facial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='asistencia',
+            index=models.Index(fields=['empleado', 'fecha_hora'], name='asistencia_empleado_fecha'),
+        ),
+    ]
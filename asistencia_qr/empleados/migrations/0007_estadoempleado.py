@@ -0,0 +1,42 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def poblar_estados(apps, schema_editor):
+    # Inicializa el estado de cada empleado con su último registro de asistencia.
+    Asistencia = apps.get_model('empleados', 'Asistencia')
+    EstadoEmpleado = apps.get_model('empleados', 'EstadoEmpleado')
+
+    ultimos = (
+        Asistencia.objects
+        .order_by('empleado_id', '-fecha_hora')
+        .values_list('empleado_id', 'tipo', 'fecha_hora')
+    )
+    estados = []
+    anterior = None
+    for empleado_id, tipo, fecha_hora in ultimos.iterator():
+        if empleado_id != anterior:
+            estados.append(EstadoEmpleado(empleado_id=empleado_id, ultimo_tipo=tipo, ultima_marca=fecha_hora))
+            anterior = empleado_id
+    EstadoEmpleado.objects.bulk_create(estados, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('empleados', '0006_asistencia_empleado_fecha_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstadoEmpleado',
+            fields=[
+                ('empleado', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='estado', serialize=False, to='empleados.empleado')),
+                ('ultimo_tipo', models.CharField(blank=True, choices=[('entrada', 'Entrada'), ('salida', 'Salida')], max_length=10)),
+                ('ultima_marca', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.RunPython(poblar_estados, migrations.RunPython.noop),
+    ]
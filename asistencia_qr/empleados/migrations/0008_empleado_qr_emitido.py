@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('empleados', '0007_estadoempleado'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='empleado',
+            name='qr_emitido',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+    ]
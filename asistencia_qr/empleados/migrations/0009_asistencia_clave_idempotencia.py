@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('empleados', '0008_empleado_qr_emitido'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='asistencia',
+            name='clave_idempotencia',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True),
+        ),
+    ]
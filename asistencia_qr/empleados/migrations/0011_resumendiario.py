@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('empleados', '0009_asistencia_clave_idempotencia'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('primera_entrada', models.DateTimeField(blank=True, null=True)),
+                ('ultima_salida', models.DateTimeField(blank=True, null=True)),
+                ('segundos_trabajados', models.PositiveIntegerField(default=0)),
+                ('marcas', models.PositiveSmallIntegerField(default=0)),
+                ('entrada_abierta', models.BooleanField(default=False)),
+                ('anomalias', models.PositiveSmallIntegerField(default=0)),
+                ('tardanza_segundos', models.PositiveIntegerField(default=0)),
+                ('empleado', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes', to='empleados.empleado')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['fecha'], name='resumen_fecha')],
+                'constraints': [models.UniqueConstraint(fields=('empleado', 'fecha'), name='resumen_empleado_fecha')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('empleados', '0011_resumendiario'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='asistencia',
+            index=models.Index(fields=['fecha_hora'], name='asistencia_fecha'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('empleados', '0012_asistencia_fecha_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='empleado',
+            name='foto_miniatura',
+            field=models.ImageField(blank=True, editable=False, upload_to=''),
+        ),
+        migrations.AddField(
+            model_name='empleado',
+            name='foto_recorte',
+            field=models.ImageField(blank=True, editable=False, upload_to=''),
+        ),
+    ]
@@ -10,6 +10,21 @@ class Empleado(models.Model):
     area = models.CharField(max_length=150, blank=True)
     # 🚨 SOLUCIÓN 1: Agregamos el campo 'foto_perfil' al modelo
     foto_perfil = models.ImageField(upload_to='fotos_empleados/', blank=True, null=True, verbose_name='Foto de Perfil')
+    # Derivadas de 'foto_perfil' al subirla (ver fotos.py): recorte del rostro para el
+    # encoding y miniatura para el Admin. Todas se guardan con el hash del contenido.
+    foto_recorte = models.ImageField(blank=True, editable=False)
+    foto_miniatura = models.ImageField(blank=True, editable=False)
+    # Encoding facial (vector de 128 floats) precalculado a partir de 'foto_perfil'.
+    # 'encoding_origen' guarda el backend y el archivo con que se calculó ('dlib:fotos/x.jpg'):
+    # si cambia la foto o el backend, el encoding deja de ser vigente y se vuelve a calcular
+    # (ver biometria.encoding_vigente).
+    encoding_facial = models.BinaryField(blank=True, null=True, editable=False)
+    encoding_origen = models.CharField(
+        max_length=255, blank=True, editable=False,
+        help_text="Backend y foto con que se calculó el encoding ('<backend>:<ruta>').",
+    )
+    # Época (segundos) de emisión de la credencial QR vigente; las anteriores quedan revocadas.
+    qr_emitido = models.PositiveBigIntegerField(default=0, editable=False)
 
     def __str__(self):
         return self.nombre
@@ -19,9 +34,65 @@ class Asistencia(models.Model):
     empleado = models.ForeignKey(Empleado, on_delete=models.CASCADE)
     fecha_hora = models.DateTimeField()
     tipo = models.CharField(max_length=10, choices=[('entrada', 'Entrada'), ('salida', 'Salida')])
+    # Clave única generada por el cliente (kiosco) para que reenviar un lote no duplique marcas.
+    clave_idempotencia = models.CharField(max_length=64, unique=True, blank=True, null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # Historial y último registro de un empleado: búsqueda por índice.
+            models.Index(fields=['empleado', 'fecha_hora'], name='asistencia_empleado_fecha'),
+            # Rangos de fechas de todos los empleados: exportaciones, Admin y resúmenes.
+            models.Index(fields=['fecha_hora'], name='asistencia_fecha'),
+        ]
 
     def __str__(self):
         # --- CORRECCIÓN APLICADA AQUÍ ---
         # Convierte la fecha_hora guardada en UTC a la zona horaria local para mostrarla.
         local_time = localtime(self.fecha_hora).strftime('%Y-%m-%d %H:%M:%S')
-        return f"{self.empleado.nombre} - {self.tipo} - {local_time}"
\ No newline at end of file
+        return f"{self.empleado.nombre} - {self.tipo} - {local_time}"
+
+class EstadoEmpleado(models.Model):
+    """
+    Estado actual de asistencia de cada empleado (última marca y su tipo).
+    Permite decidir Entrada/Salida con una lectura por clave primaria en lugar de
+    consultar el historial, y serializar marcas concurrentes del mismo empleado.
+    """
+    empleado = models.OneToOneField(Empleado, on_delete=models.CASCADE, primary_key=True, related_name='estado')
+    ultimo_tipo = models.CharField(max_length=10, choices=[('entrada', 'Entrada'), ('salida', 'Salida')], blank=True)
+    ultima_marca = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.empleado_id} - {self.ultimo_tipo or 'sin marcas'}"
+
+
+class ResumenDiario(models.Model):
+    """
+    Resumen precalculado de la jornada de un empleado (fecha local), mantenido al
+    registrar cada marca (ver resumenes.py) o reconstruido con 'reconstruir_resumenes'.
+    Los reportes por área y rango de fechas se calculan sobre esta tabla en lugar de
+    recorrer todas las marcas de Asistencia.
+    """
+    empleado = models.ForeignKey(Empleado, on_delete=models.CASCADE, related_name='resumenes')
+    fecha = models.DateField()
+    primera_entrada = models.DateTimeField(null=True, blank=True)
+    ultima_salida = models.DateTimeField(null=True, blank=True)
+    # Suma de los pares entrada -> salida del día.
+    segundos_trabajados = models.PositiveIntegerField(default=0)
+    marcas = models.PositiveSmallIntegerField(default=0)
+    # La última marca del día es una entrada sin su salida.
+    entrada_abierta = models.BooleanField(default=False)
+    # Marcas que no forman pareja (salida sin entrada, dos entradas seguidas).
+    anomalias = models.PositiveSmallIntegerField(default=0)
+    # Segundos de retraso de la primera entrada respecto a JORNADA['HORA_ENTRADA'] (0 si llegó a tiempo).
+    tardanza_segundos = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['empleado', 'fecha'], name='resumen_empleado_fecha'),
+        ]
+        indexes = [
+            models.Index(fields=['fecha'], name='resumen_fecha'),
+        ]
+
+    def __str__(self):
+        return f"{self.empleado_id} - {self.fecha}"
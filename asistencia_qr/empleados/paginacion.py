@@ -0,0 +1,23 @@
+from rest_framework.pagination import CursorPagination
+
+
+class AsistenciaCursorPagination(CursorPagination):
+    """
+    Paginación por cursor sobre 'fecha_hora' (más recientes primero).
+    A diferencia de la paginación por offset, cada página es una búsqueda por
+    índice y no se degrada con historiales grandes.
+    """
+    ordering = '-fecha_hora'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+class ResumenCursorPagination(CursorPagination):
+    """
+    Paginación por cursor de los resúmenes diarios (días más recientes primero).
+    """
+    ordering = ('-fecha', '-id')
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
@@ -0,0 +1,72 @@
+# empleados/payload_qr.py
+"""
+Formato firmado y compacto del contenido de los QR de asistencia.
+
+    AQ1.<id base36>.<emitido base36>.<firma>
+
+- 'emitido' es la época (segundos) en que se emitió la credencial; al reemitirla,
+  las credenciales con una época anterior quedan revocadas.
+- 'firma' son los primeros 10 bytes de un HMAC-SHA256 en Base32 (16 caracteres).
+
+Todo el texto usa solo mayúsculas, dígitos y '.', de modo que el QR se codifica en
+modo alfanumérico (más pequeño y rápido de leer).
+
+Este módulo no depende de Django para poder usarse desde los scripts de escritorio
+(generar_qr.py, leer_qr.py); la clave se pasa siempre como argumento.
+"""
+import base64
+import hashlib
+import hmac
+
+VERSION = 'AQ1'
+_DIGITOS = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+
+class PayloadInvalido(ValueError):
+    """
+    El texto del QR no tiene el formato esperado o la firma no coincide.
+    """
+
+
+def _base36(numero):
+    if numero < 0:
+        raise ValueError("Solo se admiten enteros no negativos.")
+    texto = ''
+    while True:
+        numero, resto = divmod(numero, 36)
+        texto = _DIGITOS[resto] + texto
+        if numero == 0:
+            return texto
+
+
+def _firma(mensaje, clave):
+    if isinstance(clave, str):
+        clave = clave.encode()
+    digest = hmac.new(clave, mensaje.encode(), hashlib.sha256).digest()
+    return base64.b32encode(digest[:10]).decode()
+
+
+def firmar(empleado_id, emitido, clave):
+    """
+    Devuelve el texto firmado que se codifica en el QR.
+    """
+    mensaje = f"{VERSION}.{_base36(empleado_id)}.{_base36(emitido)}"
+    return f"{mensaje}.{_firma(mensaje, clave)}"
+
+
+def verificar(texto, clave):
+    """
+    Verifica la firma y devuelve (empleado_id, emitido). Lanza PayloadInvalido.
+    """
+    partes = texto.strip().upper().split('.')
+    if len(partes) != 4 or partes[0] != VERSION:
+        raise PayloadInvalido("Formato de QR no reconocido.")
+
+    mensaje = '.'.join(partes[:3])
+    if not hmac.compare_digest(partes[3], _firma(mensaje, clave)):
+        raise PayloadInvalido("Firma del QR inválida.")
+
+    try:
+        return int(partes[1], 36), int(partes[2], 36)
+    except ValueError:
+        raise PayloadInvalido("Formato de QR no reconocido.")
@@ -0,0 +1,272 @@
+# empleados/procesamiento.py
+"""
+Pool de procesos para el trabajo facial (ver backends.py) que consume CPU.
+
+Las vistas entregan la codificación de la imagen capturada a este pool en lugar
+de hacerla en el hilo de la petición, de modo que un encoding lento no bloquea al
+resto de peticiones del worker (p. ej. /api/asistencias/). El número de trabajos
+pendientes está acotado: si la cola se llena se lanza ColaLlena y la vista
+responde 503 con Retry-After (backpressure) en lugar de acumular latencia.
+
+Configuración (settings.py):
+    POOL_FACIAL_WORKERS         procesos del pool (0 = ejecutar en el propio hilo, o en
+                                un hilo aparte desde código asíncrono).
+    POOL_FACIAL_MAX_PENDIENTES  trabajos en curso + en cola antes de rechazar.
+    POOL_FACIAL_TIMEOUT         segundos máximos de espera por un resultado.
+    POOL_FACIAL_RETRY_AFTER     valor de la cabecera Retry-After en los 503.
+"""
+import asyncio
+import io
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+
+from .backends import configuracion
+
+
+class ColaLlena(Exception):
+    """
+    El pool tiene el máximo de trabajos pendientes: el cliente debe reintentar.
+    """
+
+
+# --- Trabajos que se ejecutan dentro de los procesos del pool ---
+
+def _decodificar_reducida(foto_bytes, max_lado):
+    """
+    Decodifica la imagen a un tamaño máximo de 'max_lado' px. En JPEG se usa el modo
+    draft de Pillow, que decodifica directamente a 1/2, 1/4 u 1/8 de la resolución
+    (mucho menos CPU y memoria que decodificar completo y luego reducir).
+    """
+    from PIL import Image
+
+    imagen = Image.open(io.BytesIO(foto_bytes))
+    if imagen.format == 'JPEG':
+        imagen.draft('RGB', (max_lado, max_lado))
+    imagen = imagen.convert('RGB')
+    if max(imagen.size) > max_lado:
+        imagen.thumbnail((max_lado, max_lado))
+    return imagen
+
+
+def _recortar_rostro(imagen, rostro, margen):
+    """
+    Recorta el rostro con un margen relativo y devuelve (recorte, rostro dentro del recorte).
+    """
+    top, right, bottom, left = rostro.caja
+    margen_y = int((bottom - top) * margen)
+    margen_x = int((right - left) * margen)
+    y0, x0 = max(top - margen_y, 0), max(left - margen_x, 0)
+    y1, x1 = min(bottom + margen_y, imagen.shape[0]), min(right + margen_x, imagen.shape[1])
+    recorte = imagen[y0:y1, x0:x1]
+    return recorte, rostro.desplazar(y0, x0)
+
+
+def codificar_captura(foto_bytes, opciones=None, backend=None, calidad=None):
+    """
+    Devuelve (encodings, tiempos_ms) de la imagen capturada.
+
+    'backend' es la configuración (ruta, opciones) de backends.configuracion(); cada
+    proceso del pool instancia el backend una sola vez.
+
+    Con 'calidad' (CALIDAD_CAPTURA en settings.py) el pipeline reducido rechaza
+    los fotogramas oscuros, borrosos, con el rostro lejos o con varias personas
+    lanzando calidad.CalidadInsuficiente antes del encoding (ver calidad.py).
+
+    Con 'opciones' (ver PREPROCESADO_CAPTURA en settings.py) se usa el pipeline
+    reducido: decodificación reducida -> detección sobre un fotograma aún más pequeño
+    -> recorte del rostro más grande -> encoding solo del recorte. Sin opciones se
+    decodifica y codifica la imagen completa, como antes.
+    """
+    import numpy as np
+
+    from . import calidad as evaluacion
+    from .backends import cargar_backend, obtener_backend
+
+    motor = cargar_backend(*backend) if backend else obtener_backend()
+
+    tiempos = {}
+    inicio = time.perf_counter()
+
+    def marcar(etapa):
+        nonlocal inicio
+        ahora = time.perf_counter()
+        tiempos[etapa] = round((ahora - inicio) * 1000, 2)
+        inicio = ahora
+
+    if not opciones or not opciones.get('ACTIVO', True):
+        imagen = motor.cargar_imagen(io.BytesIO(foto_bytes))
+        marcar('decodificar')
+        encodings = motor.codificar(imagen)
+        marcar('codificar')
+        return encodings, tiempos
+
+    # 1. Decodificación reducida
+    pil = _decodificar_reducida(foto_bytes, opciones.get('MAX_LADO', 640))
+    imagen = np.asarray(pil)
+    marcar('decodificar')
+
+    # 2. Detección sobre un fotograma más pequeño; las cajas se reescalan al original
+    lado_deteccion = opciones.get('LADO_DETECCION', 320)
+    escala = min(1.0, lado_deteccion / max(pil.size))
+    if escala < 1.0:
+        pequena = np.asarray(pil.resize((round(pil.width * escala), round(pil.height * escala))))
+    else:
+        pequena = imagen
+    control = calidad if calidad and calidad.get('ACTIVO', True) else None
+    if control:
+        gris = evaluacion.a_gris(pequena)
+        evaluacion.evaluar_fotograma(gris, control)
+
+    rostros = motor.detectar(pequena, upsample=opciones.get('UPSAMPLE', 1))
+    marcar('detectar')
+
+    if not rostros:
+        return [], tiempos
+
+    if control:
+        evaluacion.evaluar_rostros(gris, rostros, control)
+        marcar('calidad')
+
+    # 3. Recorte del rostro más grande (el más cercano a la cámara)
+    rostro = max(rostros, key=lambda r: r.area).escalar(1 / escala)
+    recorte, rostro_recorte = _recortar_rostro(imagen, rostro, opciones.get('MARGEN', 0.3))
+    marcar('recortar')
+
+    # 4. Encoding solo del recorte
+    encodings = motor.codificar(np.ascontiguousarray(recorte), [rostro_recorte])
+    marcar('codificar')
+    return encodings, tiempos
+
+
+# --- Pool ---
+
+class PoolFacial:
+
+    def __init__(self, workers, max_pendientes, timeout=None):
+        self.workers = workers
+        self.max_pendientes = max_pendientes
+        self.timeout = timeout
+        self._pendientes = threading.BoundedSemaphore(max_pendientes)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _obtener_executor(self):
+        # Se crea al primer uso para no lanzar procesos en 'migrate', 'shell', etc.
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    def _descartar(self, executor):
+        """
+        Retira un executor roto (un proceso murió, p. ej. por falta de memoria): el
+        siguiente trabajo crea uno nuevo en lugar de fallar para siempre.
+        """
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _liberar(self, executor, futuro):
+        self._pendientes.release()
+        if not futuro.cancelled() and isinstance(futuro.exception(), BrokenProcessPool):
+            self._descartar(executor)
+
+    def _enviar_al_executor(self, funcion, *args):
+        for intento in (1, 2):
+            executor = self._obtener_executor()
+            try:
+                futuro = executor.submit(funcion, *args)
+            except BrokenProcessPool:
+                self._descartar(executor)
+                if intento == 2:
+                    raise ColaLlena()
+                continue
+            futuro.add_done_callback(lambda f: self._liberar(executor, f))
+            return futuro
+
+    def enviar(self, funcion, *args):
+        """
+        Encola el trabajo y devuelve un Future. Lanza ColaLlena si no hay hueco.
+        """
+        if not self._pendientes.acquire(blocking=False):
+            raise ColaLlena()
+
+        if self.workers == 0:
+            futuro = Future()
+            try:
+                futuro.set_result(funcion(*args))
+            except Exception as e:
+                futuro.set_exception(e)
+            finally:
+                self._pendientes.release()
+            return futuro
+
+        try:
+            return self._enviar_al_executor(funcion, *args)
+        except BaseException:
+            self._pendientes.release()
+            raise
+
+    def ejecutar(self, funcion, *args):
+        """
+        Versión bloqueante de enviar(): espera el resultado (con timeout).
+        """
+        try:
+            return self.enviar(funcion, *args).result(timeout=self.timeout)
+        except BrokenProcessPool:
+            # El proceso murió con el trabajo en curso; el cliente reintenta (503).
+            raise ColaLlena()
+
+    def enviar_async(self, funcion, *args):
+        """
+        Versión de enviar() para código asíncrono: devuelve una tarea de asyncio. Con
+        workers=0 el trabajo corre en un hilo (asyncio.to_thread) para no bloquear el
+        event loop. Lanza ColaLlena si no hay hueco, también si un proceso muere.
+        """
+        if self.workers == 0:
+            if not self._pendientes.acquire(blocking=False):
+                raise ColaLlena()
+            return asyncio.ensure_future(self._en_hilo(funcion, *args))
+        return asyncio.ensure_future(self._esperar(self.enviar(funcion, *args)))
+
+    async def _en_hilo(self, funcion, *args):
+        try:
+            return await asyncio.to_thread(funcion, *args)
+        finally:
+            self._pendientes.release()
+
+    async def _esperar(self, futuro):
+        try:
+            return await asyncio.wrap_future(futuro)
+        except BrokenProcessPool:
+            raise ColaLlena()
+
+    def cerrar(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+_workers = getattr(settings, 'POOL_FACIAL_WORKERS', None)
+if _workers is None:
+    _workers = os.cpu_count() or 1
+
+pool_facial = PoolFacial(
+    workers=_workers,
+    max_pendientes=getattr(settings, 'POOL_FACIAL_MAX_PENDIENTES', max(_workers, 1) * 4),
+    timeout=getattr(settings, 'POOL_FACIAL_TIMEOUT', 30),
+)
+
+RETRY_AFTER = getattr(settings, 'POOL_FACIAL_RETRY_AFTER', 2)
+
+# Se pasan como argumento a codificar_captura() porque los procesos del pool no leen settings.
+OPCIONES_PREPROCESADO = getattr(settings, 'PREPROCESADO_CAPTURA', None)
+OPCIONES_CALIDAD = getattr(settings, 'CALIDAD_CAPTURA', None)
+CONFIG_BACKEND = configuracion()
@@ -0,0 +1,126 @@
+# empleados/qr.py
+"""
+Contenido e imagen de los códigos QR de los empleados.
+
+Todas las vías que generan QR (vista generar_qr_empleado, comando generar_badges,
+script generar_qr.py) deben usar contenido_qr() para que el escáner reciba
+siempre el mismo formato.
+"""
+import hashlib
+import io
+import time
+from functools import lru_cache
+
+import qrcode
+import qrcode.image.svg
+from django.conf import settings
+from django.core.cache import cache
+
+from . import payload_qr
+
+# formato -> content type
+FORMATOS = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+}
+
+
+class QRInvalido(Exception):
+    """
+    QR falsificado, con formato desconocido o revocado.
+    """
+
+
+def _clave():
+    return getattr(settings, 'QR_CLAVE_FIRMA', settings.SECRET_KEY)
+
+
+def _clave_cache_revocacion(empleado_id):
+    return f"qr_emitido:{empleado_id}"
+
+
+def contenido_qr(empleado_id, emitido):
+    """
+    Texto que se codifica en el QR del empleado (el que procesar_qr espera):
+    payload firmado con el ID y la época de emisión (ver payload_qr.py).
+    """
+    return payload_qr.firmar(empleado_id, emitido, _clave())
+
+
+def verificar_contenido_qr(texto):
+    """
+    Verifica el texto leído de un QR SIN consultar la BD y devuelve
+    (empleado_id, emitido). Lanza QRInvalido si la firma no coincide o si la
+    credencial consta como revocada en la caché. 'emitido' es None para los QR
+    antiguos (solo el ID) cuando QR_ACEPTAR_LEGADO está activo.
+    """
+    texto = (texto or '').strip()
+    if texto.isdigit() and getattr(settings, 'QR_ACEPTAR_LEGADO', False):
+        return int(texto), None
+
+    try:
+        empleado_id, emitido = payload_qr.verificar(texto, _clave())
+    except payload_qr.PayloadInvalido as e:
+        raise QRInvalido(str(e))
+
+    vigente = cache.get(_clave_cache_revocacion(empleado_id))
+    if vigente is not None and emitido < vigente:
+        raise QRInvalido("La credencial fue reemplazada por una más reciente.")
+    return empleado_id, emitido
+
+
+def qr_vigente(empleado, emitido):
+    """
+    Comprobación definitiva contra la BD (la caché de revocaciones puede no tener
+    la entrada). También recuerda la época vigente para rechazar sin BD la próxima vez.
+    """
+    cache.set(_clave_cache_revocacion(empleado.id), empleado.qr_emitido, None)
+    return emitido is None or emitido == empleado.qr_emitido
+
+
+def reemitir(empleados):
+    """
+    Emite credenciales nuevas para los empleados dados; las anteriores quedan revocadas.
+    """
+    emitido = int(time.time())
+    ids = list(empleados.values_list('id', flat=True))
+    empleados.model.objects.filter(id__in=ids).update(qr_emitido=emitido)
+    cache.set_many({_clave_cache_revocacion(empleado_id): emitido for empleado_id in ids}, None)
+    return len(ids)
+
+
+def imagen_qr(contenido, box_size=10, border=4):
+    """
+    Devuelve la imagen PIL del QR.
+    """
+    qr = qrcode.QRCode(box_size=box_size, border=border)
+    qr.add_data(contenido)
+    qr.make(fit=True)
+    return qr.make_image().get_image()
+
+
+def png_qr(contenido, **opciones):
+    buf = io.BytesIO()
+    imagen_qr(contenido, **opciones).save(buf, 'PNG')
+    return buf.getvalue()
+
+
+@lru_cache(maxsize=getattr(settings, 'QR_CACHE_MAX', 1024))
+def render_qr(contenido, formato='png', box_size=10):
+    """
+    Bytes del QR en el formato pedido. Cacheado por variante (contenido, formato, tamaño):
+    el contenido de un QR no cambia, así que no tiene sentido volver a dibujarlo.
+    """
+    if formato == 'svg':
+        buf = io.BytesIO()
+        qrcode.make(contenido, image_factory=qrcode.image.svg.SvgPathImage, box_size=box_size).save(buf)
+        return buf.getvalue()
+    return png_qr(contenido, box_size=box_size)
+
+
+def etag_qr(contenido, formato, box_size):
+    """
+    ETag fuerte de una variante del QR (no requiere renderizarlo).
+    """
+    clave = f"{contenido}|{formato}|{box_size}".encode()
+    return '"%s"' % hashlib.sha256(clave).hexdigest()[:32]
@@ -0,0 +1,199 @@
+# empleados/resumenes.py
+"""
+Resumen diario de asistencia por empleado (modelo ResumenDiario).
+
+Cada vez que se registra, modifica o elimina una marca se recalcula el resumen de
+ese empleado y ese día (fecha local) a partir de sus marcas del día: una búsqueda
+por el índice (empleado, fecha_hora) que devuelve unas pocas filas. Los lotes de
+los kioscos actualizan todos los días afectados con una consulta y un upsert.
+
+Emparejado de marcas, en orden cronológico:
+    entrada -> salida     suma el intervalo a segundos_trabajados.
+    salida sin entrada    anomalía.
+    entrada tras entrada  anomalía (la primera queda sin salida).
+    entrada al final      entrada_abierta (la jornada puede seguir en curso).
+
+La tardanza se mide con JORNADA (settings.py); si se cambia, hay que ejecutar
+'reconstruir_resumenes' para recalcular los días anteriores.
+"""
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Asistencia, ResumenDiario
+
+CAMPOS = [
+    'primera_entrada', 'ultima_salida', 'segundos_trabajados', 'marcas',
+    'entrada_abierta', 'anomalias', 'tardanza_segundos',
+]
+
+
+def configuracion_jornada():
+    jornada = {'HORA_ENTRADA': '08:00', 'TOLERANCIA_MINUTOS': 10, 'DIAS_LABORABLES': (0, 1, 2, 3, 4)}
+    jornada.update(getattr(settings, 'JORNADA', {}))
+    return jornada
+
+
+def limites_dia(fecha):
+    """
+    (inicio, fin) del día local 'fecha' como datetimes conscientes de zona horaria.
+    """
+    inicio = timezone.make_aware(datetime.combine(fecha, time.min))
+    return inicio, timezone.make_aware(datetime.combine(fecha + timedelta(days=1), time.min))
+
+
+def _tardanza(fecha, primera_entrada, jornada):
+    if primera_entrada is None:
+        return 0
+    hora = time.fromisoformat(jornada['HORA_ENTRADA'])
+    limite = timezone.make_aware(datetime.combine(fecha, hora))
+    retraso = (primera_entrada - limite).total_seconds()
+    if retraso <= jornada['TOLERANCIA_MINUTOS'] * 60:
+        return 0
+    return int(retraso)
+
+
+def calcular_resumen(empleado_id, fecha, marcas, jornada=None):
+    """
+    Construye el ResumenDiario (sin guardar) a partir de las marcas del día
+    [(fecha_hora, tipo), ...] ordenadas cronológicamente.
+    """
+    jornada = jornada or configuracion_jornada()
+    resumen = ResumenDiario(empleado_id=empleado_id, fecha=fecha, marcas=len(marcas))
+    abierta = None
+    segundos = 0
+    for fecha_hora, tipo in marcas:
+        if tipo == 'entrada':
+            if resumen.primera_entrada is None:
+                resumen.primera_entrada = fecha_hora
+            if abierta is not None:
+                resumen.anomalias += 1
+            abierta = fecha_hora
+        else:
+            resumen.ultima_salida = fecha_hora
+            if abierta is None:
+                resumen.anomalias += 1
+            else:
+                segundos += (fecha_hora - abierta).total_seconds()
+                abierta = None
+    resumen.segundos_trabajados = int(segundos)
+    resumen.entrada_abierta = abierta is not None
+    resumen.tardanza_segundos = _tardanza(fecha, resumen.primera_entrada, jornada)
+    return resumen
+
+
+def _guardar(resumenes, vacios):
+    """
+    Upsert de los resúmenes calculados y borrado de los días que se quedaron sin marcas.
+    """
+    if resumenes:
+        ResumenDiario.objects.bulk_create(
+            resumenes, batch_size=500, update_conflicts=True,
+            unique_fields=['empleado', 'fecha'], update_fields=CAMPOS,
+        )
+    for empleado_id, fecha in vacios:
+        ResumenDiario.objects.filter(empleado_id=empleado_id, fecha=fecha).delete()
+
+
+def dias_de(*asistencias):
+    """
+    Pares (empleado_id, fecha local) de las asistencias indicadas.
+    """
+    return {(a.empleado_id, timezone.localdate(a.fecha_hora)) for a in asistencias}
+
+
+def actualizar_resumenes(dias):
+    """
+    Recalcula los resúmenes de los pares (empleado_id, fecha) indicados con una sola
+    consulta de marcas (por índice) y un upsert.
+    """
+    if not dias:
+        return
+    inicio = limites_dia(min(fecha for _, fecha in dias))[0]
+    fin = limites_dia(max(fecha for _, fecha in dias))[1]
+    filas = (
+        Asistencia.objects
+        .filter(empleado_id__in={empleado_id for empleado_id, _ in dias}, fecha_hora__gte=inicio, fecha_hora__lt=fin)
+        .order_by('empleado_id', 'fecha_hora')
+        .values_list('empleado_id', 'fecha_hora', 'tipo')
+    )
+    marcas = {dia: [] for dia in dias}
+    for empleado_id, fecha_hora, tipo in filas:
+        dia = (empleado_id, timezone.localdate(fecha_hora))
+        if dia in marcas:
+            marcas[dia].append((fecha_hora, tipo))
+
+    jornada = configuracion_jornada()
+    resumenes = [
+        calcular_resumen(empleado_id, fecha, lista, jornada)
+        for (empleado_id, fecha), lista in marcas.items() if lista
+    ]
+    _guardar(resumenes, [dia for dia, lista in marcas.items() if not lista])
+
+
+def reconstruir(desde=None, hasta=None, empleados=None, lote=2000):
+    """
+    Recalcula todos los resúmenes (opcionalmente en un rango de fechas locales y para
+    ciertos empleados) recorriendo las marcas en orden con un iterador. Devuelve el
+    número de resúmenes guardados.
+    """
+    asistencias = Asistencia.objects.order_by('empleado_id', 'fecha_hora')
+    existentes = ResumenDiario.objects.all()
+    if desde:
+        asistencias = asistencias.filter(fecha_hora__gte=limites_dia(desde)[0])
+        existentes = existentes.filter(fecha__gte=desde)
+    if hasta:
+        asistencias = asistencias.filter(fecha_hora__lt=limites_dia(hasta)[1])
+        existentes = existentes.filter(fecha__lte=hasta)
+    if empleados:
+        asistencias = asistencias.filter(empleado_id__in=empleados)
+        existentes = existentes.filter(empleado_id__in=empleados)
+
+    jornada = configuracion_jornada()
+    guardados = 0
+    calculados = []
+    actual, marcas = None, []
+    vistos = set()
+
+    def cerrar_dia():
+        if actual is not None:
+            calculados.append(calcular_resumen(actual[0], actual[1], marcas, jornada))
+            vistos.add(actual)
+
+    for empleado_id, fecha_hora, tipo in asistencias.values_list('empleado_id', 'fecha_hora', 'tipo').iterator(chunk_size=lote):
+        dia = (empleado_id, timezone.localdate(fecha_hora))
+        if dia != actual:
+            cerrar_dia()
+            actual, marcas = dia, []
+            if len(calculados) >= lote:
+                _guardar(calculados, [])
+                guardados += len(calculados)
+                calculados = []
+        marcas.append((fecha_hora, tipo))
+    cerrar_dia()
+    _guardar(calculados, [])
+    guardados += len(calculados)
+
+    # Días que tenían resumen pero ya no tienen marcas.
+    huerfanos = [
+        pk for pk, empleado_id, fecha in existentes.values_list('pk', 'empleado_id', 'fecha').iterator()
+        if (empleado_id, fecha) not in vistos
+    ]
+    for inicio in range(0, len(huerfanos), 500):
+        ResumenDiario.objects.filter(pk__in=huerfanos[inicio:inicio + 500]).delete()
+    return guardados
+
+
+def dias_laborables(desde, hasta):
+    """
+    Número de días laborables (JORNADA['DIAS_LABORABLES']) entre dos fechas, inclusive.
+    """
+    laborables = set(configuracion_jornada()['DIAS_LABORABLES'])
+    total = (hasta - desde).days + 1
+    semanas, resto = divmod(max(total, 0), 7)
+    dias = semanas * len(laborables)
+    for i in range(resto):
+        if (desde + timedelta(days=semanas * 7 + i)).weekday() in laborables:
+            dias += 1
+    return dias
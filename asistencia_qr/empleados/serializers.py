@@ -1,12 +1,55 @@
 from rest_framework import serializers
-from .models import Empleado, Asistencia
+from .models import Empleado, Asistencia, ResumenDiario
 
 class EmpleadoSerializer(serializers.ModelSerializer):
     class Meta:
         model = Empleado
-        fields = '__all__'
+        exclude = ('encoding_facial', 'encoding_origen', 'qr_emitido')
 
 class AsistenciaSerializer(serializers.ModelSerializer):
     class Meta:
         model = Asistencia
         fields = '__all__'
+
+
+class AsistenciaConEmpleadoSerializer(AsistenciaSerializer):
+    """
+    Asistencia con los datos del empleado embebidos (?expand=empleado). La vista
+    usa select_related('empleado'), así que no hay una consulta extra por fila.
+    """
+    empleado = EmpleadoSerializer(read_only=True)
+
+
+class MarcaLoteSerializer(serializers.Serializer):
+    """
+    Marca enviada en lote por un kiosco (posiblemente registrada sin conexión).
+    El kiosco envía el texto leído del QR ('qr') y el servidor verifica la firma y
+    que la credencial siga vigente. 'empleado' (ID sin verificar) solo se acepta de
+    integraciones autenticadas y solo se usa si no hay 'qr'.
+    Si no se indica 'tipo', el servidor lo decide alternando Entrada/Salida.
+    """
+    clave = serializers.CharField(max_length=64)
+    qr = serializers.CharField(max_length=128, required=False)
+    empleado = serializers.IntegerField(min_value=1, required=False)
+    fecha_hora = serializers.DateTimeField()
+    tipo = serializers.ChoiceField(choices=['entrada', 'salida'], required=False)
+
+    def validate(self, data):
+        if 'qr' in data:
+            return data
+        if 'empleado' not in data:
+            raise serializers.ValidationError("Indique 'qr' o 'empleado'.")
+        request = self.context.get('request')
+        if request is None or not request.user.is_authenticated:
+            raise serializers.ValidationError("Sin autenticación, cada marca debe incluir el 'qr' leído.")
+        return data
+
+
+class LoteAsistenciasSerializer(serializers.Serializer):
+    marcas = MarcaLoteSerializer(many=True, allow_empty=False, max_length=500)
+
+
+class ResumenDiarioSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ResumenDiario
+        fields = '__all__'
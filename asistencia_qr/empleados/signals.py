@@ -0,0 +1,34 @@
+# empleados/signals.py
+
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import fotos
+from .biometria import deserializar_encoding, encoding_vigente
+from .identificacion import indice_facial
+from .models import Empleado
+
+
+@receiver(pre_save, sender=Empleado)
+def normalizar_foto_perfil(sender, instance, update_fields=None, **kwargs):
+    # Foto recién subida (Admin, API...): se guarda normalizada y con sus derivadas.
+    if update_fields is not None and 'foto_perfil' not in update_fields:
+        return
+    if instance.foto_perfil and not instance.foto_perfil._committed:
+        fotos.procesar(instance)
+    elif not instance.foto_perfil:
+        instance.foto_recorte = instance.foto_miniatura = ''
+
+
+@receiver(post_save, sender=Empleado)
+def actualizar_indice_facial(sender, instance, **kwargs):
+    # Mantiene el índice 1:N sincronizado sin recargarlo completo.
+    if encoding_vigente(instance):
+        indice_facial.actualizar(instance.id, deserializar_encoding(instance.encoding_facial))
+    else:
+        indice_facial.eliminar(instance.id)
+
+
+@receiver(post_delete, sender=Empleado)
+def eliminar_del_indice_facial(sender, instance, **kwargs):
+    indice_facial.eliminar(instance.id)
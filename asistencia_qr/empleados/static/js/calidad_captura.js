@@ -0,0 +1,72 @@
+// =========================================================
+// CONTROL DE CALIDAD PREVIO A LA CAPTURA DEL ROSTRO
+// =========================================================
+// Lo usan la página de validación facial y la del escáner para no enviar fotos que el
+// servidor rechazaría. Los umbrales (CALIDAD_CAPTURA) y las pistas (empleados/calidad.py)
+// llegan del servidor; la página debe incluirlos antes de cargar este archivo:
+//   {{ calidad_captura|json_script:"calidad-captura" }}
+//   {{ pistas_calidad|json_script:"pistas-calidad" }}
+
+const calidadCaptura = (() => {
+    const CALIDAD = JSON.parse(document.getElementById('calidad-captura').textContent);
+    const PISTAS = JSON.parse(document.getElementById('pistas-calidad').textContent);
+    // Mismo lado que LADO_NITIDEZ en el servidor: la nitidez depende de la resolución.
+    const LADO = 112;
+    const INTENTOS = 5;
+    const INTERVALO_MS = 200;
+    const canvas = document.createElement('canvas');
+
+    // Brillo y nitidez (varianza del laplaciano) de la zona central del video, donde
+    // está el rostro, reducida a LADO px como en el servidor. Devuelve el motivo de
+    // rechazo (clave de PISTAS) o null si el fotograma es aceptable.
+    function motivo(video) {
+        const lado = Math.min(video.videoWidth, video.videoHeight) * 0.6;
+        const x = (video.videoWidth - lado) / 2;
+        const y = (video.videoHeight - lado) / 2;
+        canvas.width = canvas.height = LADO;
+        const context = canvas.getContext('2d', { willReadFrequently: true });
+        context.drawImage(video, x, y, lado, lado, 0, 0, LADO, LADO);
+        const pixeles = context.getImageData(0, 0, LADO, LADO).data;
+
+        const gris = new Float32Array(LADO * LADO);
+        let suma = 0;
+        for (let i = 0; i < gris.length; i++) {
+            gris[i] = 0.299 * pixeles[i * 4] + 0.587 * pixeles[i * 4 + 1] + 0.114 * pixeles[i * 4 + 2];
+            suma += gris[i];
+        }
+        const brillo = suma / gris.length;
+        if (brillo < CALIDAD.BRILLO_MIN) return 'oscura';
+        if (brillo > CALIDAD.BRILLO_MAX) return 'sobreexpuesta';
+
+        let n = 0, media = 0, m2 = 0;
+        for (let fila = 1; fila < LADO - 1; fila++) {
+            for (let col = 1; col < LADO - 1; col++) {
+                const i = fila * LADO + col;
+                const valor = gris[i - 1] + gris[i + 1] + gris[i - LADO] + gris[i + LADO] - 4 * gris[i];
+                n++;
+                const delta = valor - media;
+                media += delta / n;
+                m2 += delta * (valor - media);
+            }
+        }
+        if (m2 / n < CALIDAD.NITIDEZ_MIN) return 'borrosa';
+        return null;
+    }
+
+    // Espera hasta INTENTOS fotogramas a que uno sea aceptable, mostrando la pista de
+    // cada rechazo con 'mostrar(texto)'. Si ninguno lo es, lanza un error con la pista
+    // para el usuario (sin llamar al servidor).
+    async function esperar(video, mostrar) {
+        if (!CALIDAD || CALIDAD.ACTIVO === false || !video.videoWidth) return;
+        let ultimo = null;
+        for (let i = 0; i < INTENTOS; i++) {
+            ultimo = motivo(video);
+            if (!ultimo) return;
+            mostrar(PISTAS[ultimo]);
+            await new Promise(r => setTimeout(r, INTERVALO_MS));
+        }
+        throw new Error(PISTAS[ultimo]);
+    }
+
+    return { motivo, esperar };
+})();
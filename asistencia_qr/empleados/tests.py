@@ -1,3 +1,709 @@
-from django.test import TestCase
+import asyncio
+import csv
+import hashlib
+import io
+import json
+import os
+import tempfile
+import time
+import zipfile
+from datetime import datetime, timedelta
+from unittest import mock
+from xml.etree import ElementTree
 
-# Create your tests here.
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+
+from . import (
+    backends, badges, biometria, calidad, exportacion, fotos, identificacion, lector_qr, limites, marcaciones,
+    payload_qr, procesamiento, qr,
+)
+from .models import Asistencia, Empleado, EstadoEmpleado, ResumenDiario
+
+# Sin límite de peticiones: las pruebas hacen varias peticiones seguidas desde el mismo cliente.
+SIN_LIMITES = {'CLIENTE': None, 'EMPLEADO': None}
+
+
+def hora_local(dia, hora, minuto=0):
+    return timezone.make_aware(datetime(2026, 3, dia, hora, minuto))
+
+
+class PruebaBase(TestCase):
+
+    def setUp(self):
+        # Los cubos del limitador y las épocas de revocación de los QR viven en la caché.
+        cache.clear()
+        self.empleado = Empleado.objects.create(nombre='Ana', dni='10000001', area='Ventas')
+
+
+class MarcacionesTests(PruebaBase):
+
+    def test_alterna_entrada_y_salida_en_el_mismo_dia(self):
+        tipos = [
+            marcaciones.registrar_marca(self.empleado, hora_local(2, h)).tipo
+            for h in (8, 12, 13, 17)
+        ]
+        self.assertEqual(tipos, ['entrada', 'salida', 'entrada', 'salida'])
+
+        estado = EstadoEmpleado.objects.get(empleado=self.empleado)
+        self.assertEqual((estado.ultimo_tipo, estado.ultima_marca), ('salida', hora_local(2, 17)))
+
+    def test_entrada_sin_salida_no_pasa_al_dia_siguiente(self):
+        marcaciones.registrar_marca(self.empleado, hora_local(2, 8))
+        self.assertEqual(marcaciones.registrar_marca(self.empleado, hora_local(3, 8)).tipo, 'entrada')
+
+    def test_rebote_rechaza_la_segunda_marca(self):
+        marcaciones.registrar_marca(self.empleado, hora_local(2, 8))
+        with self.assertRaises(marcaciones.MarcaDuplicada) as error:
+            marcaciones.registrar_marca(self.empleado, hora_local(2, 8) + timedelta(seconds=4))
+        self.assertEqual(error.exception.segundos_restantes, 6)
+        self.assertEqual(Asistencia.objects.count(), 1)
+
+    @override_settings(LIMITES_CHECKIN=SIN_LIMITES)
+    def test_checkin_repetido_responde_409(self):
+        encoding = np.zeros(128)
+        contenido = qr.contenido_qr(self.empleado.id, self.empleado.qr_emitido)
+        with (
+            mock.patch('empleados.views._obtener_encoding_perfil', return_value=encoding),
+            mock.patch('empleados.views._codificar_captura', return_value=(encoding, {})),
+        ):
+            respuestas = [
+                self.client.post('/api/checkin/', data=b'jpeg', content_type='image/jpeg', HTTP_X_QR_DATA=contenido)
+                for _ in range(2)
+            ]
+
+        self.assertEqual(respuestas[0].status_code, 200)
+        self.assertEqual(respuestas[0].json()['tipo'], 'entrada')
+        self.assertEqual(respuestas[1].status_code, 409)
+        self.assertIn('Retry-After', respuestas[1].headers)
+        self.assertEqual(Asistencia.objects.count(), 1)
+
+    def test_borrar_la_ultima_marca_recalcula_el_estado(self):
+        marcaciones.registrar_marca(self.empleado, hora_local(2, 8))
+        salida = marcaciones.registrar_marca(self.empleado, hora_local(2, 17))
+
+        respuesta = self.client.delete(f'/api/asistencias/{salida.id}/')
+
+        self.assertEqual(respuesta.status_code, 204)
+        estado = EstadoEmpleado.objects.get(empleado=self.empleado)
+        self.assertEqual((estado.ultimo_tipo, estado.ultima_marca), ('entrada', hora_local(2, 8)))
+
+
+class QRFirmadoTests(PruebaBase):
+
+    def test_verifica_id_y_emision(self):
+        contenido = qr.contenido_qr(self.empleado.id, 1234)
+        self.assertEqual(qr.verificar_contenido_qr(contenido), (self.empleado.id, 1234))
+
+    def test_rechaza_firma_alterada_o_de_otra_clave(self):
+        contenido = qr.contenido_qr(self.empleado.id, 0)
+        alterado = contenido[:-1] + ('A' if contenido[-1] != 'A' else 'B')
+        otra_clave = payload_qr.firmar(self.empleado.id, 0, 'otra-clave')
+
+        for texto in (alterado, otra_clave, str(self.empleado.id), 'AQ1.1.0'):
+            with self.subTest(texto=texto), self.assertRaises(qr.QRInvalido):
+                qr.verificar_contenido_qr(texto)
+
+    def test_reemitir_revoca_la_credencial_anterior(self):
+        anterior = qr.contenido_qr(self.empleado.id, self.empleado.qr_emitido)
+        qr.reemitir(Empleado.objects.filter(id=self.empleado.id))
+        self.empleado.refresh_from_db()
+        nueva = qr.contenido_qr(self.empleado.id, self.empleado.qr_emitido)
+
+        self.assertEqual(self.client.post('/procesar_qr/', {'qr_data': anterior}).status_code, 403)
+        self.assertRedirects(
+            self.client.post('/procesar_qr/', {'qr_data': nueva}),
+            f'/validacion_facial/{self.empleado.id}/', fetch_redirect_response=False,
+        )
+
+    def test_revocacion_sin_cache_se_comprueba_en_bd(self):
+        anterior = qr.contenido_qr(self.empleado.id, self.empleado.qr_emitido)
+        qr.reemitir(Empleado.objects.filter(id=self.empleado.id))
+        cache.clear()
+
+        self.assertEqual(self.client.post('/procesar_qr/', {'qr_data': anterior}).status_code, 403)
+
+    def test_imagen_del_qr_solo_para_staff_y_con_cache_privada(self):
+        url = f'/qr/empleado/{self.empleado.id}/'
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        self.client.force_login(User.objects.create(username='admin', is_staff=True))
+        sin_version = self.client.get(url)
+        versionada = self.client.get(f'{url}?v={self.empleado.qr_emitido}')
+
+        self.assertEqual(sin_version.status_code, 200)
+        self.assertEqual(sin_version.headers['Cache-Control'], 'private, no-cache')
+        self.assertIn('private', versionada.headers['Cache-Control'])
+        self.assertIn('max-age=31536000', versionada.headers['Cache-Control'])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=sin_version.headers['ETag']).status_code, 304)
+
+
+class PaginasTests(PruebaBase):
+
+    def test_pistas_de_calidad_del_servidor(self):
+        for url in ('/scanner/', f'/validacion_facial/{self.empleado.id}/'):
+            with self.subTest(url=url):
+                respuesta = self.client.get(url)
+                self.assertContains(respuesta, 'js/calidad_captura.js')
+                self.assertContains(respuesta, json.dumps(calidad.PISTAS['borrosa'])[1:-1])
+
+
+class LimitesTests(PruebaBase):
+
+    def test_cubo_admite_rafagas_y_se_recarga(self):
+        estado, esperas = None, []
+        for _ in range(3):
+            estado, espera = limites._consumir(estado, 2, 0.5, 100.0)
+            esperas.append(espera)
+
+        self.assertEqual(esperas, [0, 0, 2])
+        self.assertEqual(limites._consumir(estado, 2, 0.5, 101.0)[1], 1)
+        self.assertEqual(limites._consumir(estado, 2, 0.5, 102.0)[1], 0)
+
+    @override_settings(LIMITES_CHECKIN={'CLIENTE': None, 'EMPLEADO': {'CAPACIDAD': 1, 'POR_MINUTO': 6}})
+    def test_un_cubo_por_identificador(self):
+        limites.comprobar('empleado', 1)
+        with self.assertRaises(limites.LimiteExcedido) as error:
+            limites.comprobar('empleado', 1)
+        self.assertEqual(error.exception.retry_after, 10)
+        limites.comprobar('empleado', 2)
+        # Un ámbito desactivado (None) nunca limita.
+        for _ in range(5):
+            limites.comprobar('cliente', '10.0.0.1')
+
+    @override_settings(LIMITES_CHECKIN={'CLIENTE': {'CAPACIDAD': 2, 'POR_MINUTO': 1}, 'EMPLEADO': None})
+    def test_vista_limitada_responde_429_con_retry_after(self):
+        respuestas = [self.client.get('/leer_qr/') for _ in range(3)]
+
+        self.assertEqual([r.status_code for r in respuestas], [405, 405, 429])
+        self.assertEqual(respuestas[2].headers['Retry-After'], '60')
+        # Otra IP tiene su propio cubo.
+        self.assertEqual(self.client.get('/leer_qr/', REMOTE_ADDR='10.0.0.9').status_code, 405)
+
+    @override_settings(LIMITES_CHECKIN={'CLIENTE': None, 'EMPLEADO': {'CAPACIDAD': 1, 'POR_MINUTO': 1}})
+    def test_checkin_limitado_por_empleado(self):
+        contenido = qr.contenido_qr(self.empleado.id, self.empleado.qr_emitido)
+        with (
+            mock.patch('empleados.views._obtener_encoding_perfil', return_value=np.zeros(128)),
+            mock.patch('empleados.views._codificar_captura', return_value=(np.zeros(128), {})),
+        ):
+            codigos = [
+                self.client.post(
+                    '/api/checkin/', data=b'jpeg', content_type='image/jpeg', HTTP_X_QR_DATA=contenido,
+                ).status_code
+                for _ in range(2)
+            ]
+        self.assertEqual(codigos, [200, 429])
+
+    @override_settings(LIMITES_CHECKIN={
+        'CLIENTE': {'CAPACIDAD': 1, 'POR_MINUTO': 1}, 'EMPLEADO': None, 'CABECERA_IP': 'HTTP_X_FORWARDED_FOR',
+    })
+    def test_x_forwarded_for_falsificado_no_da_un_cubo_nuevo(self):
+        codigos = [
+            self.client.get('/leer_qr/', HTTP_X_FORWARDED_FOR=f'10.0.0.{i}, 203.0.113.7').status_code
+            for i in range(2)
+        ]
+        self.assertEqual(codigos, [405, 429])
+
+    def test_ip_segun_los_proxies_de_confianza(self):
+        meta = {'REMOTE_ADDR': '10.0.0.2', 'HTTP_X_FORWARDED_FOR': 'falsa, 203.0.113.7, 10.0.0.1'}
+        self.assertEqual(limites._ip(meta, 'HTTP_X_FORWARDED_FOR', 1), '10.0.0.1')
+        self.assertEqual(limites._ip(meta, 'HTTP_X_FORWARDED_FOR', 2), '203.0.113.7')
+        self.assertEqual(limites._ip(meta, 'HTTP_X_FORWARDED_FOR', 5), 'falsa')
+        self.assertEqual(limites._ip(meta, None), '10.0.0.2')
+
+    def test_ip_del_scope_asgi_une_cabeceras_repetidas(self):
+        scope = {
+            'client': ('10.0.0.2', 50000),
+            'headers': [(b'x-forwarded-for', b'falsa'), (b'x-forwarded-for', b'203.0.113.7')],
+        }
+        self.assertEqual(limites.ip_cliente_asgi(scope, 'HTTP_X_FORWARDED_FOR'), '203.0.113.7')
+        self.assertEqual(limites.ip_cliente_asgi(scope), '10.0.0.2')
+
+
+class LoteTests(PruebaBase):
+
+    def enviar(self, marcas):
+        for marca in marcas:
+            marca.setdefault('qr', qr.contenido_qr(self.empleado.id, self.empleado.qr_emitido))
+            marca['fecha_hora'] = marca['fecha_hora'].isoformat()
+        respuesta = self.client.post(
+            '/api/asistencias/lote/', json.dumps({'marcas': marcas}), content_type='application/json',
+        )
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta.json()
+
+    def test_reenviar_el_lote_no_duplica_marcas(self):
+        marcas = [
+            {'clave': 'a', 'fecha_hora': hora_local(2, 8)},
+            {'clave': 'b', 'fecha_hora': hora_local(2, 17)},
+        ]
+        primero = self.enviar([dict(m) for m in marcas])
+        segundo = self.enviar([dict(m) for m in marcas])
+
+        self.assertEqual([m['tipo'] for m in primero['creadas']], ['entrada', 'salida'])
+        self.assertEqual(segundo['creadas'], [])
+        self.assertEqual(sorted(segundo['duplicadas']), ['a', 'b'])
+        self.assertEqual(Asistencia.objects.count(), 2)
+
+    def test_clave_repetida_en_el_mismo_lote(self):
+        resultado = self.enviar([
+            {'clave': 'a', 'fecha_hora': hora_local(2, 8)},
+            {'clave': 'a', 'fecha_hora': hora_local(2, 9)},
+        ])
+        self.assertEqual(len(resultado['creadas']), 1)
+        self.assertEqual(resultado['duplicadas'], ['a'])
+
+    def test_rechazadas(self):
+        marcaciones.registrar_marca(self.empleado, hora_local(2, 7))
+        revocado = qr.contenido_qr(self.empleado.id, self.empleado.qr_emitido)
+        qr.reemitir(Empleado.objects.filter(id=self.empleado.id))
+        self.empleado.refresh_from_db()
+
+        resultado = self.enviar([
+            {'clave': 'revocado', 'qr': revocado, 'fecha_hora': hora_local(2, 8)},
+            {'clave': 'falso', 'qr': 'AQ1.1.0.AAAAAAAAAAAAAAAA', 'fecha_hora': hora_local(2, 8)},
+            {'clave': 'rebote_bd', 'fecha_hora': hora_local(2, 7) + timedelta(seconds=3)},
+            {'clave': 'valida', 'fecha_hora': hora_local(2, 12)},
+            {'clave': 'rebote_lote', 'fecha_hora': hora_local(2, 12) + timedelta(seconds=3)},
+        ])
+
+        rechazadas = {r['clave']: r['motivo'] for r in resultado['rechazadas']}
+        self.assertEqual(set(rechazadas), {'revocado', 'falso', 'rebote_bd', 'rebote_lote'})
+        self.assertEqual(rechazadas['revocado'], 'QR inválido o revocado.')
+        self.assertEqual(rechazadas['rebote_bd'], 'Marca duplicada (rebote).')
+        self.assertEqual([(m['clave'], m['tipo']) for m in resultado['creadas']], [('valida', 'salida')])
+
+    def test_empleado_sin_qr_solo_con_autenticacion(self):
+        marca = {'clave': 'a', 'empleado': self.empleado.id, 'fecha_hora': hora_local(2, 8).isoformat()}
+
+        def enviar():
+            return self.client.post(
+                '/api/asistencias/lote/', json.dumps({'marcas': [marca]}), content_type='application/json',
+            )
+
+        self.assertEqual(enviar().status_code, 400)
+        self.assertEqual(Asistencia.objects.count(), 0)
+
+        self.client.force_login(User.objects.create(username='integracion'))
+        self.assertEqual(enviar().json()['creadas'][0]['clave'], 'a')
+
+    def test_empleado_inexistente(self):
+        resultado = self.enviar([{'clave': 'x', 'qr': qr.contenido_qr(999, 0), 'fecha_hora': hora_local(2, 8)}])
+        self.assertEqual(resultado['rechazadas'], [{'clave': 'x', 'motivo': 'Empleado no encontrado.'}])
+
+
+class ResumenPorAreaTests(PruebaBase):
+
+    def setUp(self):
+        super().setUp()
+        self.almacen = Empleado.objects.create(nombre='Beto', dni='10000002', area='Almacén')
+        Empleado.objects.create(nombre='Carla', dni='10000003', area='Almacén')
+
+        # Lunes 2 de marzo de 2026: Ana cumple la jornada, Beto llega 30 minutos tarde
+        # y Carla no marca.
+        for empleado, marcas in (
+            (self.empleado, [hora_local(2, 8), hora_local(2, 16)]),
+            (self.almacen, [hora_local(2, 8, 30), hora_local(2, 17, 30)]),
+        ):
+            for ahora in marcas:
+                marcaciones.registrar_marca(empleado, ahora)
+
+    def test_resumen_diario_por_empleado(self):
+        resumen = ResumenDiario.objects.get(empleado=self.almacen)
+        self.assertEqual(resumen.segundos_trabajados, 9 * 3600)
+        self.assertEqual(resumen.tardanza_segundos, 30 * 60)
+        self.assertFalse(resumen.entrada_abierta)
+
+    def test_totales_por_area(self):
+        respuesta = self.client.get('/api/resumenes/por_area/?desde=2026-03-02&hasta=2026-03-02')
+
+        self.assertEqual(respuesta.status_code, 200)
+        datos = respuesta.json()
+        self.assertEqual(datos['dias_laborables'], 1)
+        areas = {fila['area']: fila for fila in datos['areas']}
+        self.assertEqual(
+            {k: areas['Ventas'][k] for k in ('empleados', 'horas_trabajadas', 'tardanzas', 'ausencias')},
+            {'empleados': 1, 'horas_trabajadas': 8.0, 'tardanzas': 0, 'ausencias': 0},
+        )
+        self.assertEqual(
+            {k: areas['Almacén'][k] for k in ('empleados', 'horas_trabajadas', 'tardanzas', 'minutos_tardanza', 'ausencias')},
+            {'empleados': 2, 'horas_trabajadas': 9.0, 'tardanzas': 1, 'minutos_tardanza': 30.0, 'ausencias': 1},
+        )
+
+    def test_filtro_por_area_y_rango_obligatorio(self):
+        respuesta = self.client.get('/api/resumenes/por_area/?desde=2026-03-02&hasta=2026-03-02&area=Ventas')
+        self.assertEqual([fila['area'] for fila in respuesta.json()['areas']], ['Ventas'])
+        self.assertEqual(self.client.get('/api/resumenes/por_area/').status_code, 400)
+
+
+class BadgesTests(PruebaBase):
+
+    def generar(self, formato):
+        for i in range(2, 10):
+            Empleado.objects.create(nombre=f'Empleado {i}', dni=f'2000000{i}')
+        with tempfile.TemporaryDirectory() as carpeta:
+            salida = f'{carpeta}/credenciales.{formato}'
+            call_command('generar_badges', formato=formato, salida=salida, workers=1, stdout=io.StringIO())
+            with open(salida, 'rb') as archivo:
+                return archivo.read()
+
+    def test_zip_con_un_png_por_empleado(self):
+        with zipfile.ZipFile(io.BytesIO(self.generar('zip'))) as zf:
+            self.assertEqual(len(zf.namelist()), 9)
+            self.assertEqual(zf.namelist()[0], f'Ana_{self.empleado.id}.png')
+
+    def test_pdf_con_hojas_de_ocho_credenciales_sin_perdida(self):
+        pdf = self.generar('pdf')
+        self.assertTrue(pdf.startswith(b'%PDF'))
+        self.assertIn(b'/Count 2', pdf)
+        self.assertNotIn(b'/DCTDecode', pdf)
+
+    def test_hojas_en_blanco_y_negro(self):
+        filas = [(i, f'E{i}', str(i), qr.contenido_qr(i, 0)) for i in range(1, 10)]
+        hojas = list(badges.paginas(map(badges.renderizar_fila, filas)))
+        self.assertEqual([(h.mode, h.size) for h in hojas], [('1', badges.PAGINA_PX)] * 2)
+
+
+class IndiceFacialTests(PruebaBase):
+
+    def setUp(self):
+        super().setUp()
+        rng = np.random.default_rng(0)
+        self.vectores = {}
+        for dni, vigente in (('30000001', True), ('30000002', True), ('30000003', False)):
+            foto = f'fotos_empleados/{dni}.jpg'
+            vector = rng.normal(0, 0.1, 128)
+            empleado = Empleado.objects.create(
+                nombre=dni, dni=dni, foto_perfil=foto,
+                encoding_facial=biometria.serializar_encoding(vector),
+                encoding_origen=biometria.origen_encoding(foto if vigente else 'fotos_empleados/anterior.jpg'),
+            )
+            self.vectores[empleado.id] = vector
+        self.a, self.b, self.obsoleto = self.vectores
+        self.indice = identificacion.IndiceFacial()
+
+    def test_carga_solo_encodings_vigentes_y_devuelve_el_mas_cercano(self):
+        consulta = self.vectores[self.b] + 0.01
+        empleado_id, distancia = self.indice.buscar(consulta)
+
+        self.assertEqual(len(self.indice), 2)
+        self.assertEqual(empleado_id, self.b)
+        self.assertAlmostEqual(distancia, np.linalg.norm(consulta - self.vectores[self.b]), places=4)
+        self.assertIsNone(self.indice.buscar(self.vectores[self.obsoleto]))
+        self.assertIsNone(self.indice.buscar(self.vectores[self.b] + 1))
+
+    def test_altas_y_bajas_incrementales(self):
+        self.indice.cargar()
+        nuevo = np.full(128, 0.05)
+        self.indice.actualizar(999, nuevo)
+        self.indice.eliminar(self.a)
+
+        self.assertEqual(self.indice.buscar(nuevo)[0], 999)
+        # La baja mueve la última fila al hueco: los IDs deben seguir correspondiendo.
+        self.assertEqual(self.indice.buscar(self.vectores[self.b])[0], self.b)
+        self.assertNotEqual((self.indice.buscar(self.vectores[self.a]) or (None,))[0], self.a)
+        self.assertEqual(len(self.indice), 2)
+
+    def test_cambios_durante_la_recarga_no_se_pierden(self):
+        self.indice.cargar()
+        nuevo = np.full(128, 0.05)
+        origen_real = identificacion.origen_encoding
+
+        def origen_con_alta_concurrente(foto):
+            # Una señal de Empleado llega mientras la recarga lee la BD.
+            self.indice.actualizar(999, nuevo)
+            return origen_real(foto)
+
+        with mock.patch('empleados.identificacion.origen_encoding', side_effect=origen_con_alta_concurrente):
+            self.indice.cargar()
+
+        self.assertEqual(self.indice.buscar(nuevo)[0], 999)
+        self.assertEqual(len(self.indice), 3)
+
+    def test_senales_de_empleado_actualizan_el_indice_global(self):
+        identificacion.indice_facial.cargar()
+        self.addCleanup(identificacion.indice_facial._vaciar)
+        Empleado.objects.filter(id=self.a).delete()
+        self.assertNotEqual((identificacion.indice_facial.buscar(self.vectores[self.a]) or (None,))[0], self.a)
+
+
+class PoolFacialTests(PruebaBase):
+
+    def crear_pool(self, **opciones):
+        pool = procesamiento.PoolFacial(**opciones)
+        self.addCleanup(pool.cerrar)
+        return pool
+
+    def test_cola_llena_rechaza_sin_esperar(self):
+        pool = self.crear_pool(workers=1, max_pendientes=1, timeout=10)
+        en_curso = pool.enviar(time.sleep, 0.3)
+        with self.assertRaises(procesamiento.ColaLlena):
+            pool.enviar(abs, -1)
+        en_curso.result()
+
+        # El hueco se libera al terminar el trabajo (en el hilo del executor).
+        for _ in range(50):
+            try:
+                self.assertEqual(pool.ejecutar(abs, -2), 2)
+                break
+            except procesamiento.ColaLlena:
+                time.sleep(0.02)
+        else:
+            self.fail("El pool no liberó el hueco del trabajo terminado.")
+
+    def test_proceso_caido_responde_cola_llena_y_el_pool_se_recupera(self):
+        pool = self.crear_pool(workers=1, max_pendientes=2, timeout=10)
+        with self.assertRaises(procesamiento.ColaLlena):
+            pool.ejecutar(os._exit, 1)
+        self.assertEqual(pool.ejecutar(abs, -3), 3)
+
+    def test_sin_workers_el_trabajo_async_no_bloquea_el_event_loop(self):
+        pool = self.crear_pool(workers=0, max_pendientes=1)
+
+        async def principal():
+            tarea = pool.enviar_async(time.sleep, 0.2)
+            with self.assertRaises(procesamiento.ColaLlena):
+                pool.enviar_async(abs, -1)
+            inicio = time.perf_counter()
+            await asyncio.sleep(0.01)
+            # Si time.sleep corriera en el event loop, este sleep tardaría 0.2 s.
+            self.assertLess(time.perf_counter() - inicio, 0.15)
+            self.assertFalse(tarea.done())
+            await tarea
+            return await pool.enviar_async(abs, -4)
+
+        self.assertEqual(asyncio.run(principal()), 4)
+
+    @override_settings(LIMITES_CHECKIN=SIN_LIMITES)
+    def test_pool_ocupado_responde_503_con_retry_after(self):
+        contenido = qr.contenido_qr(self.empleado.id, self.empleado.qr_emitido)
+        with (
+            mock.patch('empleados.views._obtener_encoding_perfil', return_value=np.zeros(128)),
+            mock.patch.object(procesamiento.pool_facial, 'ejecutar', side_effect=procesamiento.ColaLlena),
+        ):
+            respuesta = self.client.post(
+                '/api/checkin/', data=b'jpeg', content_type='image/jpeg', HTTP_X_QR_DATA=contenido,
+            )
+
+        self.assertEqual(respuesta.status_code, 503)
+        self.assertEqual(respuesta.headers['Retry-After'], str(procesamiento.RETRY_AFTER))
+        self.assertEqual(Asistencia.objects.count(), 0)
+
+
+class ExportacionTests(PruebaBase):
+
+    def setUp(self):
+        super().setUp()
+        self.otro = Empleado.objects.create(nombre='Díaz, "Beto" <&>', dni='10000002', area='Almacén')
+        for empleado, ahora in (
+            (self.empleado, hora_local(2, 8)),
+            (self.otro, hora_local(2, 8, 30)),
+            (self.empleado, hora_local(2, 17)),
+            (self.empleado, hora_local(4, 8)),
+        ):
+            marcaciones.registrar_marca(empleado, ahora)
+        self.client.force_login(User.objects.create(username='admin', is_staff=True))
+
+    def exportar(self, **params):
+        respuesta = self.client.get('/exportar/asistencias/', params)
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta, b''.join(respuesta.streaming_content)
+
+    def test_csv_en_orden_y_hora_local(self):
+        respuesta, contenido = self.exportar(formato='csv', desde='2026-03-02', hasta='2026-03-02')
+
+        self.assertTrue(contenido.startswith('\ufeff'.encode()))
+        self.assertIn('attachment; filename="asistencias_', respuesta.headers['Content-Disposition'])
+        filas = list(csv.reader(io.StringIO(contenido.decode('utf-8-sig'))))
+        self.assertEqual(filas[0], exportacion.CABECERA)
+        self.assertEqual(filas[1:], [
+            ['2026-03-02', '08:00:00', 'entrada', str(self.empleado.id), 'Ana', '10000001', 'Ventas'],
+            ['2026-03-02', '08:30:00', 'entrada', str(self.otro.id), 'Díaz, "Beto" <&>', '10000002', 'Almacén'],
+            ['2026-03-02', '17:00:00', 'salida', str(self.empleado.id), 'Ana', '10000001', 'Ventas'],
+        ])
+
+    def test_csv_filtrado_por_area(self):
+        _, contenido = self.exportar(formato='csv', area='Almacén')
+        self.assertEqual(len(contenido.decode('utf-8-sig').splitlines()), 2)
+
+    @mock.patch('empleados.exportacion.TAMANO_BLOQUE', 2)
+    def test_xlsx_por_bloques(self):
+        partes = list(self.client.get('/exportar/asistencias/', {'formato': 'xlsx'}).streaming_content)
+
+        # Archivos fijos, dos bloques de 2 filas y el cierre.
+        self.assertEqual(len(partes), 4)
+        with zipfile.ZipFile(io.BytesIO(b''.join(partes))) as zf:
+            hoja = ElementTree.fromstring(zf.read('xl/worksheets/sheet1.xml'))
+        ns = {'x': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+        filas = hoja.findall('.//x:sheetData/x:row', ns)
+        self.assertEqual(len(filas), 5)
+
+        fecha, hora, tipo, _, nombre, _, _ = filas[2].findall('x:c', ns)
+        # Serial de Excel: días desde 1899-12-30, en hora local.
+        self.assertAlmostEqual(float(fecha.find('x:v', ns).text), 46083 + 8.5 / 24, places=6)
+        self.assertEqual(hora.find('.//x:t', ns).text, '08:30:00')
+        self.assertEqual(nombre.find('.//x:t', ns).text, 'Díaz, "Beto" <&>')
+
+    def test_solo_staff_y_formatos_conocidos(self):
+        self.assertEqual(self.exportar(formato='csv')[0].status_code, 200)
+        self.assertEqual(self.client.get('/exportar/asistencias/', {'formato': 'pdf'}).status_code, 400)
+        self.client.logout()
+        self.assertEqual(self.client.get('/exportar/asistencias/').status_code, 302)
+
+
+def png_gris(imagen):
+    buf = io.BytesIO()
+    imagen.convert('L').save(buf, 'PNG')
+    return buf.getvalue()
+
+
+@override_settings(LIMITES_CHECKIN=SIN_LIMITES)
+class LectorQRTests(PruebaBase):
+
+    def setUp(self):
+        super().setUp()
+        self.contenido = qr.contenido_qr(self.empleado.id, self.empleado.qr_emitido)
+        # Credencial pequeña en un fotograma de 800x600, como la ve la cámara del kiosco.
+        fotograma = Image.new('L', (800, 600), 200)
+        fotograma.paste(qr.imagen_qr(self.contenido, box_size=6).convert('L'), (250, 120))
+        self.con_qr = png_gris(fotograma)
+        self.sin_qr = png_gris(Image.new('L', (800, 600), 200))
+
+    def test_se_detiene_en_el_primer_fotograma_con_qr(self):
+        resultado = lector_qr.leer_lote([self.sin_qr, self.con_qr, self.sin_qr])
+
+        self.assertEqual(resultado['texto'], self.contenido)
+        self.assertEqual((resultado['fotograma'], resultado['procesados']), (1, 2))
+        self.assertIn(resultado['lector'], ('pyzbar', 'opencv'))
+
+    def test_sin_pyzbar_usa_opencv(self):
+        with mock.patch('empleados.lector_qr._pyzbar', False):
+            resultado = lector_qr.leer_lote([self.con_qr])
+        self.assertEqual((resultado['texto'], resultado['lector']), (self.contenido, 'opencv'))
+
+    def test_fotograma_invalido(self):
+        with self.assertRaises(lector_qr.FotogramaInvalido):
+            lector_qr.leer_lote([b'no es una imagen'])
+
+    def test_vista_devuelve_el_empleado(self):
+        respuesta = self.client.post('/leer_qr/', {'fotograma': [
+            SimpleUploadedFile('a.png', self.sin_qr, 'image/png'),
+            SimpleUploadedFile('b.png', self.con_qr, 'image/png'),
+        ]})
+
+        self.assertEqual(respuesta.status_code, 200)
+        datos = respuesta.json()
+        self.assertEqual(datos['empleado']['id'], self.empleado.id)
+        self.assertEqual(datos['validacion_url'], f'/validacion_facial/{self.empleado.id}/')
+        self.assertEqual(datos['lectura']['fotograma'], 1)
+
+    def test_vista_sin_qr_o_con_qr_revocado(self):
+        self.assertEqual(
+            self.client.post('/leer_qr/', data=self.sin_qr, content_type='image/png').status_code, 422,
+        )
+        qr.reemitir(Empleado.objects.filter(id=self.empleado.id))
+        self.assertEqual(
+            self.client.post('/leer_qr/', data=self.con_qr, content_type='image/png').status_code, 403,
+        )
+
+
+def jpeg(tamano=(2000, 1000), color=(200, 150, 100), orientacion=None):
+    exif = Image.Exif()
+    if orientacion:
+        exif[0x0112] = orientacion
+    buf = io.BytesIO()
+    Image.new('RGB', tamano, color).save(buf, 'JPEG', exif=exif)
+    return buf.getvalue()
+
+
+class DetectorFalso:
+    """
+    Backend que "detecta" un rostro de 200x200 px en el centro de la imagen (o ninguno).
+    """
+    def __init__(self, con_rostro=True):
+        self.con_rostro = con_rostro
+
+    def detectar(self, imagen, upsample=1):
+        if not self.con_rostro:
+            return []
+        alto, ancho = imagen.shape[:2]
+        return [backends.Rostro((alto // 2 - 100, ancho // 2 + 100, alto // 2 + 100, ancho // 2 - 100))]
+
+
+class FotosTests(PruebaBase):
+
+    def setUp(self):
+        super().setUp()
+        carpeta = tempfile.TemporaryDirectory()
+        self.addCleanup(carpeta.cleanup)
+        almacen = override_settings(MEDIA_ROOT=carpeta.name)
+        almacen.enable()
+        self.addCleanup(almacen.disable)
+        detector = mock.patch('empleados.fotos.backends.obtener_backend', return_value=DetectorFalso(con_rostro=False))
+        self.obtener_backend = detector.start()
+        self.addCleanup(detector.stop)
+
+    def subir(self, datos, empleado=None):
+        empleado = empleado or self.empleado
+        empleado.foto_perfil = SimpleUploadedFile('foto.jpg', datos, 'image/jpeg')
+        empleado.save()
+        return empleado
+
+    def abrir(self, ruta):
+        with default_storage.open(ruta) as archivo:
+            return Image.open(io.BytesIO(archivo.read()))
+
+    def test_foto_normalizada_con_nombre_por_contenido(self):
+        datos = jpeg(orientacion=6)  # EXIF: girar 90°
+        self.subir(datos)
+
+        huella = hashlib.sha256(datos).hexdigest()
+        self.assertEqual(self.empleado.foto_perfil.name, f'fotos_empleados/{huella[:2]}/{huella}.jpg')
+        self.assertEqual(self.abrir(self.empleado.foto_perfil.name).size, (512, 1024))
+        self.assertEqual(self.abrir(self.empleado.foto_miniatura.name).size, (64, 128))
+        # Sin rostro no hay recorte: el encoding se calcula sobre la foto completa.
+        self.assertEqual(self.empleado.foto_recorte.name, '')
+
+    def test_recorte_cuadrado_del_rostro(self):
+        self.obtener_backend.return_value = DetectorFalso()
+        datos = jpeg()
+        self.subir(datos)
+
+        self.assertEqual(self.empleado.foto_recorte.name, fotos.rutas(hashlib.sha256(datos).hexdigest())[1])
+        self.assertEqual(self.abrir(self.empleado.foto_recorte.name).size, (300, 300))
+
+    def test_la_misma_foto_se_guarda_una_vez(self):
+        datos = jpeg()
+        otro = Empleado.objects.create(nombre='Beto', dni='10000002')
+        self.subir(datos)
+        self.subir(datos, otro)
+
+        self.assertEqual(otro.foto_perfil.name, self.empleado.foto_perfil.name)
+        carpeta = self.empleado.foto_perfil.name.rsplit('/', 1)[0]
+        self.assertEqual(len(default_storage.listdir(carpeta)[1]), 1)
+
+    def test_limpiar_fotos_borra_solo_huerfanas_antiguas(self):
+        self.subir(jpeg(color=(10, 20, 30)))
+        anteriores = [self.empleado.foto_perfil.name, self.empleado.foto_miniatura.name]
+        self.subir(jpeg(color=(200, 150, 100)))
+        en_uso = [self.empleado.foto_perfil.name, self.empleado.foto_miniatura.name]
+        reciente = default_storage.save('fotos_empleados/zz/subida_en_curso.jpg', io.BytesIO(b'jpeg'))
+
+        antiguo = time.time() - 2 * 3600
+        for ruta in anteriores + en_uso:
+            os.utime(default_storage.path(ruta), (antiguo, antiguo))
+
+        call_command('limpiar_fotos', dry_run=True, stdout=io.StringIO())
+        self.assertTrue(all(default_storage.exists(ruta) for ruta in anteriores))
+
+        call_command('limpiar_fotos', stdout=io.StringIO())
+        self.assertFalse(any(default_storage.exists(ruta) for ruta in anteriores))
+        self.assertTrue(all(default_storage.exists(ruta) for ruta in en_uso + [reciente]))
@@ -0,0 +1,258 @@
+# empleados/tiempo_real.py
+"""
+Validación facial por WebSocket: /ws/validacion/<empleado_id>/
+
+La página de validación abre una conexión y envía una ráfaga de fotogramas JPEG de
+baja resolución (mensajes binarios). Cada fotograma se codifica en el pool de
+procesos en cuanto llega y el servidor responde con el progreso de cada uno. En
+cuanto VALIDACION_STREAM['COINCIDENCIAS'] fotogramas distintos coinciden con la
+foto de perfil se registra la marca, se envía el resultado y se cierra: no hace
+falta esperar al resto de la ráfaga ni repetir peticiones HTTP.
+
+Mensajes del servidor (texto JSON):
+    {"evento": "fotograma", "indice": 3, "rostro": true, "distancia": 0.41, "coincide": true}
+    {"evento": "resultado", "success": true, "status": 200, "message": "...", "tipo": "entrada", ...}
+
+El cliente puede enviar el texto "fin" para indicar que no mandará más fotogramas.
+Si el pool facial estaba lleno y se descartaron fotogramas sin ninguna coincidencia,
+el resultado es 503 con 'retry_after' (el cliente debe reintentar), no un rechazo.
+
+Solo se aceptan conexiones cuyo Origin sea uno de ALLOWED_HOSTS: el navegador envía
+las cookies de sesión en el handshake, así que otra web no debe poder abrirlo.
+Es una aplicación ASGI sin dependencias (no usa Channels); asgi.py le pasa las
+conexiones de tipo 'websocket'.
+"""
+import asyncio
+import hashlib
+import json
+import re
+import time
+
+from urllib.parse import urlsplit
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http.request import split_domain_port, validate_host
+
+from . import backends, calidad, limites, metricas, procesamiento
+from .models import Empleado
+from .views import ErrorCheckin, _obtener_encoding_perfil, _registrar_entrada_salida
+
+RUTA_VALIDACION = re.compile(r'^/ws/validacion/(?P<empleado_id>\d+)/$')
+
+CONFIG = {
+    'MAX_FOTOGRAMAS': 12,      # fotogramas aceptados por conexión
+    'COINCIDENCIAS': 2,        # fotogramas distintos que deben coincidir
+    'EN_VUELO': 2,             # fotogramas codificándose a la vez por conexión
+    'MAX_BYTES': 256 * 1024,   # tamaño máximo de un fotograma
+    'TIMEOUT': 15,             # segundos máximos por conexión
+    **getattr(settings, 'VALIDACION_STREAM', {}),
+}
+
+# Códigos de cierre; 4000-4999 están reservados para la aplicación.
+CIERRE_NORMAL = 1000
+CIERRE_PROHIBIDO = 4403
+CIERRE_NO_ENCONTRADO = 4404
+CIERRE_LIMITE = 4429
+
+
+class SesionValidacion:
+
+    def __init__(self, empleado, encoding_bd, receive, send):
+        self.empleado = empleado
+        self.encoding_bd = encoding_bd
+        self.receive = receive
+        self.send = send
+        self.backend = backends.obtener_backend()
+        self.recibidos = 0
+        self.coincidencias = 0
+        self.vistos = set()
+        self.en_vuelo = {}  # tarea -> índice del fotograma
+        self.ultima_pista = None  # último CalidadInsuficiente, para el resultado final
+        self.descartados = 0  # fotogramas que no cupieron en el pool (ColaLlena)
+        self.fin = False
+
+    async def enviar(self, **datos):
+        await self.send({'type': 'websocket.send', 'text': json.dumps(datos)})
+
+    async def resultado(self, success, status, message, **extra):
+        await self.enviar(evento='resultado', success=success, status=status, message=message,
+                          fotogramas=self.recibidos, **extra)
+        await self.send({'type': 'websocket.close', 'code': CIERRE_NORMAL})
+
+    def _encolar(self, fotograma):
+        """
+        Envía el fotograma al pool. Los repetidos (misma imagen) y los que llegan con
+        el máximo de trabajos en curso se descartan: la ráfaga trae más.
+        """
+        huella = hashlib.blake2b(fotograma, digest_size=16).digest()
+        if huella in self.vistos or len(self.en_vuelo) >= CONFIG['EN_VUELO']:
+            return
+        try:
+            tarea = procesamiento.pool_facial.enviar_async(
+                procesamiento.codificar_captura, fotograma,
+                procesamiento.OPCIONES_PREPROCESADO, procesamiento.CONFIG_BACKEND, procesamiento.OPCIONES_CALIDAD,
+            )
+        except procesamiento.ColaLlena:
+            self.descartados += 1
+            return
+        self.vistos.add(huella)
+        self.recibidos += 1
+        self.en_vuelo[tarea] = self.recibidos
+
+    async def _evaluar(self, tarea):
+        """
+        Procesa el resultado de un fotograma. Devuelve True si ya hay coincidencia suficiente.
+        """
+        indice = self.en_vuelo.pop(tarea)
+        try:
+            encodings, tiempos = tarea.result()
+        except calidad.CalidadInsuficiente as e:
+            self.ultima_pista = e
+            await self.enviar(evento='fotograma', indice=indice, rostro=False, motivo=e.motivo, pista=e.pista)
+            return False
+        except procesamiento.ColaLlena:
+            self.descartados += 1
+            await self.enviar(evento='fotograma', indice=indice, rostro=False, error=True)
+            return False
+        except Exception as e:
+            print(f"Error procesando fotograma {indice}: {e}")
+            await self.enviar(evento='fotograma', indice=indice, rostro=False, error=True)
+            return False
+
+        metricas.observar_tiempos('validacion_stream', tiempos)
+        if not encodings:
+            await self.enviar(evento='fotograma', indice=indice, rostro=False)
+            return False
+
+        distancia = self.backend.distancia(self.encoding_bd, encodings[0])
+        coincide = distancia <= self.backend.tolerancia
+        self.coincidencias += coincide
+        await self.enviar(evento='fotograma', indice=indice, rostro=True,
+                          distancia=round(distancia, 4), coincide=coincide)
+        return self.coincidencias >= CONFIG['COINCIDENCIAS']
+
+    async def validar(self):
+        limite = time.monotonic() + CONFIG['TIMEOUT']
+        recibir = None
+        try:
+            while True:
+                if recibir is None and not self.fin:
+                    recibir = asyncio.ensure_future(self.receive())
+                esperando = set(self.en_vuelo) | ({recibir} if recibir else set())
+                if not esperando:
+                    break
+
+                hechas, _ = await asyncio.wait(
+                    esperando, timeout=max(limite - time.monotonic(), 0), return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not hechas:
+                    await self.resultado(False, 408, 'Tiempo de validación agotado. Intente de nuevo.')
+                    return
+
+                for tarea in hechas:
+                    if tarea is recibir:
+                        recibir = None
+                        mensaje = tarea.result()
+                        if mensaje['type'] == 'websocket.disconnect':
+                            return
+                        if mensaje.get('bytes') is not None:
+                            if len(mensaje['bytes']) > CONFIG['MAX_BYTES']:
+                                await self.resultado(False, 413, 'Fotograma demasiado grande.')
+                                return
+                            self._encolar(mensaje['bytes'])
+                            self.fin = self.recibidos >= CONFIG['MAX_FOTOGRAMAS']
+                        elif (mensaje.get('text') or '').strip() == 'fin':
+                            self.fin = True
+                    elif await self._evaluar(tarea):
+                        await self._registrar()
+                        return
+
+            if self.coincidencias == 0 and self.descartados:
+                await self.resultado(
+                    False, 503, 'Servidor ocupado procesando otras validaciones. Intente de nuevo en unos segundos.',
+                    retry_after=procesamiento.RETRY_AFTER,
+                )
+                return
+            if self.coincidencias == 0 and self.ultima_pista is not None:
+                await self.resultado(False, 422, self.ultima_pista.pista, motivo=self.ultima_pista.motivo)
+                return
+            await self.resultado(False, 403, 'Rostro no reconocido. La validación biométrica ha fallado.')
+        finally:
+            if recibir is not None:
+                recibir.cancel()
+            for tarea in self.en_vuelo:
+                tarea.cancel()
+
+    async def _registrar(self):
+        try:
+            tipo = await sync_to_async(_registrar_entrada_salida)(self.empleado)
+        except ErrorCheckin as e:
+            await self.resultado(False, e.status, e.mensaje)
+            return
+        await self.resultado(
+            True, 200,
+            f"Identidad Verificada. Asistencia de {self.empleado.nombre} registrada como {tipo.upper()}.",
+            nombre=self.empleado.nombre, tipo=tipo,
+        )
+
+
+def origen_permitido(scope):
+    """
+    True si la cabecera Origin del handshake apunta a uno de ALLOWED_HOSTS (con las
+    mismas reglas que HttpRequest.get_host()). Sin Origin solo se admite con '*'.
+    """
+    permitidos = settings.ALLOWED_HOSTS
+    if settings.DEBUG and not permitidos:
+        permitidos = ['.localhost', '127.0.0.1', '[::1]']
+    origen = dict(scope.get('headers', [])).get(b'origin', b'').decode('latin-1')
+    if not origen or origen == 'null':
+        return '*' in permitidos
+    dominio, _ = split_domain_port(urlsplit(origen).netloc.rsplit('@', 1)[-1])
+    return bool(dominio) and validate_host(dominio, permitidos)
+
+
+async def aplicacion_websocket(scope, receive, send):
+    """
+    Aplicación ASGI para las conexiones WebSocket (ver asgi.py).
+    """
+    coincidencia = RUTA_VALIDACION.match(scope['path'])
+    mensaje = await receive()
+    if mensaje['type'] != 'websocket.connect':
+        return
+
+    # Cerrar antes de aceptar rechaza el handshake (HTTP 403).
+    if not origen_permitido(scope):
+        await send({'type': 'websocket.close', 'code': CIERRE_PROHIBIDO})
+        return
+
+    # Mismos límites que las vistas HTTP (limites.py), antes de tocar la BD.
+    opciones = limites.configuracion()
+    try:
+        if coincidencia:
+            ip = limites.ip_cliente_asgi(scope, opciones['CABECERA_IP'], opciones['PROXIES_CONFIABLES'])
+            await limites.acomprobar('cliente', ip, opciones)
+            await limites.acomprobar('empleado', int(coincidencia['empleado_id']), opciones)
+    except limites.LimiteExcedido:
+        await send({'type': 'websocket.close', 'code': CIERRE_LIMITE})
+        return
+
+    empleado = None
+    if coincidencia:
+        empleado = await Empleado.objects.filter(id=int(coincidencia['empleado_id'])).afirst()
+    if empleado is None:
+        # Cerrar antes de aceptar rechaza el handshake (HTTP 403).
+        await send({'type': 'websocket.close', 'code': CIERRE_NO_ENCONTRADO})
+        return
+
+    await send({'type': 'websocket.accept'})
+    try:
+        encoding_bd = await sync_to_async(_obtener_encoding_perfil)(empleado)
+    except ErrorCheckin as e:
+        encoding_bd = None
+        error = e
+    sesion = SesionValidacion(empleado, encoding_bd, receive, send)
+    if encoding_bd is None:
+        await sesion.resultado(False, error.status, error.mensaje)
+        return
+    await sesion.validar()
@@ -2,23 +2,36 @@ from rest_framework import viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response as DRFResponse
 from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from django.db.models import Count, Q, Sum
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import HttpResponse, JsonResponse
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django.views.decorators.csrf import csrf_exempt 
 from django.utils.decorators import method_decorator
-import qrcode
-import io
+from asgiref.sync import sync_to_async
+from concurrent.futures import TimeoutError as FuturesTimeoutError
 import json
 import base64
+import asyncio
+from datetime import datetime, time, timedelta
 
-# 🚨 NUEVAS IMPORTACIONES PARA RECONOCIMIENTO FACIAL
-import face_recognition
-import numpy as np
-
-from .models import Empleado, Asistencia
-from .serializers import EmpleadoSerializer, AsistenciaSerializer
+from . import (
+    backends, biometria, calidad, exportacion, identificacion, lector_qr, limites, marcaciones, metricas, procesamiento, qr,
+    resumenes,
+)
+from .models import Empleado, Asistencia, ResumenDiario
+from .paginacion import AsistenciaCursorPagination, ResumenCursorPagination
+from .serializers import (
+    EmpleadoSerializer, AsistenciaSerializer, AsistenciaConEmpleadoSerializer,
+    LoteAsistenciasSerializer, ResumenDiarioSerializer,
+)
 
 
 # --- ViewSet para la API de Empleados ---
@@ -29,26 +42,227 @@ class EmpleadoViewSet(viewsets.ModelViewSet):
 
 # --- ViewSet para la API de Asistencias ---
 class AsistenciaViewSet(viewsets.ModelViewSet):
+    """
+    Filtros opcionales por query params:
+      - empleado: ID del empleado.
+      - area: área del empleado.
+      - desde / hasta: fecha (AAAA-MM-DD, inclusive) o fecha-hora ISO 8601.
+      - expand=empleado: incluye los datos del empleado en cada registro (un JOIN, sin N+1).
+    El listado se pagina por cursor (ver paginacion.py).
+    """
     queryset = Asistencia.objects.all().order_by("-fecha_hora")
     serializer_class = AsistenciaSerializer
+    pagination_class = AsistenciaCursorPagination
+
+    def perform_create(self, serializer):
+        asistencia = serializer.save()
+        marcaciones.sincronizar_estado(asistencia)
+
+    def perform_update(self, serializer):
+        # Si cambia la fecha o el empleado, se recalculan el día anterior y el nuevo.
+        dias = resumenes.dias_de(serializer.instance)
+        empleado_anterior = serializer.instance.empleado_id
+        asistencia = serializer.save()
+        resumenes.actualizar_resumenes(dias | resumenes.dias_de(asistencia))
+        marcaciones.recalcular_estado(empleado_anterior, asistencia.empleado_id)
+
+    def perform_destroy(self, instance):
+        dias = resumenes.dias_de(instance)
+        instance.delete()
+        resumenes.actualizar_resumenes(dias)
+        marcaciones.recalcular_estado(instance.empleado_id)
+
+    @action(detail=False, methods=['post'])
+    def lote(self, request):
+        """
+        Registra en bloque las marcas acumuladas por un kiosco:
+        {"marcas": [{"clave": "...", "qr": "AQ1...", "fecha_hora": "...", "tipo": "entrada"?}, ...]}
+        Los QR se verifican aquí (firma y revocación). Las integraciones autenticadas
+        pueden enviar "empleado": ID en lugar de "qr".
+        Idempotente: las claves ya registradas se devuelven como 'duplicadas'.
+        """
+        serializer = LoteAsistenciasSerializer(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        resultado = marcaciones.registrar_lote(serializer.validated_data['marcas'])
+        return DRFResponse(resultado, status=status.HTTP_200_OK)
+
+    def _expandir_empleado(self):
+        return self.request.query_params.get('expand') == 'empleado'
+
+    def get_serializer_class(self):
+        if self.request.method == 'GET' and self._expandir_empleado():
+            return AsistenciaConEmpleadoSerializer
+        return super().get_serializer_class()
 
     def get_queryset(self):
         queryset = super().get_queryset()
-        empleado_id = self.request.query_params.get("empleado")
-        if empleado_id:
-            try:
-                empleado_id = int(empleado_id)
-                queryset = queryset.filter(empleado_id=empleado_id)
-            except ValueError:
-                pass
+        if self._expandir_empleado():
+            queryset = queryset.select_related('empleado')
+        return _filtrar_asistencias(queryset, self.request.query_params)
+
+    @action(detail=False, methods=['get'])
+    def ultimo(self, request):
+        """
+        Último registro de un empleado (?empleado=ID): una búsqueda por índice,
+        sin descargar todo su historial.
+        """
+        try:
+            empleado_id = int(request.query_params.get("empleado", ""))
+        except ValueError:
+            return DRFResponse({'detail': "El parámetro 'empleado' es obligatorio."}, status=status.HTTP_400_BAD_REQUEST)
+
+        ultimo = self.get_queryset().filter(empleado_id=empleado_id).order_by('-fecha_hora').first()
+        if ultimo is None:
+            return DRFResponse({'detail': 'El empleado no tiene registros.'}, status=status.HTTP_404_NOT_FOUND)
+        return DRFResponse(self.get_serializer(ultimo).data)
+
+
+# --- ViewSet de reportes sobre los resúmenes diarios ---
+class ResumenDiarioViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Resúmenes diarios por empleado (ver resumenes.py). Filtros opcionales:
+      - empleado: ID del empleado.
+      - area: área del empleado.
+      - desde / hasta: fechas AAAA-MM-DD (inclusive).
+    """
+    queryset = ResumenDiario.objects.all()
+    serializer_class = ResumenDiarioSerializer
+    pagination_class = ResumenCursorPagination
+
+    def _rango(self, obligatorio=False):
+        fechas = []
+        for nombre in ('desde', 'hasta'):
+            valor = self.request.query_params.get(nombre)
+            if not valor:
+                if obligatorio:
+                    raise ValidationError({nombre: "Este parámetro es obligatorio (AAAA-MM-DD)."})
+                fechas.append(None)
+                continue
+            fecha = parse_date(valor)
+            if fecha is None:
+                raise ValidationError({nombre: f"Fecha inválida: '{valor}'. Use AAAA-MM-DD."})
+            fechas.append(fecha)
+        return fechas
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        params = self.request.query_params
+        if params.get('empleado', '').isdigit():
+            queryset = queryset.filter(empleado_id=int(params['empleado']))
+        if params.get('area'):
+            queryset = queryset.filter(empleado__area=params['area'])
+        desde, hasta = self._rango()
+        if desde:
+            queryset = queryset.filter(fecha__gte=desde)
+        if hasta:
+            queryset = queryset.filter(fecha__lte=hasta)
         return queryset
 
+    @action(detail=False, methods=['get'])
+    def por_area(self, request):
+        """
+        Totales por área en un rango de fechas (?desde=&hasta=, obligatorios; ?area= opcional):
+        horas trabajadas, tardanzas, anomalías, entradas sin salida y ausencias en días laborables.
+        """
+        desde, hasta = self._rango(obligatorio=True)
+        if desde > hasta:
+            raise ValidationError({'hasta': "Debe ser posterior o igual a 'desde'."})
+        laborables = set(resumenes.configuracion_jornada()['DIAS_LABORABLES'])
+
+        resumen = ResumenDiario.objects.filter(fecha__gte=desde, fecha__lte=hasta)
+        empleados = Empleado.objects.all()
+        if request.query_params.get('area'):
+            resumen = resumen.filter(empleado__area=request.query_params['area'])
+            empleados = empleados.filter(area=request.query_params['area'])
+
+        # __week_day: 1 = domingo ... 7 = sábado; weekday(): 0 = lunes ... 6 = domingo.
+        dias_semana = [(dia + 1) % 7 + 1 for dia in laborables]
+        totales = (
+            resumen
+            .values('empleado__area')
+            .annotate(
+                dias_con_marcas=Count('id'),
+                dias_laborables_con_marcas=Count('id', filter=Q(fecha__week_day__in=dias_semana)),
+                segundos_trabajados=Sum('segundos_trabajados'),
+                tardanzas=Count('id', filter=Q(tardanza_segundos__gt=0)),
+                tardanza_segundos=Sum('tardanza_segundos'),
+                anomalias=Sum('anomalias'),
+                entradas_abiertas=Count('id', filter=Q(entrada_abierta=True)),
+            )
+        )
+        por_area = {fila['empleado__area']: fila for fila in totales}
+        dias = resumenes.dias_laborables(desde, hasta)
+
+        areas = []
+        for area, empleados_area in empleados.values_list('area').annotate(total=Count('id')).order_by('area'):
+            fila = por_area.get(area, {})
+            areas.append({
+                'area': area,
+                'empleados': empleados_area,
+                'dias_con_marcas': fila.get('dias_con_marcas', 0),
+                'horas_trabajadas': round((fila.get('segundos_trabajados') or 0) / 3600, 2),
+                'tardanzas': fila.get('tardanzas', 0),
+                'minutos_tardanza': round((fila.get('tardanza_segundos') or 0) / 60, 1),
+                'anomalias': fila.get('anomalias') or 0,
+                'entradas_abiertas': fila.get('entradas_abiertas', 0),
+                'ausencias': max(empleados_area * dias - fila.get('dias_laborables_con_marcas', 0), 0),
+            })
+        return DRFResponse({'desde': desde, 'hasta': hasta, 'dias_laborables': dias, 'areas': areas})
+
+
+def _filtrar_asistencias(queryset, params):
+    """
+    Aplica los filtros 'empleado', 'area' y 'desde' / 'hasta' de la query string.
+    """
+    empleado_id = params.get("empleado")
+    if empleado_id:
+        try:
+            empleado_id = int(empleado_id)
+            queryset = queryset.filter(empleado_id=empleado_id)
+        except ValueError:
+            pass
+
+    area = params.get("area")
+    if area:
+        queryset = queryset.filter(empleado__area=area)
+
+    desde = params.get("desde")
+    if desde:
+        queryset = queryset.filter(fecha_hora__gte=_parsear_limite(desde, "desde"))
+    hasta = params.get("hasta")
+    if hasta:
+        if parse_date(hasta):
+            # Una fecha sin hora incluye el día completo.
+            queryset = queryset.filter(fecha_hora__lt=_parsear_limite(hasta, "hasta") + timedelta(days=1))
+        else:
+            queryset = queryset.filter(fecha_hora__lte=_parsear_limite(hasta, "hasta"))
+    return queryset
+
+
+def _parsear_limite(valor, nombre):
+    """
+    Convierte 'AAAA-MM-DD' o una fecha-hora ISO en un datetime consciente de zona horaria.
+    """
+    try:
+        fecha_hora = parse_datetime(valor)
+        if fecha_hora is None:
+            fecha = parse_date(valor)
+            if fecha is None:
+                raise ValueError
+            fecha_hora = datetime.combine(fecha, time.min)
+    except ValueError:
+        raise ValidationError({nombre: f"Fecha inválida: '{valor}'. Use AAAA-MM-DD o ISO 8601."})
+    if timezone.is_naive(fecha_hora):
+        fecha_hora = timezone.make_aware(fecha_hora)
+    return fecha_hora
+
 
 # =========================================================
 # === VISTAS PARA EL FLUJO QR -> FACIAL -> REGISTRO ===
 # =========================================================
 
 # VISTA 1: Maneja el escaneo del QR y redirige a la validación facial.
+@metricas.instrumentar('procesar_qr')
 def procesar_qr(request):
     """
     Busca al empleado por el dato del QR y redirige a la página de validación facial.
@@ -70,18 +284,94 @@ def procesar_qr(request):
         if not qr_data:
             return HttpResponse("Error: Datos QR no recibidos.", status=400)
         
-        # 1. Buscar al empleado por ID (asumiendo que el QR tiene el ID)
+        # 1. Verificar la firma del QR (sin consultar la BD): rechaza falsificados y revocados
         try:
-            empleado_id = int(qr_data)
-            empleado = Empleado.objects.get(id=empleado_id)
-        except (ValueError, Empleado.DoesNotExist):
-            return HttpResponse(f"Error: Empleado con ID/DNI '{qr_data}' no encontrado.", status=404)
+            with metricas.etapa('procesar_qr', 'verificar_qr'):
+                empleado_id, emitido = qr.verificar_contenido_qr(qr_data)
+        except qr.QRInvalido:
+            return HttpResponse("Error: QR inválido o revocado.", status=403)
 
-        # 2. Redirigir a la vista que activa la validación facial
+        # 2. Buscar al empleado por el ID firmado
+        with metricas.etapa('procesar_qr', 'buscar_empleado'):
+            empleado = Empleado.objects.filter(id=empleado_id).first()
+        if empleado is None:
+            return HttpResponse(f"Error: Empleado con ID '{empleado_id}' no encontrado.", status=404)
+        if not qr.qr_vigente(empleado, emitido):
+            return HttpResponse("Error: QR inválido o revocado.", status=403)
+
+        # 3. Redirigir a la vista que activa la validación facial
         return redirect(reverse('validacion_facial', args=[empleado.id]))
     
     # Si el método no es POST
-    return render(request, 'empleados/scanner.html')
+    return render(request, 'empleados/scanner.html', _contexto_calidad())
+
+
+def _leer_fotogramas_qr(request):
+    """
+    Fotogramas enviados por el kiosco para leer el QR en el servidor:
+      - Cuerpo binario (image/jpeg, image/png...): un solo fotograma.
+      - multipart/form-data: uno o varios archivos en el campo 'fotograma'.
+    """
+    opciones = lector_qr.configuracion()
+    if request.content_type in TIPOS_IMAGEN_BINARIA:
+        fotogramas = [request.body] if request.body else []
+    elif request.content_type == 'multipart/form-data':
+        fotogramas = [archivo.read() for archivo in request.FILES.getlist('fotograma')]
+    else:
+        raise ErrorCheckin('Envíe el fotograma como imagen binaria o multipart (campo "fotograma").', status=415)
+
+    if not fotogramas:
+        raise ErrorCheckin('No se recibió ningún fotograma.')
+    if len(fotogramas) > opciones['MAX_FOTOGRAMAS']:
+        raise ErrorCheckin(f"Máximo {opciones['MAX_FOTOGRAMAS']} fotogramas por petición.")
+    if any(len(datos) > opciones['MAX_BYTES'] for datos in fotogramas):
+        raise ErrorCheckin('Fotograma demasiado grande: envíe una imagen reducida en escala de grises.', status=413)
+    return fotogramas, opciones
+
+
+# VISTA 1 (variante): el servidor lee el QR del fotograma y responde con el empleado.
+@csrf_exempt
+@metricas.instrumentar('leer_qr')
+@limites.limitar
+def leer_qr(request):
+    """
+    Decodifica el QR de uno o varios fotogramas (ver lector_qr.py), verifica la
+    credencial y devuelve el empleado junto con las URL de validación facial, en una
+    sola petición. Pensada para kioscos cuyo navegador decodifica los QR lentamente.
+    """
+    if request.method != 'POST':
+        return HttpResponse("Método no permitido.", status=405)
+
+    vista = 'leer_qr'
+    try:
+        fotogramas, opciones = _leer_fotogramas_qr(request)
+        with metricas.etapa(vista, 'decodificar_qr'):
+            lectura = lector_qr.leer_lote(fotogramas, opciones)
+        if lectura['texto'] is None:
+            raise ErrorCheckin('No se detectó ningún código QR. Acerque la credencial a la cámara.', status=422)
+
+        empleado = _empleado_del_qr(lectura['texto'], vista)
+
+    except lector_qr.FotogramaInvalido as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+    except ErrorCheckin as e:
+        return e.respuesta()
+
+    return JsonResponse({
+        'success': True,
+        'empleado': {'id': empleado.id, 'nombre': empleado.nombre, 'area': empleado.area},
+        'validacion_url': reverse('validacion_facial', args=[empleado.id]),
+        'registro_url': reverse('registrar_asistencia_final', args=[empleado.id]),
+        'lectura': {k: lectura[k] for k in ('fotograma', 'lector', 'procesados', 'tiempo_ms')},
+    })
+
+
+def _contexto_calidad():
+    """
+    Umbrales (CALIDAD_CAPTURA) y pistas (calidad.PISTAS) del control de calidad que
+    usa static/js/calidad_captura.js.
+    """
+    return {'calidad_captura': procesamiento.OPCIONES_CALIDAD, 'pistas_calidad': calidad.PISTAS}
 
 
 # VISTA 2: Muestra la interfaz para la validación facial.
@@ -94,125 +384,312 @@ def validacion_facial_view(request, empleado_id):
     
     context = {
         'empleado': empleado,
-        'registro_url': reverse('registrar_asistencia_final', args=[empleado.id])
+        'registro_url': reverse('registrar_asistencia_final', args=[empleado.id]),
+        # Validación por ráfaga de fotogramas (WebSocket, solo si se sirve con asgi.py)
+        'ws_path': f'/ws/validacion/{empleado.id}/',
+        # Umbrales y pistas del control de calidad, para comprobarlos también en el navegador
+        **_contexto_calidad(),
     }
     # La ruta de la plantilla debe ser correcta según tu estructura de carpetas
     return render(request, 'admin/empleados/validacion_facial.html', context)
 
 
+# =========================================================
+# === UTILIDADES COMPARTIDAS POR LAS VISTAS DE REGISTRO ===
+# =========================================================
+
+class ErrorCheckin(Exception):
+    """
+    Error de validación del check-in que se devuelve al cliente como JSON.
+    """
+    def __init__(self, mensaje, status=400, headers=None, **datos):
+        super().__init__(mensaje)
+        self.mensaje = mensaje
+        self.status = status
+        self.headers = headers
+        self.datos = datos
+
+    def respuesta(self):
+        return JsonResponse(
+            {'success': False, 'message': self.mensaje, **self.datos}, status=self.status, headers=self.headers,
+        )
+
+
+def _empleado_del_qr(texto, vista, limitar=False):
+    """
+    Verifica la firma del QR (sin BD), busca al empleado y comprueba que la credencial
+    siga vigente. Lanza ErrorCheckin (403/404) si no es así. Con 'limitar' también
+    aplica el límite de peticiones por empleado (429) antes de consultar la BD.
+    """
+    try:
+        with metricas.etapa(vista, 'verificar_qr'):
+            empleado_id, emitido = qr.verificar_contenido_qr(texto)
+    except qr.QRInvalido:
+        raise ErrorCheckin('QR inválido o revocado.', status=403)
+
+    if limitar:
+        try:
+            limites.comprobar('empleado', empleado_id)
+        except limites.LimiteExcedido as e:
+            raise ErrorCheckin(
+                'Demasiadas solicitudes. Espere unos segundos e intente de nuevo.',
+                status=429,
+                headers={'Retry-After': str(e.retry_after)},
+            )
+
+    with metricas.etapa(vista, 'buscar_empleado'):
+        empleado = Empleado.objects.filter(id=empleado_id).first()
+    if empleado is None:
+        raise ErrorCheckin(f"Empleado con ID '{empleado_id}' no encontrado.", status=404)
+    if not qr.qr_vigente(empleado, emitido):
+        raise ErrorCheckin('QR inválido o revocado.', status=403)
+    return empleado
+
+
+def _error_pool_ocupado():
+    return ErrorCheckin(
+        'El servidor está ocupado procesando otras validaciones. Intente de nuevo en unos segundos.',
+        status=503,
+        headers={'Retry-After': str(procesamiento.RETRY_AFTER)},
+    )
+
+
+def _error_calidad(error):
+    # 422: la petición es correcta pero la foto no sirve; 'motivo' permite al cliente
+    # mostrar su propia indicación (ver calidad.PISTAS).
+    return ErrorCheckin(error.pista, status=422, motivo=error.motivo)
+
+
+TIPOS_IMAGEN_BINARIA = ('application/octet-stream', 'image/jpeg', 'image/png', 'image/webp')
+
+
+def _leer_foto_capturada(request):
+    """
+    Extrae los bytes de la imagen capturada. Formatos aceptados:
+      - Cuerpo binario (image/jpeg, application/octet-stream...): se usa tal cual.
+      - multipart/form-data con el archivo en el campo 'foto_capturada'.
+      - JSON con 'foto_capturada' en Base64 / data-URL (kioscos antiguos).
+    """
+    if request.content_type in TIPOS_IMAGEN_BINARIA:
+        if not request.body:
+            raise ErrorCheckin('No se recibió la imagen capturada para la validación.')
+        return request.body
+
+    if request.content_type == 'multipart/form-data':
+        archivo = request.FILES.get('foto_capturada')
+        if archivo is None:
+            raise ErrorCheckin('No se recibió la imagen capturada para la validación.')
+        return archivo.read()
+
+    data = json.loads(request.body)
+    foto_base64 = data.get('foto_capturada', None)
+
+    if not foto_base64:
+        raise ErrorCheckin('No se recibió la imagen capturada para la validación.')
+
+    # Limpiamos y decodificamos el Base64
+    try:
+        if ';base64,' in foto_base64:
+            _, imgstr = foto_base64.split(';base64,')
+        else:
+            imgstr = foto_base64
+
+        return base64.b64decode(imgstr) # Imagen capturada en bytes
+    except Exception:
+        raise ErrorCheckin('Formato de imagen Base64 inválido o corrupto.')
+
+
+def _primer_encoding(resultado):
+    encodings_live, tiempos = resultado
+    if len(encodings_live) == 0:
+        raise ErrorCheckin('No se detectó ningún rostro en la cámara. Mejore la iluminación.')
+    return encodings_live[0], tiempos
+
+
+def _codificar_captura(foto_bytes, vista):
+    """
+    Devuelve (encoding, tiempos_ms) del rostro de la imagen capturada (Webcam / Live).
+    La codificación se ejecuta en el pool de procesos (ver procesamiento.py).
+    """
+    try:
+        resultado = procesamiento.pool_facial.ejecutar(
+            procesamiento.codificar_captura, foto_bytes,
+            procesamiento.OPCIONES_PREPROCESADO, procesamiento.CONFIG_BACKEND, procesamiento.OPCIONES_CALIDAD,
+        )
+    except (procesamiento.ColaLlena, FuturesTimeoutError):
+        raise _error_pool_ocupado()
+    except calidad.CalidadInsuficiente as e:
+        raise _error_calidad(e)
+    except Exception as e:
+        print(f"Error procesando foto webcam: {e}")
+        raise ErrorCheckin('Error procesando la imagen de la cámara.')
+
+    metricas.observar_tiempos(vista, resultado[1])
+    return _primer_encoding(resultado)
+
+
+async def _codificar_captura_async(foto_bytes, vista):
+    """
+    Igual que _codificar_captura() pero esperando el resultado sin bloquear el event loop.
+    """
+    try:
+        tarea = procesamiento.pool_facial.enviar_async(
+            procesamiento.codificar_captura, foto_bytes,
+            procesamiento.OPCIONES_PREPROCESADO, procesamiento.CONFIG_BACKEND, procesamiento.OPCIONES_CALIDAD,
+        )
+        resultado = await asyncio.wait_for(tarea, procesamiento.pool_facial.timeout)
+    except (procesamiento.ColaLlena, asyncio.TimeoutError):
+        raise _error_pool_ocupado()
+    except calidad.CalidadInsuficiente as e:
+        raise _error_calidad(e)
+    except Exception as e:
+        print(f"Error procesando foto webcam: {e}")
+        raise ErrorCheckin('Error procesando la imagen de la cámara.')
+
+    metricas.observar_tiempos(vista, resultado[1])
+    return _primer_encoding(resultado)
+
+
+def _obtener_encoding_perfil(empleado):
+    """
+    Encoding de la IMAGEN DEL PERFIL (precalculado y cacheado, ver biometria.py).
+    """
+    # Validar que el empleado tenga foto de perfil base
+    if not empleado.foto_perfil:
+        raise ErrorCheckin('El empleado no tiene una foto de perfil registrada para comparar.')
+
+    try:
+        encoding_bd = biometria.obtener_encoding_referencia(empleado)
+    except (procesamiento.ColaLlena, FuturesTimeoutError):
+        raise _error_pool_ocupado()
+    except Exception as e:
+        print(f"Error leyendo foto perfil: {e}")
+        raise ErrorCheckin('Error al leer la foto de perfil del sistema. Verifique el archivo.', status=500)
+
+    if encoding_bd is None:
+        raise ErrorCheckin('No se detectó ningún rostro en la foto de perfil guardada (Admin).')
+    return encoding_bd
+
+
+def _verificar_rostro(encoding_bd, encoding_camara):
+    """
+    Compara los rostros; lanza ErrorCheckin (403) si no son la misma persona.
+    """
+    # Cada backend define su umbral (TOLERANCIA): por debajo, es la misma persona.
+    backend = backends.obtener_backend()
+    distancia = backend.distancia(encoding_bd, encoding_camara)
+
+    if distancia > backend.tolerancia:
+        # Si el algoritmo dice que no son la misma persona
+        print(f"Validación fallida. Distancia: {distancia} (Umbral {backend.tolerancia})")
+        raise ErrorCheckin('Rostro no reconocido. La validación biométrica ha fallado.', status=403)
+
+
+def _registrar_entrada_salida(empleado):
+    """
+    Registra la marca alternando Entrada/Salida (ver marcaciones.py) y devuelve el tipo.
+    """
+    try:
+        return marcaciones.registrar_marca(empleado).tipo
+    except marcaciones.MarcaDuplicada as e:
+        raise ErrorCheckin(
+            f'La asistencia de {empleado.nombre} ya fue registrada hace unos segundos.',
+            status=409,
+            headers={'Retry-After': str(e.segundos_restantes)},
+        )
+
+
+def _respuesta_registro(empleado, tipo, **extra):
+    return JsonResponse({
+        'success': True,
+        'message': f"Identidad Verificada. Asistencia de {empleado.nombre} registrada como {tipo.upper()}.",
+        'nombre': empleado.nombre,
+        'tipo': tipo,
+        **extra,
+    }, status=200)
+
+
 # VISTA 3: Registra la asistencia SOLO después de la validación facial exitosa.
 @csrf_exempt 
+@metricas.instrumentar('registrar_asistencia_final')
+@limites.limitar
 def registrar_asistencia_final(request, empleado_id):
     """
     Registra la asistencia (Entrada/Salida) DESPUÉS de una validación facial exitosa,
-    verificando la imagen capturada contra la imagen guardada usando face_recognition.
+    verificando la imagen capturada contra la imagen guardada (backend de backends.py).
     """
     if request.method != 'POST':
         return HttpResponse("Método no permitido.", status=405)
         
     empleado = get_object_or_404(Empleado, id=empleado_id)
-    
-    # Validar que el empleado tenga foto de perfil base
-    if not empleado.foto_perfil:
-        return JsonResponse({'success': False, 'message': 'El empleado no tiene una foto de perfil registrada para comparar.'}, status=400)
 
+    vista = 'registrar_asistencia_final'
     try:
-        # 1. Intentamos cargar los datos JSON
-        data = json.loads(request.body)
-        foto_base64 = data.get('foto_capturada', None)
-        
-        # 2. Decodificar la imagen Base64
-        if not foto_base64:
-            return JsonResponse({'success': False, 'message': 'No se recibió la imagen capturada para la validación.'}, status=400)
-            
-        # Limpiamos y decodificamos el Base64
-        try:
-            if ';base64,' in foto_base64:
-                _, imgstr = foto_base64.split(';base64,') 
-            else:
-                imgstr = foto_base64
-            
-            foto_bytes = base64.b64decode(imgstr) # Imagen capturada en bytes
-        except Exception:
-             return JsonResponse({'success': False, 'message': 'Formato de imagen Base64 inválido o corrupto.'}, status=400)
-
+        # 1. y 2. Leemos la imagen (binaria, multipart o Base64 en JSON)
+        with metricas.etapa(vista, 'leer_foto'):
+            foto_bytes = _leer_foto_capturada(request)
 
         # =================================================================
         # 3. 🚨 LÓGICA DE VALIDACIÓN FACIAL REAL 🚨
         # =================================================================
         
-        # A) Procesar la IMAGEN DEL PERFIL (Referencia guardada en BD)
-        try:
-            # Cargamos la imagen desde la ruta del archivo guardado
-            imagen_referencia = face_recognition.load_image_file(empleado.foto_perfil.path)
-            encodings_referencia = face_recognition.face_encodings(imagen_referencia)
-        except Exception as e:
-            print(f"Error leyendo foto perfil: {e}")
-            return JsonResponse({'success': False, 'message': 'Error al leer la foto de perfil del sistema. Verifique el archivo.'}, status=500)
-
-        if len(encodings_referencia) == 0:
-            return JsonResponse({'success': False, 'message': 'No se detectó ningún rostro en la foto de perfil guardada (Admin).'}, status=400)
-        
-        encoding_bd = encodings_referencia[0] # Tomamos el primer rostro encontrado
+        # A) Encoding de la IMAGEN DEL PERFIL
+        with metricas.etapa(vista, 'encoding_perfil'):
+            encoding_bd = _obtener_encoding_perfil(empleado)
 
         # B) Procesar la IMAGEN CAPTURADA (Webcam / Live)
-        try:
-            # Convertimos los bytes a un objeto tipo archivo
-            imagen_live = face_recognition.load_image_file(io.BytesIO(foto_bytes))
-            encodings_live = face_recognition.face_encodings(imagen_live)
-        except Exception as e:
-            print(f"Error procesando foto webcam: {e}")
-            return JsonResponse({'success': False, 'message': 'Error procesando la imagen de la cámara.'}, status=400)
-
-        if len(encodings_live) == 0:
-            return JsonResponse({'success': False, 'message': 'No se detectó ningún rostro en la cámara. Mejore la iluminación.'}, status=400)
-        
-        encoding_camara = encodings_live[0]
+        with metricas.etapa(vista, 'pool_facial'):
+            encoding_camara, tiempos = _codificar_captura(foto_bytes, vista)
 
         # C) COMPARAR LOS ROSTROS
-        # tolerance=0.5 es un buen equilibrio (0.6 es default, más tolerante)
-        # Si devuelve True, es la misma persona.
-        resultados = face_recognition.compare_faces([encoding_bd], encoding_camara, tolerance=0.5)
-        
-        validacion_exitosa = resultados[0]
-
-        if not validacion_exitosa:
-            # Si el algoritmo dice que no son la misma persona
-            distancia = face_recognition.face_distance([encoding_bd], encoding_camara)[0]
-            print(f"Validación fallida. Distancia: {distancia} (Umbral 0.5)")
-            return JsonResponse({'success': False, 'message': 'Rostro no reconocido. La validación biométrica ha fallado.'}, status=403)
+        with metricas.etapa(vista, 'comparar'):
+            _verificar_rostro(encoding_bd, encoding_camara)
             
         # =================================================================
         # 4. Lógica de Asistencia (Entrada/Salida) - SOLO si pasó validación
         # =================================================================
-        now = timezone.now()
-        start_of_day = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        
-        ultimo_registro = Asistencia.objects.filter(
-            empleado=empleado, 
-            fecha_hora__gte=start_of_day, 
-        ).order_by('-fecha_hora').first()
-
-        if ultimo_registro and ultimo_registro.tipo == 'entrada':
-            tipo = 'salida'
-        else:
-            tipo = 'entrada'
-            
-        # Creamos el nuevo registro de asistencia
-        Asistencia.objects.create(
-            empleado=empleado,
-            tipo=tipo,
-            fecha_hora=now
-        )
+        with metricas.etapa(vista, 'registrar_bd'):
+            tipo = _registrar_entrada_salida(empleado)
         
         # 5. Devolvemos respuesta de éxito
-        return JsonResponse({
-            'success': True,
-            'message': f"Identidad Verificada. Asistencia de {empleado.nombre} registrada como {tipo.upper()}.",
-            'nombre': empleado.nombre,
-            'tipo': tipo
-        }, status=200)
+        return _respuesta_registro(empleado, tipo, tiempos_ms=tiempos)
+
+    except ErrorCheckin as e:
+        return e.respuesta()
+    except json.JSONDecodeError:
+        return JsonResponse({'success': False, 'message': 'Datos JSON inválidos.'}, status=400)
+    except Exception as e:
+        print(f"Error interno al registrar asistencia: {e}")
+        return JsonResponse({'success': False, 'message': f'Error interno del servidor: {str(e)}'}, status=500)
+
+
+# VISTA 3 (ASGI): Variante asíncrona de registrar_asistencia_final.
+@csrf_exempt
+@metricas.instrumentar('registrar_asistencia_final_async')
+@limites.limitar
+async def registrar_asistencia_final_async(request, empleado_id):
+    """
+    Mismo flujo que registrar_asistencia_final, pero sin ocupar un hilo mientras el
+    pool de procesos codifica la imagen. Pensada para servirse con asgi.py.
+    """
+    if request.method != 'POST':
+        return HttpResponse("Método no permitido.", status=405)
+
+    empleado = await Empleado.objects.filter(id=empleado_id).afirst()
+    if empleado is None:
+        return JsonResponse({'success': False, 'message': 'Empleado no encontrado.'}, status=404)
+
+    try:
+        foto_bytes = _leer_foto_capturada(request)
+        encoding_bd = await sync_to_async(_obtener_encoding_perfil)(empleado)
+        encoding_camara, tiempos = await _codificar_captura_async(foto_bytes, 'registrar_asistencia_final_async')
+        _verificar_rostro(encoding_bd, encoding_camara)
+
+        tipo = await sync_to_async(_registrar_entrada_salida)(empleado)
+        return _respuesta_registro(empleado, tipo, tiempos_ms=tiempos)
 
+    except ErrorCheckin as e:
+        return e.respuesta()
     except json.JSONDecodeError:
         return JsonResponse({'success': False, 'message': 'Datos JSON inválidos.'}, status=400)
     except Exception as e:
@@ -220,25 +697,205 @@ def registrar_asistencia_final(request, empleado_id):
         return JsonResponse({'success': False, 'message': f'Error interno del servidor: {str(e)}'}, status=500)
 
 
+# VISTA 4: Identificación 1:N (solo rostro, sin QR).
+@csrf_exempt
+@metricas.instrumentar('identificar_asistencia')
+@limites.limitar
+def identificar_asistencia(request):
+    """
+    Identifica al empleado comparando el rostro capturado contra TODOS los encodings
+    guardados (índice en memoria, ver identificacion.py) y registra su asistencia.
+    No requiere escanear el QR.
+    """
+    if request.method != 'POST':
+        return HttpResponse("Método no permitido.", status=405)
+
+    vista = 'identificar_asistencia'
+    try:
+        with metricas.etapa(vista, 'leer_foto'):
+            foto_bytes = _leer_foto_capturada(request)
+        with metricas.etapa(vista, 'pool_facial'):
+            encoding_camara, tiempos = _codificar_captura(foto_bytes, vista)
+
+        with metricas.etapa(vista, 'buscar_indice'):
+            coincidencia = identificacion.indice_facial.buscar(
+                encoding_camara, tolerancia=backends.obtener_backend().tolerancia
+            )
+        if coincidencia is None:
+            return JsonResponse({'success': False, 'message': 'Rostro no reconocido. No coincide con ningún empleado registrado.'}, status=403)
+
+        empleado_id, distancia = coincidencia
+        empleado = Empleado.objects.filter(id=empleado_id).first()
+        if empleado is None:
+            # El empleado fue eliminado en otro proceso: el índice se corregirá solo.
+            identificacion.indice_facial.eliminar(empleado_id)
+            return JsonResponse({'success': False, 'message': 'Rostro no reconocido. No coincide con ningún empleado registrado.'}, status=403)
+
+        with metricas.etapa(vista, 'registrar_bd'):
+            tipo = _registrar_entrada_salida(empleado)
+        return _respuesta_registro(empleado, tipo, empleado_id=empleado.id, distancia=round(float(distancia), 4), tiempos_ms=tiempos)
+
+    except ErrorCheckin as e:
+        return e.respuesta()
+    except json.JSONDecodeError:
+        return JsonResponse({'success': False, 'message': 'Datos JSON inválidos.'}, status=400)
+    except Exception as e:
+        print(f"Error interno al identificar empleado: {e}")
+        return JsonResponse({'success': False, 'message': f'Error interno del servidor: {str(e)}'}, status=500)
+
+
+# VISTA 5: Check-in en una sola petición (QR + rostro), para kioscos de página única.
+def _leer_checkin(request):
+    """
+    Devuelve (texto del QR, bytes de la foto). Formatos aceptados:
+      - Cuerpo binario con la foto y el texto del QR en la cabecera X-QR-Data.
+      - multipart/form-data: 'qr_data' y el archivo 'foto_capturada'.
+      - JSON: {"qr_data": "...", "foto_capturada": "<Base64 / data-URL>"}.
+    """
+    if request.content_type in TIPOS_IMAGEN_BINARIA:
+        qr_data = request.headers.get('X-QR-Data')
+    elif request.content_type == 'multipart/form-data':
+        qr_data = request.POST.get('qr_data')
+    else:
+        qr_data = json.loads(request.body).get('qr_data')
+    if not qr_data:
+        raise ErrorCheckin('Datos QR no recibidos.')
+    return qr_data, _leer_foto_capturada(request)
+
+
+@csrf_exempt
+@metricas.instrumentar('checkin')
+@limites.limitar
+def checkin(request):
+    """
+    Check-in completo en una sola petición: verifica el QR, valida el rostro contra el
+    del empleado y registra la marca. Equivale a procesar_qr + validacion_facial_view +
+    registrar_asistencia_final, pero con una única consulta del empleado y sin
+    redirecciones ni renderizado de plantillas; el kiosco no abandona la página.
+    """
+    if request.method != 'POST':
+        return HttpResponse("Método no permitido.", status=405)
+
+    vista = 'checkin'
+    try:
+        with metricas.etapa(vista, 'leer_foto'):
+            qr_data, foto_bytes = _leer_checkin(request)
+        empleado = _empleado_del_qr(qr_data, vista, limitar=True)
+
+        with metricas.etapa(vista, 'encoding_perfil'):
+            encoding_bd = _obtener_encoding_perfil(empleado)
+        with metricas.etapa(vista, 'pool_facial'):
+            encoding_camara, tiempos = _codificar_captura(foto_bytes, vista)
+        with metricas.etapa(vista, 'comparar'):
+            _verificar_rostro(encoding_bd, encoding_camara)
+
+        with metricas.etapa(vista, 'registrar_bd'):
+            tipo = _registrar_entrada_salida(empleado)
+        return _respuesta_registro(empleado, tipo, empleado_id=empleado.id, tiempos_ms=tiempos)
+
+    except ErrorCheckin as e:
+        return e.respuesta()
+    except json.JSONDecodeError:
+        return JsonResponse({'success': False, 'message': 'Datos JSON inválidos.'}, status=400)
+    except Exception as e:
+        print(f"Error interno en el check-in: {e}")
+        return JsonResponse({'success': False, 'message': f'Error interno del servidor: {str(e)}'}, status=500)
+
+
 # --- Vistas de Utilidad ---
+@staff_member_required
 def generar_qr_empleado(request, empleado_id):
     """
-    Genera y devuelve la imagen de un código QR.
+    Genera y devuelve la imagen del código QR (la credencial firmada) del empleado.
+    Parámetros opcionales: ?formato=png|svg, ?tamano=<px por módulo, 1-40> y
+    ?v=<qr_emitido>. Las imágenes se cachean en memoria y se sirven con ETag y
+    Cache-Control privado (los proxies compartidos no guardan credenciales); solo las
+    URL versionadas con la emisión vigente se cachean largo, porque al reemitir cambia
+    la URL. Sin versión, el navegador revalida con un 304.
     """
-    empleado = get_object_or_404(Empleado, pk=empleado_id)
-    qr_content = str(empleado.id)
-    
-    img = qrcode.make(qr_content)
-    
-    buf = io.BytesIO()
-    img.save(buf, 'PNG')
-    buf.seek(0)
+    formato = request.GET.get('formato', 'png').lower()
+    if formato not in qr.FORMATOS:
+        return HttpResponse("Formato no soportado. Use 'png' o 'svg'.", status=400)
+    try:
+        box_size = int(request.GET.get('tamano', 10))
+    except ValueError:
+        box_size = 0
+    if not 1 <= box_size <= 40:
+        return HttpResponse("Tamaño inválido. Use un entero entre 1 y 40.", status=400)
+
+    emitido = Empleado.objects.filter(pk=empleado_id).values_list('qr_emitido', flat=True).first()
+    if emitido is None:
+        raise Http404("Empleado no encontrado.")
+    qr_content = qr.contenido_qr(empleado_id, emitido)
+
+    etag = qr.etag_qr(qr_content, formato, box_size)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(qr.render_qr(qr_content, formato, box_size), content_type=qr.FORMATOS[formato])
+    response['ETag'] = etag
+    if request.GET.get('v') == str(emitido):
+        patch_cache_control(response, private=True, max_age=getattr(settings, 'QR_CACHE_CONTROL_MAX_AGE', 31536000))
+    else:
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
 
-    return HttpResponse(buf, content_type='image/png')
+@staff_member_required
+def miniatura_empleado(request, empleado_id):
+    """
+    Miniatura de la foto de perfil (ver fotos.py) para el Admin. El nombre del archivo
+    es el hash de su contenido, así que sirve como ETag y la respuesta se cachea.
+    """
+    ruta = Empleado.objects.filter(pk=empleado_id).values_list('foto_miniatura', flat=True).first()
+    if not ruta:
+        raise Http404("El empleado no tiene miniatura.")
+
+    etag = '"%s"' % ruta.rsplit('/', 1)[-1].split('.')[0]
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = FileResponse(default_storage.open(ruta), content_type='image/jpeg')
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, max_age=getattr(settings, 'QR_CACHE_CONTROL_MAX_AGE', 31536000))
+    return response
+
+
+@staff_member_required
+def exportar_asistencias(request):
+    """
+    Descarga las asistencias en CSV o XLSX (?formato=csv|xlsx) en streaming, con los
+    mismos filtros que /api/asistencias/ (empleado, area, desde, hasta).
+    """
+    formato = request.GET.get('formato', 'csv')
+    if formato not in exportacion.FORMATOS:
+        return HttpResponse("Formato no soportado. Use 'csv' o 'xlsx'.", status=400)
+    try:
+        asistencias = _filtrar_asistencias(Asistencia.objects.all(), request.GET)
+    except ValidationError as e:
+        return JsonResponse({'success': False, 'message': e.detail}, status=400)
+
+    generar, content_type = exportacion.FORMATOS[formato]
+    respuesta = StreamingHttpResponse(generar(asistencias), content_type=content_type)
+    nombre = f"asistencias_{timezone.localdate():%Y%m%d}.{formato}"
+    respuesta['Content-Disposition'] = f'attachment; filename="{nombre}"'
+    return respuesta
+
+
+def metricas_view(request):
+    """
+    Métricas del proceso en formato de texto de Prometheus (ver metricas.py).
+    """
+    if not metricas.HABILITADAS:
+        raise Http404("Métricas deshabilitadas (METRICAS_HABILITADAS = False).")
+    if not metricas.autorizado(request):
+        return HttpResponse(
+            'No autorizado.', status=401, content_type='text/plain; charset=utf-8',
+            headers={'WWW-Authenticate': 'Bearer realm="metrics"'},
+        )
+    return HttpResponse(metricas.registro.exportar(), content_type='text/plain; version=0.0.4; charset=utf-8')
 
 
 def scanner_view(request):
     """
     Esta vista muestra la página del escáner (scanner.html).
     """
-    return render(request, 'empleados/scanner.html')
\ No newline at end of file
+    return render(request, 'empleados/scanner.html', _contexto_calidad())
\ No newline at end of file
@@ -0,0 +1,63 @@
+import sqlite3
+import threading
+import uuid
+from datetime import datetime, timezone
+
+class ColaOffline:
+    """
+    Cola durable (SQLite) de marcas pendientes de enviar al servidor.
+
+    Cada marca se guarda en disco en cuanto se lee el QR, con su hora real y una
+    clave de idempotencia; así un corte de red o un reinicio del kiosco no pierde
+    marcas y reenviar un lote al servidor nunca las duplica.
+
+    Se guarda el texto leído del QR tal cual: la firma y la revocación las comprueba
+    el servidor al recibir el lote, así el kiosco no necesita la clave de los QR.
+    """
+
+    def __init__(self, ruta="marcas_pendientes.sqlite3"):
+        self._lock = threading.Lock()
+        self._conexion = sqlite3.connect(ruta, check_same_thread=False, isolation_level=None)
+        self._conexion.execute("PRAGMA journal_mode=WAL")
+        self._conexion.execute("PRAGMA synchronous=NORMAL")
+        self._conexion.execute(
+            "CREATE TABLE IF NOT EXISTS marcas ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " clave TEXT NOT NULL UNIQUE,"
+            " qr TEXT NOT NULL,"
+            " fecha_hora TEXT NOT NULL)"
+        )
+
+    def agregar(self, qr, fecha_hora=None):
+        """Guarda una marca con el texto leído del QR y devuelve su clave de idempotencia."""
+        clave = uuid.uuid4().hex
+        fecha_hora = (fecha_hora or datetime.now(timezone.utc)).isoformat()
+        with self._lock:
+            self._conexion.execute(
+                "INSERT INTO marcas (clave, qr, fecha_hora) VALUES (?, ?, ?)",
+                (clave, qr, fecha_hora),
+            )
+        return clave
+
+    def pendientes(self, limite=100):
+        """Devuelve las marcas más antiguas pendientes de envío (en orden de llegada)."""
+        with self._lock:
+            filas = self._conexion.execute(
+                "SELECT clave, qr, fecha_hora FROM marcas ORDER BY id LIMIT ?", (limite,)
+            ).fetchall()
+        return [{"clave": clave, "qr": qr, "fecha_hora": fecha_hora} for clave, qr, fecha_hora in filas]
+
+    def eliminar(self, claves):
+        """Elimina las marcas ya confirmadas por el servidor."""
+        if not claves:
+            return
+        with self._lock:
+            self._conexion.executemany("DELETE FROM marcas WHERE clave = ?", [(clave,) for clave in claves])
+
+    def __len__(self):
+        with self._lock:
+            return self._conexion.execute("SELECT COUNT(*) FROM marcas").fetchone()[0]
+
+    def cerrar(self):
+        with self._lock:
+            self._conexion.close()
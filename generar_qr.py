@@ -1,14 +1,24 @@
+import os
+import sys
+
 import qrcode
 
-def generar_qr(id_empleado, nombre):
-    data = {
-        "id": id_empleado,
-        "nombre": nombre
-    }
+# Formato de QR compartido con el servidor (asistencia_qr/empleados/payload_qr.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "asistencia_qr"))
+from empleados import payload_qr
+
+# Debe coincidir con QR_CLAVE_FIRMA del servidor
+CLAVE_QR = os.environ.get("ASISTENCIA_QR_CLAVE")
+
+def generar_qr(id_empleado, nombre, emitido):
+    # 'emitido' debe ser el valor de Empleado.qr_emitido; si no coincide, el servidor rechaza el QR.
+    if not CLAVE_QR:
+        raise SystemExit("❌ Defina la variable de entorno ASISTENCIA_QR_CLAVE con la clave del servidor.")
+    data = payload_qr.firmar(id_empleado, emitido, CLAVE_QR)
     qr = qrcode.make(data)
     qr.save(f"{nombre}_{id_empleado}.png")
     print(f"✅ QR generado para {nombre} - Archivo: {nombre}_{id_empleado}.png")
 
 # Ejemplo de uso
 if __name__ == "__main__":
-    generar_qr(2, "Alejandro_Figueroa")
+    generar_qr(2, "Alejandro_Figueroa", 0)
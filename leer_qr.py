@@ -1,82 +1,263 @@
+import threading
+import time
+
 import cv2
 import requests
-import json
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from cola_local import ColaOffline
 
 API_ASISTENCIAS = "http://127.0.0.1:8000/api/asistencias/"
+API_LOTE = f"{API_ASISTENCIAS}lote/"
+
+TIMEOUT_HTTP = 5                # segundos por petición
+SALTAR_FOTOGRAMAS = 2           # decodificar 1 de cada N fotogramas
+ANCHO_DECODIFICACION = 640      # ancho máximo (px) de la región que se decodifica
+FRACCION_ROI = 0.8              # fracción central del fotograma donde se busca el QR
+ENFRIAMIENTO_SEGUNDOS = 5       # no reenviar el mismo QR antes de este tiempo
+TAMANO_LOTE = 100               # marcas por petición de sincronización
+REINTENTO_SEGUNDOS = 10         # espera entre intentos si el servidor no responde
 
-def obtener_ultimo_registro(empleado_id):
+def crear_sesion():
+    """Sesión HTTP con conexiones persistentes (keep-alive) y reintentos cortos."""
+    sesion = requests.Session()
+    adaptador = HTTPAdapter(pool_connections=2, pool_maxsize=4, max_retries=Retry(total=2, backoff_factor=0.2))
+    sesion.mount("http://", adaptador)
+    sesion.mount("https://", adaptador)
+    return sesion
+
+def enviar_lote(marcas, sesion=requests):
+    """
+    Envía un lote de marcas al servidor en una sola petición.
+    Devuelve las claves que ya no deben reenviarse (creadas, duplicadas o rechazadas),
+    o None si no hubo conexión.
+    """
     try:
-        url = f"{API_ASISTENCIAS}?empleado={empleado_id}"
-        response = requests.get(url)
-        if response.status_code == 200:
-            data = response.json()
-            if data:
-                return data[-1]  # último registro
-        return None
+        response = sesion.post(API_LOTE, json={"marcas": marcas}, timeout=TIMEOUT_HTTP)
     except Exception as e:
-        print("⚠️ No se pudo consultar la API:", e)
+        print("⚠️ No se pudo conectar con la API; las marcas quedan en cola:", e)
         return None
 
-def enviar_asistencia(empleado_id):
-    ultimo = obtener_ultimo_registro(empleado_id)
+    if response.status_code != 200:
+        print("❌ Error al registrar el lote:", response.status_code, response.text[:200])
+        return None
 
-    if ultimo and ultimo.get("tipo") == "entrada":
-        tipo = "salida"
-    else:
-        tipo = "entrada"
+    resultado = response.json()
+    for marca in resultado["creadas"]:
+        print(f"✅ {marca['tipo'].capitalize()} registrada: empleado {marca['empleado']} ({marca['fecha_hora']})")
+    for rechazada in resultado["rechazadas"]:
+        print(f"❌ Marca rechazada ({rechazada['clave']}):", rechazada["motivo"])
+    return (
+        [marca["clave"] for marca in resultado["creadas"]]
+        + resultado["duplicadas"]
+        + [rechazada["clave"] for rechazada in resultado["rechazadas"]]
+    )
 
-    payload = {
-        "empleado": empleado_id,
-        "tipo": tipo
-    }
-    headers = {"Content-Type": "application/json"}
 
-    try:
-        response = requests.post(API_ASISTENCIAS, data=json.dumps(payload), headers=headers)
-        if response.status_code == 201:
-            print(f"✅ {tipo.capitalize()} registrada:", response.json())
-        else:
-            print("❌ Error al registrar asistencia:", response.text)
-    except Exception as e:
-        print("⚠️ No se pudo conectar con la API:", e)
+# =========================================================
+# === PIPELINE: CAPTURA -> DECODIFICACIÓN -> ENVÍO ===
+# =========================================================
+# Cada etapa corre en su propio hilo, así la vista previa de la cámara nunca se
+# congela esperando a la red ni a la decodificación del QR.
 
-def leer_qr_opencv():
-    cap = cv2.VideoCapture(0)
-    detector = cv2.QRCodeDetector()
+class Contador:
+    """Cuenta eventos y calcula su frecuencia (por segundo) en ventanas de ~1 s."""
 
-    print("📷 Escaneando QR...")
+    def __init__(self):
+        self.total = 0
+        self.por_segundo = 0.0
+        self._ventana = 0
+        self._inicio = time.monotonic()
 
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
+    def sumar(self):
+        self.total += 1
+        self._ventana += 1
+        transcurrido = time.monotonic() - self._inicio
+        if transcurrido >= 1.0:
+            self.por_segundo = self._ventana / transcurrido
+            self._ventana = 0
+            self._inicio = time.monotonic()
+
+
+class CapturaCamara(threading.Thread):
+    """Lee fotogramas continuamente y conserva solo el más reciente."""
+
+    def __init__(self, indice=0):
+        super().__init__(daemon=True)
+        self.cap = cv2.VideoCapture(indice)
+        self.fps = Contador()
+        self.activo = True
+        self._lock = threading.Lock()
+        self._fotograma = None
+        self._numero = 0
+
+    def run(self):
+        while self.activo:
+            ret, frame = self.cap.read()
+            if not ret:
+                self.activo = False
+                break
+            with self._lock:
+                self._fotograma = frame
+                self._numero += 1
+            self.fps.sumar()
+        self.cap.release()
+
+    def ultimo(self):
+        """Devuelve (número, fotograma) del último fotograma leído."""
+        with self._lock:
+            return self._numero, self._fotograma
+
+
+class DecodificadorQR(threading.Thread):
+    """
+    Decodifica QR sobre una región central reducida, saltando fotogramas, y
+    descarta el mismo contenido mientras dure el periodo de enfriamiento.
+    """
+
+    def __init__(self, captura, cola, saltar=SALTAR_FOTOGRAMAS, ancho_max=ANCHO_DECODIFICACION,
+                 roi=FRACCION_ROI, enfriamiento=ENFRIAMIENTO_SEGUNDOS):
+        super().__init__(daemon=True)
+        self.captura = captura
+        self.cola = cola
+        self.saltar = saltar
+        self.ancho_max = ancho_max
+        self.roi = roi
+        self.enfriamiento = enfriamiento
+        self.detector = cv2.QRCodeDetector()
+        self.fps = Contador()
+        self.activo = True
+        self.resultado = None  # (texto, bbox en coordenadas del fotograma, instante)
+        self.cola_nueva = threading.Event()
+        self._vistos = {}  # texto -> último instante en que se envió
+
+    def _region(self, frame):
+        alto, ancho = frame.shape[:2]
+        dy, dx = int(alto * (1 - self.roi) / 2), int(ancho * (1 - self.roi) / 2)
+        region = cv2.cvtColor(frame[dy:alto - dy, dx:ancho - dx], cv2.COLOR_BGR2GRAY)
+        escala = min(1.0, self.ancho_max / region.shape[1])
+        if escala < 1.0:
+            region = cv2.resize(region, None, fx=escala, fy=escala, interpolation=cv2.INTER_AREA)
+        return region, escala, dx, dy
+
+    def run(self):
+        ultimo_numero = 0
+        while self.activo and self.captura.activo:
+            numero, frame = self.captura.ultimo()
+            if frame is None or numero - ultimo_numero < self.saltar:
+                time.sleep(0.005)
+                continue
+            ultimo_numero = numero
+
+            region, escala, dx, dy = self._region(frame)
+            data, bbox, _ = self.detector.detectAndDecode(region)
+            self.fps.sumar()
+            if not data:
+                continue
+
+            if bbox is not None:
+                bbox = bbox.reshape(-1, 2) / escala + (dx, dy)
+            ahora = time.monotonic()
+            self.resultado = (data, bbox, ahora)
+
+            # Mismo QR todavía frente a la cámara: no se vuelve a enviar.
+            if ahora - self._vistos.get(data, -self.enfriamiento) < self.enfriamiento:
+                continue
+            self._vistos = {k: t for k, t in self._vistos.items() if ahora - t < self.enfriamiento}
+            self._vistos[data] = ahora
 
-        data, bbox, _ = detector.detectAndDecode(frame)
-        if data:
             print(f"✅ QR detectado: {data}")
+            # Se guarda en disco con su hora real; el subidor la enviará cuando pueda.
+            # El servidor verifica la firma y la revocación del QR al recibir el lote.
+            self.cola.agregar(data)
+            self.cola_nueva.set()
+
+
+class SubidorAsistencias(threading.Thread):
+    """
+    Sincroniza en segundo plano la cola local con el servidor, en lotes y con una
+    sesión HTTP reutilizable. Si el servidor no responde, reintenta más tarde.
+    """
+
+    def __init__(self, cola, aviso):
+        super().__init__(daemon=True)
+        self.cola = cola
+        self.aviso = aviso
+        self.sesion = crear_sesion()
+        self.activo = True
+        self.enviados = 0
 
-            try:
-                empleado = json.loads(data)  # El QR debe ser un JSON válido
-                enviar_asistencia(empleado["id"])
-            except Exception as e:
-                print("⚠️ El QR no tiene un formato válido:", e)
+    def sincronizar(self):
+        """Envía lotes hasta vaciar la cola. Devuelve False si falló la conexión."""
+        while True:
+            marcas = self.cola.pendientes(TAMANO_LOTE)
+            if not marcas:
+                return True
+            confirmadas = enviar_lote(marcas, self.sesion)
+            if confirmadas is None:
+                return False
+            self.cola.eliminar(confirmadas)
+            self.enviados += len(confirmadas)
 
+    def run(self):
+        while self.activo:
+            self.aviso.wait(timeout=REINTENTO_SEGUNDOS)
+            self.aviso.clear()
+            self.sincronizar()
+        self.sincronizar()
+
+
+def dibujar_estado(frame, captura, decodificador, cola):
+    if decodificador.resultado is not None:
+        data, bbox, instante = decodificador.resultado
+        if time.monotonic() - instante < 1.0:
             if bbox is not None and len(bbox) > 0:
-                for i in range(len(bbox)):
-                    pt1 = tuple(map(int, bbox[i][0]))
-                    pt2 = tuple(map(int, bbox[(i+1) % len(bbox)][0]))
+                puntos = bbox.astype(int)
+                for i in range(len(puntos)):
+                    pt1 = tuple(puntos[i])
+                    pt2 = tuple(puntos[(i + 1) % len(puntos)])
                     cv2.line(frame, pt1, pt2, (0, 255, 0), 2)
-
             cv2.putText(frame, data, (20, 50),
                         cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
 
-        cv2.imshow("Escanear QR", frame)
+    contadores = (f"captura {captura.fps.por_segundo:.0f} fps | "
+                  f"decodificacion {decodificador.fps.por_segundo:.0f} fps | "
+                  f"pendientes {len(cola)}")
+    cv2.putText(frame, contadores, (20, frame.shape[0] - 20),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 0), 1)
+
+
+def leer_qr_opencv():
+    cola = ColaOffline()
+    captura = CapturaCamara(0)
+    decodificador = DecodificadorQR(captura, cola)
+    subidor = SubidorAsistencias(cola, decodificador.cola_nueva)
+
+    print("📷 Escaneando QR...")
+    captura.start()
+    decodificador.start()
+    subidor.start()
+
+    ultimo_numero = 0
+    while captura.activo:
+        numero, frame = captura.ultimo()
+        if frame is not None and numero != ultimo_numero:
+            ultimo_numero = numero
+            frame = frame.copy()
+            dibujar_estado(frame, captura, decodificador, cola)
+            cv2.imshow("Escanear QR", frame)
 
         if cv2.waitKey(1) & 0xFF == ord("q"):
             break
 
-    cap.release()
+    captura.activo = False
+    decodificador.activo = False
+    subidor.activo = False
+    decodificador.cola_nueva.set()
+    subidor.join(timeout=TIMEOUT_HTTP)
     cv2.destroyAllWindows()
+    print(f"📊 Fotogramas: {captura.fps.total} | decodificados: {decodificador.fps.total} | enviados: {subidor.enviados} | pendientes: {len(cola)}")
 
 if __name__ == "__main__":
     leer_qr_opencv()